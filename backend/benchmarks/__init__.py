@@ -0,0 +1 @@
+# Offline benchmarks; run from the backend directory, e.g. `python -m benchmarks.bench_keyword_index`
@@ -0,0 +1,40 @@
+"""Load the FastAPI app in-process with fake model-backed services."""
+import asyncio
+from types import ModuleType
+from typing import Any, Optional
+from unittest import mock
+
+from benchmarks.fakes import NullVectorStore
+from services.llm_service import LLMService
+
+
+def load_app(llm_service: Any, vector_store: Optional[Any] = None) -> ModuleType:
+    """Import main with llm_service answering and extracting keywords.
+
+    The real LLMService and VectorStore are never constructed, so no model
+    file or embedding model is needed. Returns the main module; call
+    start_app() before sending requests.
+    """
+    vector_store = vector_store or NullVectorStore()
+    with mock.patch.object(LLMService, "for_profile", staticmethod(lambda name: llm_service)):
+        import main
+    # main may have been imported before; point it at this run's services
+    main.llm_service = main.keyword_llm_service = llm_service
+    main.VectorStore = lambda: vector_store
+    return main
+
+
+async def start_app(main: ModuleType, wait_for_index: bool = True) -> float:
+    """Run the startup hook and return seconds until the app is ready.
+
+    With wait_for_index, that includes the background keyword refresh.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await main.startup_event()
+    await main.startup_task
+    if main.readiness["error"] is not None:
+        raise RuntimeError(f"App failed to start: {main.readiness['error']}")
+    if wait_for_index and main.markdown_service.indexing_task is not None:
+        await main.markdown_service.indexing_task
+    return loop.time() - started
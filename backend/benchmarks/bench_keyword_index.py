@@ -0,0 +1,93 @@
+"""Benchmark keyword lookup against a synthetic corpus.
+
+Compares the in-memory BM25 index with the previous approach of opening and
+parsing one keyword JSON file per document on every query.
+
+    python -m benchmarks.bench_keyword_index --docs 10000 --queries 200
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.common import summarize
+from services.keyword_index import KeywordIndex
+
+
+def make_corpus(n_docs: int, vocab_size: int, keywords_per_doc: int, seed: int) -> Dict[str, List[str]]:
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(vocab_size)]
+    # Zipf-like weights so some keywords are common and most are rare
+    weights = [1 / (rank + 1) for rank in range(vocab_size)]
+    return {
+        f"doc{i:06d}": list(dict.fromkeys(rng.choices(vocab, weights=weights, k=keywords_per_doc)))
+        for i in range(n_docs)
+    }
+
+
+def make_queries(corpus: Dict[str, List[str]], n_queries: int, seed: int) -> List[List[str]]:
+    rng = random.Random(seed + 1)
+    docs = list(corpus.values())
+    return [rng.sample(doc, min(len(doc), 5)) for doc in rng.sample(docs, n_queries)]
+
+
+def legacy_scan(keywords_dir: str, files: List[str], query: List[str]):
+    best, best_score = None, 0.0
+    for filename in files:
+        with open(os.path.join(keywords_dir, f"{filename}.json")) as f:
+            file_keywords = json.load(f)
+        score = len(set(query) & set(file_keywords)) / len(query)
+        if score > best_score:
+            best, best_score = filename, score
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--vocab", type=int, default=20000)
+    parser.add_argument("--keywords-per-doc", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-legacy", action="store_true", help="Skip the per-file JSON scan baseline")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.docs, args.vocab, args.keywords_per_doc, args.seed)
+    queries = make_queries(corpus, args.queries, args.seed)
+    results = {"docs": args.docs, "queries": args.queries}
+
+    index = KeywordIndex()
+    started = time.perf_counter()
+    for filename, keywords in corpus.items():
+        index.add_document(filename, keywords)
+    results["index_build_s"] = time.perf_counter() - started
+
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, top_k=5)
+        samples.append(time.perf_counter() - started)
+    results["index_search"] = summarize(samples)
+
+    if not args.skip_legacy:
+        with tempfile.TemporaryDirectory() as keywords_dir:
+            for filename, keywords in corpus.items():
+                with open(os.path.join(keywords_dir, f"{filename}.json"), "w") as f:
+                    json.dump(keywords, f, indent=2)
+            files = list(corpus)
+            # The scan is slow, so a handful of queries is enough for a baseline
+            samples = []
+            for query in queries[:10]:
+                started = time.perf_counter()
+                legacy_scan(keywords_dir, files, query)
+                samples.append(time.perf_counter() - started)
+            results["legacy_scan"] = summarize(samples)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Benchmark the question pipeline with a fake LLM and synthetic corpora.
+
+For each corpus size this measures cold and warm startup indexing,
+list_files, find_best_match, find_best_context and end-to-end
+/api/question latency through the ASGI app in-process. No model file is
+needed: FakeLLMService sleeps --token-delay seconds per generated token.
+
+    python -m benchmarks.bench_pipeline --docs 10,1000,10000 --token-delay 0.02
+    python -m benchmarks.bench_pipeline --docs 1000 --baseline benchmarks/results/pipeline-abc123-....json
+
+Results are written as JSON to benchmarks/results/ (or --output) so runs on
+different commits can be compared with --baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.app import load_app, start_app
+from benchmarks.common import compare, save_results, summarize
+from benchmarks.corpus import SyntheticCorpus
+from benchmarks.fakes import FakeLLMService
+from services.config import settings
+
+
+def _timed(fn, *args, **kwargs) -> float:
+    started = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+async def _timed_async(coro) -> float:
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started
+
+
+async def bench_questions(main, questions: List[Dict[str, str]], concurrency: int) -> Dict[str, Any]:
+    """Send every question through POST /api/question with at most concurrency in flight."""
+    transport = httpx.ASGITransport(app=main.app)
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+    statuses: Dict[str, int] = {}
+    hits = 0
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def ask(item: Dict[str, str]):
+            nonlocal hits
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/question", json={"question": item["question"]})
+                samples.append(time.perf_counter() - started)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            if response.status_code == 200 and response.json().get("matching_file") == item["target"]:
+                hits += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(ask(item) for item in questions))
+        elapsed = time.perf_counter() - started
+
+    return {
+        **summarize(samples),
+        "concurrency": concurrency,
+        "throughput_rps": len(questions) / elapsed if elapsed > 0 else 0.0,
+        "statuses": statuses,
+        "target_hit_rate": hits / len(questions) if questions else 0.0,
+    }
+
+
+async def run_size(args: argparse.Namespace, n_docs: int, workdir: str) -> Dict[str, Any]:
+    corpus = SyntheticCorpus(n_docs, seed=args.seed)
+    settings.markdown_dir = os.path.join(workdir, f"markdown-{n_docs}")
+    settings.keywords_dir = os.path.join(workdir, f"keywords-{n_docs}")
+    settings.feedback_db_path = os.path.join(workdir, f"feedback-{n_docs}.db")
+    settings.answer_cache_enabled = False
+    corpus.write(settings.markdown_dir)
+
+    llm = FakeLLMService(token_delay=args.token_delay, prompt_delay=args.prompt_delay,
+                         answer_tokens=args.answer_tokens, queue_depth=max(settings.inference_queue_depth, args.concurrency))
+    main = load_app(llm)
+    result: Dict[str, Any] = {"label": f"{n_docs}_docs", "docs": n_docs}
+
+    # Cold start extracts keywords for every document, warm start finds them all up to date
+    result["startup_cold_s"] = await start_app(main)
+    result["startup_warm_s"] = await start_app(main)
+    service = main.markdown_service
+
+    files = service.list_files()
+    result["list_files"] = summarize([_timed(service.list_files) for _ in range(args.repeat)])
+
+    questions = corpus.questions(args.questions, seed=args.seed)
+    question_keywords = [llm.keywords_for(item["question"]) for item in questions]
+    result["find_best_match"] = summarize([
+        _timed(service.keyword_service.find_best_match, keywords, files) for keywords in question_keywords
+    ])
+    result["find_best_context"] = summarize([
+        await _timed_async(service.find_best_context(item["question"], keywords, "keyword"))
+        for item, keywords in zip(questions, question_keywords)
+    ])
+
+    result["question"] = await bench_questions(main, questions, args.concurrency)
+    return result
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="bnf-bench-")
+    try:
+        runs = []
+        for n_docs in args.docs:
+            result = await run_size(args, n_docs, workdir)
+            print(json.dumps(result, indent=2))
+            runs.append(result)
+        return {"parameters": vars(args), "runs": runs}
+    finally:
+        if not args.keep_data:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=lambda value: [int(n) for n in value.split(",")], default=[10, 1000],
+                        help="Comma-separated corpus sizes (default 10,1000)")
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions in flight during the end-to-end run")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions of list_files")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds per generated token")
+    parser.add_argument("--prompt-delay", type=float, default=0.0, help="Seconds per prompt token")
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file (default benchmarks/results/pipeline-<commit>-<time>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--keep-data", action="store_true", help="Keep the generated corpus directory")
+    args = parser.parse_args()
+
+    # Per-request logging would dominate the timings
+    settings.log_level = os.getenv("BNF_LOG_LEVEL", "WARNING")
+    results = asyncio.run(run(args))
+    path = save_results("pipeline", results, args.output)
+    print(f"Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        changes = compare(baseline, results)
+        print("\n".join(changes) if changes else "No timing moved by more than 10% from the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Helpers shared by the benchmark scripts."""
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import time
+from typing import Any, Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(name: str, results: Dict[str, Any], output: Optional[str] = None) -> str:
+    """Write results as JSON, tagged with the commit they were measured on.
+
+    By default files go to benchmarks/results/<name>-<commit>-<timestamp>.json.
+    """
+    commit = git_commit()
+    results = {
+        "benchmark": name,
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        **results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{commit or 'unknown'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    return output
+
+
+def _timings(results: Any, path: str = "") -> Dict[str, float]:
+    """Flatten every *_ms and *_s value in nested results into path -> value."""
+    found: Dict[str, float] = {}
+    if isinstance(results, dict):
+        for key, value in results.items():
+            found.update(_timings(value, f"{path}.{key}" if path else str(key)))
+    elif isinstance(results, list):
+        for i, value in enumerate(results):
+            label = value.get("label", i) if isinstance(value, dict) else i
+            found.update(_timings(value, f"{path}[{label}]"))
+    elif isinstance(results, (int, float)) and (path.endswith("_ms") or path.endswith("_s")):
+        found[path] = float(results)
+    return found
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.10) -> List[str]:
+    """Describe timings that moved by more than threshold relative to a baseline run."""
+    before, after = _timings(baseline), _timings(current)
+    lines = []
+    for path in sorted(set(before) & set(after)):
+        if before[path] <= 0:
+            continue
+        change = (after[path] - before[path]) / before[path]
+        if abs(change) >= threshold:
+            marker = "slower" if change > 0 else "faster"
+            lines.append(f"{path}: {before[path]:.3f} -> {after[path]:.3f} ({change:+.0%}, {marker})")
+    return lines
@@ -0,0 +1,82 @@
+"""Synthetic markdown corpora for benchmarks.
+
+Documents are built from a Zipf-distributed vocabulary of made-up words, so a
+few terms are common across the corpus and most are rare, like product and
+feature names in real documentation. Each document also has a handful of
+topic terms of its own that questions are generated from.
+"""
+import os
+import random
+from typing import Dict, List
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "qu", "ba", "do", "fe", "gi", "ho", "ju"]
+
+QUESTION_TEMPLATES = [
+    "How do I configure {0} with {1}?",
+    "What is the difference between {0} and {1}?",
+    "Why does {0} fail when {1} is enabled?",
+    "How can I set up {0} for {1} and {2}?",
+    "Where do I find the {0} settings for {1}?",
+]
+
+
+def make_vocabulary(size: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 6))))
+    return sorted(words)
+
+
+class SyntheticCorpus:
+    """n_docs markdown documents plus questions that target them."""
+
+    def __init__(self, n_docs: int, seed: int = 0, vocab_size: int = 20000, sections_per_doc: int = 5,
+                 words_per_section: int = 80, topic_terms: int = 4):
+        self.n_docs = n_docs
+        self.seed = seed
+        self.sections_per_doc = sections_per_doc
+        self.words_per_section = words_per_section
+        self.vocabulary = make_vocabulary(vocab_size + n_docs * topic_terms, seed)
+        # The tail of the vocabulary is split into per-document topic terms
+        self.common = self.vocabulary[:vocab_size]
+        self.weights = [1 / (rank + 1) for rank in range(vocab_size)]
+        tail = self.vocabulary[vocab_size:]
+        self.topics: Dict[str, List[str]] = {
+            self.filename(i): tail[i * topic_terms:(i + 1) * topic_terms] for i in range(n_docs)
+        }
+
+    @staticmethod
+    def filename(i: int) -> str:
+        return f"doc{i:06d}"
+
+    def document(self, i: int) -> str:
+        rng = random.Random(self.seed * 1_000_003 + i)
+        topics = self.topics[self.filename(i)]
+        parts = [f"# {topics[0].title()} {topics[1]}\n"]
+        for section in range(self.sections_per_doc):
+            words = rng.choices(self.common, weights=self.weights, k=self.words_per_section)
+            # Topic terms are repeated so keyword extraction picks them up
+            for topic in topics:
+                words.insert(rng.randrange(len(words) + 1), topic)
+            heading = " ".join(rng.sample(topics, 2) + rng.sample(self.common[:200], 1))
+            parts.append(f"## {heading}\n\n{' '.join(words)}.\n")
+            if section % 2 == 1:
+                parts.append(f"```\n{topics[0]} --flag {rng.choice(self.common)}\n```\n")
+        return "\n".join(parts)
+
+    def write(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for i in range(self.n_docs):
+            with open(os.path.join(directory, f"{self.filename(i)}.md"), "w", encoding="utf-8") as f:
+                f.write(self.document(i))
+
+    def questions(self, n: int, seed: int = 1) -> List[Dict[str, str]]:
+        """Questions phrased around one document's topic terms, with that document as the target."""
+        rng = random.Random(self.seed * 7919 + seed)
+        questions = []
+        for _ in range(n):
+            filename = self.filename(rng.randrange(self.n_docs))
+            terms = rng.sample(self.topics[filename], 3)
+            questions.append({"question": rng.choice(QUESTION_TEMPLATES).format(*terms), "target": filename})
+        return questions
@@ -0,0 +1,188 @@
+"""Deterministic stand-ins for the model-backed services.
+
+FakeLLMService implements the parts of LLMService the pipeline uses. It runs
+every completion on a real InferenceQueue and sleeps for a configurable time
+per prompt and completion token, so queueing behaves like the real server
+without a GGUF model. NullVectorStore replaces VectorStore when embeddings
+are not under test.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from services.config import settings
+from services.inference_queue import PRIORITY_INTERACTIVE, InferenceQueue
+
+WORD_PATTERN = re.compile(r"[a-z][a-z0-9]{3,}")
+
+STOPWORDS = {
+    "what", "when", "where", "which", "with", "that", "this", "from", "have", "does",
+    "into", "about", "there", "their", "should", "would", "could", "your", "then", "than",
+}
+
+
+class FakeLLMService:
+    """LLMService look-alike whose latency is prompt_delay and token_delay seconds per token."""
+
+    def __init__(self, token_delay: float = 0.0, prompt_delay: float = 0.0, answer_tokens: int = 64,
+                 n_ctx: int = 2048, max_tokens: int = 512, queue_depth: int = 8, name: str = "fake"):
+        self.token_delay = token_delay
+        self.prompt_delay = prompt_delay
+        self.answer_tokens = answer_tokens
+        self.n_ctx = n_ctx
+        self.max_tokens = max_tokens
+        self.model_id = f"{name}.gguf"
+        self.sampling: Dict[str, Any] = {"max_tokens": max_tokens}
+        self.queue = InferenceQueue(max_depth=queue_depth, name=f"inference-{name}")
+
+    loaded = True
+
+    async def load(self):
+        pass
+
+    async def warm_up(self):
+        await self.queue.submit(lambda: self._run("Hello", 4))
+
+    def count_tokens(self, text: str) -> int:
+        return len(text.split())
+
+    def truncate_tokens(self, text: str, max_tokens: int) -> str:
+        words = text.split()
+        return text if len(words) <= max_tokens else " ".join(words[:max_tokens])
+
+    def available_tokens(self, prompt: str, max_tokens: int) -> int:
+        return max(0, self.n_ctx - max_tokens - self.count_tokens(prompt))
+
+    def context_budget(self, question: str) -> int:
+        return min(settings.context_token_budget, self.available_tokens(question, self.max_tokens))
+
+    def _run(self, prompt: str, completion_tokens: int):
+        time.sleep(self.prompt_delay * self.count_tokens(prompt) + self.token_delay * completion_tokens)
+
+    @staticmethod
+    def keywords_for(text: str, limit: int = 12) -> List[str]:
+        """The keywords the fake model extracts: the most frequent non-trivial words."""
+        counts = Counter(word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS)
+        return [word for word, _ in counts.most_common(limit)]
+
+    async def generate_json(self, prompt: str, grammar: str, max_tokens: Optional[int] = None,
+                            prefix_name: Optional[str] = None, prefix: str = "",
+                            priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+        text = prompt
+        if text.startswith(prefix) and prefix:
+            text = text[len(prefix):]
+        elif "Text to analyze:" in text:
+            text = text.split("Text to analyze:", 1)[1]
+        keywords = self.keywords_for(text.rsplit("JSON:", 1)[0])
+        completion = json.dumps({"keywords": keywords})
+        completion_tokens = 3 * len(keywords) + 4
+
+        started = time.monotonic()
+        await self.queue.submit(lambda: self._run(prompt, completion_tokens), priority)
+        return {
+            "text": completion,
+            "finish_reason": "stop",
+            "completion_tokens": completion_tokens,
+            "seconds": time.monotonic() - started,
+        }
+
+    def _answer_text(self, context: str) -> str:
+        words = context.split()
+        filler = (words * (self.answer_tokens // max(1, len(words)) + 1))[:self.answer_tokens]
+        return " ".join(filler)
+
+    async def generate_answer(self, question: str, context: str = "") -> Dict[str, Any]:
+        await self.queue.submit(lambda: self._run(question + context, self.answer_tokens))
+        return {"answer": self._answer_text(context), "certainty": 0.8, "model": self.model_id}
+
+    async def stream_answer(self, question: str, context: str = "") -> AsyncIterator[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        answer = self._answer_text(context)
+
+        def run():
+            try:
+                time.sleep(self.prompt_delay * self.count_tokens(question + context))
+                for word in answer.split():
+                    if stop.is_set():
+                        break
+                    time.sleep(self.token_delay)
+                    loop.call_soon_threadsafe(tokens.put_nowait, word + " ")
+            finally:
+                loop.call_soon_threadsafe(tokens.put_nowait, None)
+
+        job = asyncio.ensure_future(self.queue.submit(run))
+        try:
+            while True:
+                token = await tokens.get()
+                if token is None:
+                    break
+                yield {"token": token}
+            await job
+            yield {
+                "answer": answer,
+                "certainty": 0.8,
+                "model": self.model_id,
+                "time_to_first_token": None,
+                "tokens_per_second": None,
+            }
+        finally:
+            stop.set()
+            if not job.done():
+                job.cancel()
+
+
+class NullVectorStore:
+    """VectorStore replacement that embeds nothing and keeps feedback texts in memory.
+
+    Embedding and hybrid retrieval fall back to keyword ranking with it, and
+    the answer cache always misses.
+    """
+
+    def __init__(self):
+        self.feedback: List[Dict[str, Any]] = []
+
+    def warm_up(self):
+        pass
+
+    def has_document_sections(self, file_name: str, content_hash: str) -> bool:
+        return True
+
+    def index_document_sections(self, file_name: str, content_hash: str, sections: List[Dict[str, Any]]):
+        pass
+
+    def index_sections_batch(self, documents: List[Tuple[str, str, List[Dict[str, Any]]]], batch_size: int = 4096):
+        pass
+
+    def remove_document_sections(self, file_name: str):
+        pass
+
+    def embed_query(self, query: str) -> Optional[List[float]]:
+        return None
+
+    def search_sections(self, query: str, n_results: int = 20,
+                        embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        return []
+
+    def add_qa_pair(self, *args, **kwargs):
+        pass
+
+    def find_cached_answers(self, question: str, max_distance: float, min_certainty: float) -> List[Dict[str, Any]]:
+        return []
+
+    def delete_qa_pair(self, qa_id: str):
+        pass
+
+    def invalidate_source(self, file_name: str):
+        pass
+
+    def add_feedback_embeddings(self, entries: List[Dict[str, Any]]):
+        self.feedback.extend(entries)
+
+    def legacy_feedback(self) -> List[Dict[str, Any]]:
+        return []
@@ -0,0 +1,319 @@
+"""Replay a mix of API traffic against the app and report per-endpoint stats.
+
+Requests are drawn from a weighted traffic mix of questions, document reads,
+file listings, feedback writes and admin saves. Load is either open-loop at
+a target request rate (--rps) or closed-loop with a fixed number of clients
+(--concurrency). The target is a running server (--url) or the app loaded
+in-process, optionally with the fake LLM and a synthetic corpus (--fake-llm).
+
+    python -m benchmarks.loadgen --fake-llm --token-delay 0.02 --rps 20 --duration 30
+    python -m benchmarks.loadgen --url http://localhost:8000 --concurrency 8 --mix mix.json
+
+For each endpoint it reports throughput, p50/p95/p99 latency, the error rate
+and the rate of requests turned away with 429 or 503. In-process runs also
+sample event-loop lag, which shows when a handler blocks the loop.
+
+Against a running server, feedback writes are stored and saves rewrite a
+document with its current content, which still triggers re-indexing.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.common import save_results, summarize
+
+# Relative weights of each kind of request
+DEFAULT_MIX = {"question": 0.6, "read": 0.25, "list": 0.05, "feedback": 0.08, "save": 0.02}
+
+MIXES = {
+    "default": DEFAULT_MIX,
+    "questions": {"question": 1.0},
+    "read-heavy": {"question": 0.2, "read": 0.6, "list": 0.1, "feedback": 0.1},
+    "editing": {"question": 0.4, "read": 0.3, "feedback": 0.1, "save": 0.2},
+}
+
+REJECTED_STATUSES = (429, 503)
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.exceptions = 0
+
+    def record(self, seconds: float, status: Optional[int]):
+        self.latencies.append(seconds)
+        if status is None:
+            self.exceptions += 1
+            return
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        total = len(self.latencies)
+        rejected = sum(self.statuses.get(str(status), 0) for status in REJECTED_STATUSES)
+        errors = self.exceptions + sum(
+            count for status, count in self.statuses.items()
+            if int(status) >= 400 and int(status) not in REJECTED_STATUSES
+        )
+        return {
+            **summarize(self.latencies),
+            "throughput_rps": total / elapsed if elapsed > 0 else 0.0,
+            "statuses": self.statuses,
+            "exceptions": self.exceptions,
+            "error_rate": errors / total if total else 0.0,
+            "rejected_rate": rejected / total if total else 0.0,
+        }
+
+
+class TrafficMix:
+    """Turns a weighted mix into concrete requests against the known documents."""
+
+    def __init__(self, weights: Dict[str, float], files: List[str], questions: List[str], seed: int):
+        unknown = set(weights) - set(DEFAULT_MIX)
+        if unknown:
+            raise ValueError(f"Unknown request kinds in mix: {sorted(unknown)}")
+        if not files and any(weights.get(kind) for kind in ("read", "feedback", "save")):
+            raise ValueError("The target has no markdown files to read, rate or save")
+        self.kinds = [kind for kind, weight in weights.items() if weight > 0]
+        self.weights = [weights[kind] for kind in self.kinds]
+        self.files = files
+        self.questions = questions
+        self.rng = random.Random(seed)
+
+    def next(self) -> str:
+        return self.rng.choices(self.kinds, weights=self.weights)[0]
+
+    async def send(self, client: httpx.AsyncClient, kind: str) -> httpx.Response:
+        if kind == "question":
+            return await client.post("/api/question", json={"question": self.rng.choice(self.questions)})
+        if kind == "list":
+            return await client.get("/api/markdown/files")
+        filename = self.rng.choice(self.files)
+        if kind == "read":
+            return await client.get(f"/api/markdown/{filename}")
+        if kind == "feedback":
+            return await client.post("/api/feedback", json={
+                "file_name": filename,
+                "is_positive": self.rng.random() < 0.7,
+                "feedback_text": "load test feedback",
+            })
+        # Saves write back the current content so documents are left unchanged
+        current = await client.get(f"/api/markdown/{filename}")
+        if current.status_code != 200:
+            return current
+        return await client.post(f"/api/markdown/{filename}", json={"content": current.json()["content"]})
+
+
+async def _timed_request(mix: TrafficMix, client: httpx.AsyncClient, kind: str, stats: Dict[str, EndpointStats]):
+    started = time.perf_counter()
+    status = None
+    try:
+        response = await mix.send(client, kind)
+        status = response.status_code
+    except httpx.HTTPError:
+        pass
+    stats[kind].record(time.perf_counter() - started, status)
+
+
+async def open_loop(mix: TrafficMix, client: httpx.AsyncClient, stats: Dict[str, EndpointStats],
+                    rps: float, duration: float, poisson: bool, max_in_flight: int) -> int:
+    """Start requests at rps regardless of how fast earlier ones finish.
+
+    Arrivals that would exceed max_in_flight are dropped and counted, since
+    the client, not the server, would be the bottleneck.
+    """
+    loop = asyncio.get_running_loop()
+    pending = set()
+    dropped = 0
+    deadline = loop.time() + duration
+    next_at = loop.time()
+    while next_at < deadline:
+        await asyncio.sleep(max(0.0, next_at - loop.time()))
+        if len(pending) >= max_in_flight:
+            dropped += 1
+        else:
+            task = asyncio.ensure_future(_timed_request(mix, client, mix.next(), stats))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        next_at += mix.rng.expovariate(rps) if poisson else 1.0 / rps
+    if pending:
+        await asyncio.gather(*pending)
+    return dropped
+
+
+async def closed_loop(mix: TrafficMix, client: httpx.AsyncClient, stats: Dict[str, EndpointStats],
+                      concurrency: int, duration: float):
+    """Run concurrency clients that each send their next request as soon as the last one finished."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+
+    async def worker():
+        while loop.time() < deadline:
+            await _timed_request(mix, client, mix.next(), stats)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def sample_loop_lag(stop: asyncio.Event, samples: List[float], interval: float = 0.01):
+    """Record how late a short sleep wakes up; large values mean something blocked the loop."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval))
+
+
+async def _in_process_client(args: argparse.Namespace, workdir: str) -> Tuple[httpx.AsyncClient, List[str]]:
+    """Start the app in-process and return a client for it plus questions to ask."""
+    if not args.fake_llm:
+        import main
+        await main.startup_event()
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://load"), []
+
+    from benchmarks.app import load_app, start_app
+    from benchmarks.corpus import SyntheticCorpus
+    from benchmarks.fakes import FakeLLMService
+    from services.config import settings
+
+    corpus = SyntheticCorpus(args.docs, seed=args.seed)
+    settings.markdown_dir = os.path.join(workdir, "markdown")
+    settings.keywords_dir = os.path.join(workdir, "keywords")
+    settings.feedback_db_path = os.path.join(workdir, "feedback.db")
+    corpus.write(settings.markdown_dir)
+    main = load_app(FakeLLMService(token_delay=args.token_delay, prompt_delay=args.prompt_delay,
+                                   answer_tokens=args.answer_tokens, queue_depth=settings.inference_queue_depth))
+    await start_app(main)
+    questions = [item["question"] for item in corpus.questions(max(100, args.docs), seed=args.seed)]
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://load"), questions
+
+
+def _load_questions(path: Optional[str], files: List[str]) -> List[str]:
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    return [f"How do I use {filename.replace('-', ' ').replace('_', ' ')}?" for filename in files] or [
+        "How do I get started?"
+    ]
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="bnf-load-")
+    in_process = args.url is None
+    try:
+        questions: List[str] = []
+        if in_process:
+            client, questions = await _in_process_client(args, workdir)
+        else:
+            client = httpx.AsyncClient(base_url=args.url, limits=httpx.Limits(max_connections=args.max_in_flight))
+
+        async with client:
+            client.timeout = httpx.Timeout(args.timeout)
+            files = (await client.get("/api/markdown/files")).json()["files"]
+            files = [filename[:-3] if filename.endswith(".md") else filename for filename in files]
+            mix = TrafficMix(args.mix, files, questions or _load_questions(args.questions_file, files), args.seed)
+            stats: Dict[str, EndpointStats] = {kind: EndpointStats() for kind in mix.kinds}
+
+            lag_samples: List[float] = []
+            stop = asyncio.Event()
+            lag_task = asyncio.ensure_future(sample_loop_lag(stop, lag_samples)) if in_process else None
+
+            started = time.perf_counter()
+            dropped = 0
+            if args.rps:
+                dropped = await open_loop(mix, client, stats, args.rps, args.duration, args.poisson, args.max_in_flight)
+            else:
+                await closed_loop(mix, client, stats, args.concurrency, args.duration)
+            elapsed = time.perf_counter() - started
+
+            if lag_task is not None:
+                stop.set()
+                await lag_task
+
+        all_stats = EndpointStats()
+        for endpoint in stats.values():
+            all_stats.latencies.extend(endpoint.latencies)
+            all_stats.exceptions += endpoint.exceptions
+            for status, count in endpoint.statuses.items():
+                all_stats.statuses[status] = all_stats.statuses.get(status, 0) + count
+
+        results: Dict[str, Any] = {
+            "parameters": {**vars(args), "target": args.url or ("in-process fake" if args.fake_llm else "in-process")},
+            "elapsed_s": elapsed,
+            "dropped_arrivals": dropped,
+            "total": all_stats.report(elapsed),
+            "endpoints": {kind: endpoint.report(elapsed) for kind, endpoint in stats.items()},
+        }
+        if lag_samples:
+            results["event_loop_lag"] = summarize(lag_samples)
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _print_table(results: Dict[str, Any]):
+    print(f"{'endpoint':<10} {'reqs':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'429/503':>8}")
+    rows = list(results["endpoints"].items()) + [("total", results["total"])]
+    for kind, report in rows:
+        if not report.get("count"):
+            continue
+        print(f"{kind:<10} {report['count']:>6} {report['throughput_rps']:>8.1f} {report['p50_ms']:>9.1f} "
+              f"{report['p95_ms']:>9.1f} {report['p99_ms']:>9.1f} {report['error_rate']:>7.1%} "
+              f"{report['rejected_rate']:>8.1%}")
+    if "event_loop_lag" in results:
+        lag = results["event_loop_lag"]
+        print(f"event loop lag: p50 {lag['p50_ms']:.1f} ms, p99 {lag['p99_ms']:.1f} ms, max {lag['max_ms']:.1f} ms")
+    if results["dropped_arrivals"]:
+        print(f"{results['dropped_arrivals']} arrivals dropped at --max-in-flight")
+
+
+def _parse_mix(value: str) -> Dict[str, float]:
+    if value in MIXES:
+        return MIXES[value]
+    if os.path.exists(value):
+        with open(value) as f:
+            return json.load(f)
+    return json.loads(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server; the app is loaded in-process if omitted")
+    parser.add_argument("--fake-llm", action="store_true", help="In-process only: use the fake LLM and a synthetic corpus")
+    parser.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX,
+                        help=f"Preset ({', '.join(MIXES)}), JSON file or inline JSON of request weights")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rps", type=float, help="Open-loop target request rate")
+    load.add_argument("--concurrency", type=int, default=8, help="Closed-loop number of clients (default 8)")
+    parser.add_argument("--poisson", action="store_true", help="Poisson instead of evenly spaced arrivals with --rps")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--questions-file", help="Questions to ask, one per line (default: derived from file names)")
+    parser.add_argument("--docs", type=int, default=200, help="Synthetic corpus size with --fake-llm")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Fake LLM seconds per generated token")
+    parser.add_argument("--prompt-delay", type=float, default=0.0, help="Fake LLM seconds per prompt token")
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file (default benchmarks/results/load-<commit>-<time>.json)")
+    args = parser.parse_args()
+    if args.fake_llm and args.url:
+        parser.error("--fake-llm only applies to in-process runs")
+
+    if args.url is None:
+        from services.config import settings
+        settings.log_level = os.getenv("BNF_LOG_LEVEL", "WARNING")
+    results = asyncio.run(run(args))
+    _print_table(results)
+    print(f"Results written to {save_results('load', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,33 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any, AsyncIterator, Awaitable, Tuple, TypeVar
+from email.utils import formatdate, parsedate_to_datetime
+import asyncio
+import hashlib
 import json
+import logging
 import os
+import tarfile
+import tempfile
 
-from services.llm_service import LLMService
-from services.markdown_service import MarkdownService
+from services.inference_queue import QueueFullError
+from services.bulk_import import BulkImporter, default_checkpoint_path, source_fingerprint
+from services.config import configure_logging, settings
+from services.diffs import render_unified
+from services.feedback_store import FeedbackStore
+from services.jobs import JobQueue
+from services.keyword_service import normalize_question
+from services.llm_service import LLMService, ModelNotLoadedError
+from services.markdown_service import MarkdownService, RetrievalResult
+from services.metrics import metrics
+from services.single_flight import SingleFlight
 from services.vector_store import VectorStore
 
+configure_logging()
+logger = logging.getLogger("booknotfound")
+
 app = FastAPI(title="BookNotFound API")
 
 # Configure CORS
@@ -18,22 +37,195 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count"],
 )
 
-# Initialize services
-llm_service = LLMService()
+# Initialize services; models and the vector store are loaded in the background after startup
+llm_service = LLMService.for_profile(settings.answer_profile)
+keyword_llm_service = LLMService.for_profile(settings.keyword_profile)
 markdown_service = None
-vector_store = VectorStore()
+vector_store: Optional[VectorStore] = None
+feedback_store: Optional[FeedbackStore] = None
+# Embeds feedback text in batches once the vector store is loaded
+feedback_jobs = JobQueue("feedback")
+# Bulk imports, kept apart so they do not hold up re-indexing of single saves
+import_jobs = JobQueue("imports")
+startup_task: Optional[asyncio.Task] = None
+# Progress of the background startup, reported by /readyz
+readiness: Dict[str, Any] = {"models": "pending", "embeddings": "pending", "warmup": "pending", "error": None}
+# Identical questions asked at the same time share one answer
+question_flight = SingleFlight("question")
+
+def _answer_cache_hit_rate() -> float:
+    hits = metrics.counter_value("answer_cache_lookups_total", result="hit")
+    lookups = hits + metrics.counter_value("answer_cache_lookups_total", result="miss")
+    return hits / lookups if lookups > 0 else 0.0
+
+metrics.gauge("cache_hit_rate", _answer_cache_hit_rate, cache="answers")
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize async services on startup."""
-    global markdown_service
-    markdown_service = await MarkdownService.create(llm_service)
+    """Start serving at once and load models in the background.
+
+    Documents can be listed and read immediately. Questions are turned away
+    with 503 until the models are loaded, and /readyz reports ready once
+    models are warm and the index is refreshed.
+    """
+    global markdown_service, feedback_store, startup_task
+    markdown_service = MarkdownService(llm_service, None, keyword_llm_service)
+    if feedback_store is not None:
+        feedback_store.close()
+    feedback_store = FeedbackStore(settings.feedback_db_path)
+    readiness.update({"models": "pending", "embeddings": "pending", "warmup": "pending", "error": None})
+    startup_task = asyncio.create_task(load_resources())
+
+async def _load_models():
+    readiness["models"] = "loading"
+    await asyncio.gather(llm_service.load(), keyword_llm_service.load())
+    readiness["models"] = "ready"
+
+async def _load_vector_store():
+    global vector_store
+    readiness["embeddings"] = "loading"
+    with metrics.span("model_load", profile="embeddings"):
+        store = await asyncio.to_thread(VectorStore)
+    vector_store = store
+    markdown_service.vector_store = store
+    # Cached answers built from a document are dropped when it changes
+    markdown_service.change_listeners.append(store.invalidate_source)
+    # Feedback used to be kept in the vector store
+    await asyncio.to_thread(feedback_store.import_once, "vector_store", store.legacy_feedback)
+    readiness["embeddings"] = "ready"
+    queue_feedback_embeddings()
+
+async def _warm_up():
+    readiness["warmup"] = "running"
+    # Profiles sharing a model share its queue; warm each model once
+    services: Dict[int, LLMService] = {}
+    for service in (llm_service, keyword_llm_service):
+        services.setdefault(id(service.queue), service)
+    await asyncio.gather(
+        *(service.warm_up() for service in services.values()),
+        asyncio.to_thread(vector_store.warm_up)
+    )
+    readiness["warmup"] = "done"
+
+async def load_resources():
+    """Load models and embeddings, warm them up, then refresh the document index."""
+    try:
+        await asyncio.gather(_load_models(), _load_vector_store())
+        if settings.warmup_enabled:
+            await _warm_up()
+        else:
+            readiness["warmup"] = "skipped"
+    except Exception as e:
+        logger.exception("Startup failed")
+        readiness["error"] = str(e)
+        return
+    markdown_service.start_indexing()
+
+def queue_feedback_embeddings():
+    """Embed pending feedback text in the background; saves arriving meanwhile join the same batch."""
+    if vector_store is not None:
+        feedback_jobs.submit("embed", "feedback", _embed_feedback)
+
+async def _embed_feedback(batch_size: int = 64) -> Dict[str, int]:
+    embedded = 0
+    while True:
+        entries = await asyncio.to_thread(feedback_store.pending_embeddings, batch_size)
+        if not entries:
+            return {"embedded": embedded}
+        with metrics.span("embedding", target="feedback"):
+            await asyncio.to_thread(vector_store.add_feedback_embeddings, entries)
+        await asyncio.to_thread(feedback_store.mark_embedded, [entry["id"] for entry in entries])
+        embedded += len(entries)
+
+def is_ready() -> bool:
+    return (
+        readiness["models"] == "ready"
+        and readiness["embeddings"] == "ready"
+        and readiness["warmup"] in ("done", "skipped")
+        and markdown_service is not None
+        and markdown_service.index_status.get("state") == "ready"
+    )
+
+def not_ready_response(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=detail,
+        headers={"Retry-After": str(int(settings.inference_retry_after))}
+    )
+
+def require_models():
+    if readiness["models"] != "ready":
+        raise not_ready_response("Models are still loading")
+
+T = TypeVar("T")
+
+async def run_until_disconnect(request: Request, work: Awaitable[T], poll_interval: float = 0.5) -> T:
+    """Await work, cancelling it if the client goes away before it finishes."""
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                # 499 is never seen by the client; it only marks the request in logs
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+def check_admission():
+    """Reject a question early if any model it may need has a full queue."""
+    llm_service.queue.check_admission()
+    keyword_llm_service.queue.check_admission()
+
+def queue_full_response(e: QueueFullError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(int(e.retry_after))}
+    )
+
+def _etag(*parts: str) -> str:
+    return '"' + hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:32] + '"'
+
+def _not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when no entity tags were sent."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def conditional_response(request: Request, payload: Dict[str, Any], etag: str, last_modified: float) -> Response:
+    """JSON response with validators, or 304 if the client's copy is current.
+
+    Cache-Control: no-cache lets clients keep the body but revalidate on every use.
+    """
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
 
 class Question(BaseModel):
     question: str
     context: Optional[str] = None
+    # Overrides BNF_RETRIEVAL_MODE for this request
+    retrieval_mode: Optional[Literal["keyword", "embedding", "hybrid"]] = None
 
 class Answer(BaseModel):
     answer: str
@@ -42,6 +234,7 @@ class Answer(BaseModel):
     matching_file: Optional[str]
     needs_new_doc: bool
     suggested_keywords: Optional[List[str]]
+    cached: bool = False
 
 class FeedbackRequest(BaseModel):
     question_id: str
@@ -52,52 +245,232 @@ class FeedbackRequest(BaseModel):
 async def root():
     return {"message": "Welcome to BookNotFound API"}
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: models are loaded and warm and the document index is refreshed."""
+    body = {
+        "status": "ready" if is_ready() else "starting",
+        **readiness,
+        "index": markdown_service.index_status.get("state") if markdown_service is not None else None,
+    }
+    if readiness["error"] is not None:
+        body["status"] = "failed"
+    return JSONResponse(body, status_code=200 if body["status"] == "ready" else 503)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Counters, gauges and latency histograms in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/markdown/files")
-async def list_markdown_files():
+async def list_markdown_files(request: Request):
     try:
         files = markdown_service.list_files()
-        return {"files": files}
+        last_modified = os.stat(markdown_service.storage_dir).st_mtime
+        return conditional_response(request, {"files": files}, _etag(*sorted(files)), last_modified)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/index/status")
+async def get_index_status():
+    return markdown_service.index_status
+
 @app.post("/api/question", response_model=Answer)
-async def ask_question(question: Question):
+async def ask_question(question: Question, request: Request):
     try:
-        # Extract keywords from the question
-        question_keywords = await markdown_service.keyword_service.extract_keywords(question.question)
-        
-        # Find best context using keywords
-        context = await markdown_service.find_best_context(question.question)
-        
-        if not context:
-            # No good match found, don't return any matching file
-            return {
-                "answer": "Based on the provided context, I was unable to find any relevant information about this topic. Please provide more context or rephrase the question to improve my ability to assist you.",
-                "certainty": 0.0,
-                "model": markdown_service.llm_service.llm.model_path.split('/')[-1],
-                "matching_file": None,
-                "needs_new_doc": True,
-                "suggested_keywords": question_keywords
-            }
-        
-        # If we have a context, get the matching file
-        matching_file = markdown_service.get_current_matching_file()
-        
-        # Generate answer using the matched context
-        response = await markdown_service.llm_service.generate_answer(question.question, context)
-        
-        # Add matching file and certainty to response
-        return {
-            "answer": response["answer"],
-            "certainty": response["certainty"],
-            "model": markdown_service.llm_service.llm.model_path.split('/')[-1],
-            "matching_file": matching_file,
-            "needs_new_doc": False,
-            "suggested_keywords": question_keywords
-        }
+        require_models()
+        # Turn the request away early rather than letting the queue grow unbounded
+        check_admission()
+        return await run_until_disconnect(request, _coalesced_answer(question))
+    except QueueFullError as e:
+        raise queue_full_response(e)
+    except ModelNotLoadedError:
+        # Tokenizing never loads a model on the event loop
+        raise not_ready_response("Models are still loading")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _model_name() -> str:
+    return markdown_service.llm_service.model_id
+
+def _no_match_answer(question_keywords: List[str]) -> Dict[str, Any]:
+    return {
+        "answer": "Based on the provided context, I was unable to find any relevant information about this topic. Please provide more context or rephrase the question to improve my ability to assist you.",
+        "certainty": 0.0,
+        "model": _model_name(),
+        "matching_file": None,
+        "needs_new_doc": True,
+        "suggested_keywords": question_keywords
+    }
+
+async def _cached_answer(question: str) -> Optional[Dict[str, Any]]:
+    """Return a stored answer to an equivalent question if its sources are unchanged."""
+    if not settings.answer_cache_enabled or vector_store is None:
+        return None
+    with metrics.span("answer_cache_lookup"):
+        candidates = await asyncio.to_thread(
+            vector_store.find_cached_answers,
+            question,
+            settings.answer_cache_max_distance,
+            settings.answer_cache_min_certainty
+        )
+    cached = None
+    for candidate in candidates:
+        if all(markdown_service.document_hash(filename) == digest
+               for filename, digest in candidate["source_hashes"].items()):
+            cached = candidate
+            break
+        # A source changed after the answer was stored
+        await asyncio.to_thread(vector_store.delete_qa_pair, candidate["id"])
+    if cached is None:
+        metrics.inc("answer_cache_lookups_total", result="miss")
+        return None
+    metrics.inc("answer_cache_lookups_total", result="hit")
+    return {
+        "answer": cached["answer"],
+        "certainty": cached["certainty"],
+        "model": _model_name(),
+        "matching_file": cached["source_file"],
+        "needs_new_doc": False,
+        "suggested_keywords": None,
+        "cached": True
+    }
+
+async def _remember_answer(question: str, retrieval: RetrievalResult, response: Dict[str, Any]):
+    """Store a confident answer so equivalent questions can be served from the cache."""
+    if (not settings.answer_cache_enabled or vector_store is None
+            or response["certainty"] < settings.answer_cache_min_certainty):
+        return
+    try:
+        await asyncio.to_thread(
+            vector_store.add_qa_pair,
+            question,
+            response["answer"],
+            response["certainty"],
+            retrieval.file_hashes,
+            retrieval.file
+        )
+    except Exception as e:
+        logger.warning("Error storing answer in cache: %s", e)
+
+async def _retrieve(question: Question) -> Tuple[Optional[List[str]], RetrievalResult]:
+    """Retrieve context, extracting question keywords only if the retrieval mode needs them."""
+    mode = question.retrieval_mode or settings.retrieval_mode
+    question_keywords = None
+    if mode != "embedding":
+        # Extract keywords from the question
+        with metrics.span("question_keywords"):
+            question_keywords = await markdown_service.keyword_service.extract_question_keywords(question.question)
+    with metrics.span("retrieval", mode=mode):
+        retrieval = await markdown_service.find_best_context(question.question, question_keywords, mode)
+    return question_keywords, retrieval
+
+async def _coalesced_answer(question: Question) -> Dict[str, Any]:
+    """Answer a question, joining an identical one already being answered.
+
+    Questions are identical if they normalize to the same text, use the same
+    retrieval mode and arrive while the documents are at the same version.
+    """
+    key = (
+        normalize_question(question.question),
+        question.retrieval_mode or settings.retrieval_mode,
+        markdown_service.version
+    )
+    response = await question_flight.do(key, lambda: _answer_question(question))
+    # Each caller gets its own copy of the shared answer
+    return dict(response)
+
+async def _answer_question(question: Question) -> Dict[str, Any]:
+    cached = await _cached_answer(question.question)
+    if cached is not None:
+        return cached
+
+    question_keywords, retrieval = await _retrieve(question)
+    
+    if not retrieval.context:
+        # No good match found, don't return any matching file
+        if question_keywords is None:
+            question_keywords = await markdown_service.keyword_service.extract_question_keywords(question.question)
+        return _no_match_answer(question_keywords)
+    
+    # Generate answer using the matched context
+    with metrics.span("answer"):
+        response = await markdown_service.llm_service.generate_answer(question.question, retrieval.context)
+    await _remember_answer(question.question, retrieval, response)
+    
+    # Add matching file and certainty to response
+    return {
+        "answer": response["answer"],
+        "certainty": response["certainty"],
+        "model": _model_name(),
+        "matching_file": retrieval.file,
+        "needs_new_doc": False,
+        "suggested_keywords": question_keywords
+    }
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/question/stream")
+async def ask_question_stream(question: Question):
+    """Answer a question as Server-Sent Events.
+
+    Emits one `token` event per generated token and a final `answer` event
+    carrying the same fields as the Answer model. Starlette cancels the stream
+    when the client disconnects, which stops generation.
+    """
+    require_models()
+    try:
+        check_admission()
+    except QueueFullError as e:
+        raise queue_full_response(e)
+    return StreamingResponse(
+        _stream_answer(question),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _stream_answer(question: Question) -> AsyncIterator[str]:
+    try:
+        cached = await _cached_answer(question.question)
+        if cached is not None:
+            yield _sse("answer", cached)
+            return
+
+        question_keywords, retrieval = await _retrieve(question)
+
+        if not retrieval.context:
+            if question_keywords is None:
+                question_keywords = await markdown_service.keyword_service.extract_question_keywords(question.question)
+            yield _sse("answer", _no_match_answer(question_keywords))
+            return
+
+        async for event in markdown_service.llm_service.stream_answer(question.question, retrieval.context):
+            if "token" in event:
+                yield _sse("token", event)
+                continue
+            await _remember_answer(question.question, retrieval, event)
+            yield _sse("answer", {
+                "answer": event["answer"],
+                "certainty": event["certainty"],
+                "model": _model_name(),
+                "matching_file": retrieval.file,
+                "needs_new_doc": False,
+                "suggested_keywords": question_keywords,
+                "cached": False,
+                "time_to_first_token": event["time_to_first_token"],
+                "tokens_per_second": event["tokens_per_second"]
+            })
+    except Exception as e:
+        yield _sse("error", {"detail": str(e)})
+
 @app.post("/api/feedback")
 async def submit_feedback(feedback: Dict[str, Any]):
     try:
@@ -116,22 +489,34 @@ async def submit_feedback(feedback: Dict[str, Any]):
             )
             return {"status": "success", "suggestion_id": suggestion_id}
         else:
-            # Just store the feedback
-            vector_store.update_feedback(
+            # Just store the feedback; only text is embedded, later and in batches
+            await asyncio.to_thread(
+                feedback_store.add,
                 file_name=file_name,
                 feedback=is_positive,
-                feedback_text=feedback_text
+                feedback_text=feedback_text,
+                question_id=feedback.get("question_id")
             )
+            if feedback_text and feedback_text.strip():
+                queue_feedback_embeddings()
             return {"status": "success"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/markdown/{filename}")
-async def get_markdown(filename: str):
+async def get_markdown(filename: str, request: Request):
     try:
-        content = markdown_service.get_markdown(filename)
+        document = markdown_service.get_document(filename)
         keywords = markdown_service.get_keywords(filename)
-        return {"content": content, "keywords": keywords}
+        # Keywords change after a background re-index, so they are part of the validators
+        etag = _etag(document.digest, *keywords)
+        last_modified = max(
+            document.mtime_ns / 1e9,
+            markdown_service.keyword_service.keywords_modified(filename) or 0.0
+        )
+        return conditional_response(request, {"content": document.content, "keywords": keywords}, etag, last_modified)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
     except Exception as e:
@@ -139,24 +524,131 @@ async def get_markdown(filename: str):
 
 @app.post("/api/markdown/{filename}")
 async def save_markdown(filename: str, content: Dict[str, str]):
+    """Save a document; keywords and embeddings are rebuilt by the returned job."""
     try:
-        await markdown_service.save_markdown(filename, content["content"])
-        return {"status": "success"}
+        job = markdown_service.queue_save(filename, content["content"])
+        return {"status": "success", "job_id": job.id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    for jobs in (markdown_service.jobs, import_jobs, feedback_jobs):
+        job = jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+    raise HTTPException(status_code=404, detail="Job not found")
+
+@app.post("/api/import", status_code=202)
+async def import_documents(request: Request):
+    """Import a tarball of markdown files sent as the request body.
+
+    Returns a job_id whose progress is reported by /api/jobs/{job_id}.
+    Uploading the same tarball again resumes an interrupted import.
+    """
+    require_models()
+    if vector_store is None:
+        raise not_ready_response("The vector store is still loading")
+
+    fd, archive_path = tempfile.mkstemp(prefix="bnf-import-", suffix=".tar")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in request.stream():
+                await asyncio.to_thread(f.write, chunk)
+        if not await asyncio.to_thread(tarfile.is_tarfile, archive_path):
+            raise HTTPException(status_code=400, detail="Request body is not a tar archive")
+        fingerprint = await asyncio.to_thread(source_fingerprint, archive_path)
+    except BaseException:
+        os.remove(archive_path)
+        raise
+
+    importer = BulkImporter(markdown_service, checkpoint_path=default_checkpoint_path(fingerprint))
+
+    async def run_import():
+        try:
+            return await importer.run(archive_path)
+        finally:
+            os.remove(archive_path)
+
+    job = import_jobs.submit("import", fingerprint, run_import)
+    if job.progress is None:
+        job.progress = importer.progress
+    else:
+        # The same archive is already queued
+        os.remove(archive_path)
+    return {"status": "accepted", "job_id": job.id}
+
 @app.get("/api/suggestions")
-async def get_suggestions():
+async def get_suggestions(status: Optional[Literal["pending", "applied", "rejected"]] = None,
+                          filename: Optional[str] = None, created_after: Optional[str] = None,
+                          created_before: Optional[str] = None, limit: int = Query(50, ge=1, le=500),
+                          offset: int = Query(0, ge=0)):
+    """A page of suggestion summaries, newest first; bodies are fetched per suggestion."""
     try:
-        suggestions = markdown_service.get_suggested_changes()
-        return {"suggestions": suggestions}
+        page = markdown_service.get_suggested_changes(status, filename, created_after, created_before, limit, offset)
+        return {**page, "limit": limit, "offset": offset}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/suggestions/{suggestion_id}")
+async def get_suggestion(suggestion_id: str):
+    try:
+        return markdown_service.get_suggestion(suggestion_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Suggestion not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/suggestions/{suggestion_id}/diff")
+async def get_suggestion_diff(suggestion_id: str, format: Literal["structured", "unified"] = "structured",
+                              from_line: int = Query(1, ge=1), max_lines: int = Query(2000, ge=1, le=20000),
+                              from_new_line: int = Query(1, ge=1)):
+    """A page of the diff between a suggestion and the revision it was made against.
+
+    Request the next page with from_line=next_from_line and
+    from_new_line=next_from_new_line until they are null.
+    """
+    try:
+        diff = markdown_service.get_suggestion_diff(suggestion_id, from_line, max_lines, from_new_line)
+        if format == "unified":
+            # File headers only on the first page, so pages concatenate into one patch. A hunk split
+            # across pages lacks context at the split, so such a patch needs git apply --unidiff-zero
+            filename = diff["filename"] if from_line == 1 and from_new_line == 1 else None
+            diff["diff"] = render_unified(diff.pop("hunks"), filename)
+        return diff
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Suggestion not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/suggestions/{suggestion_id}/apply")
+async def apply_suggestion(suggestion_id: str):
+    try:
+        suggestion = markdown_service.apply_suggestion(suggestion_id)
+        return {"status": "success", "job_id": suggestion["job_id"]}
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Suggestion not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/suggestions/{suggestion_id}/reject")
+async def reject_suggestion(suggestion_id: str, body: Optional[Dict[str, Any]] = None):
+    try:
+        markdown_service.reject_suggestion(suggestion_id, (body or {}).get("reason"))
+        return {"status": "success"}
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Suggestion not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/feedback/history/{filename}")
-async def get_feedback_history(filename: str):
+async def get_feedback_history(filename: str, response: Response, limit: int = Query(100, ge=1, le=1000),
+                               offset: int = Query(0, ge=0)):
+    """A page of a file's feedback, newest first; X-Total-Count carries the number of entries."""
     try:
-        history = vector_store.get_feedback_history(filename)
+        history = await asyncio.to_thread(feedback_store.get_feedback_history, filename, limit, offset)
+        stats = await asyncio.to_thread(feedback_store.get_file_stats, filename)
+        response.headers["X-Total-Count"] = str(stats["total_feedback"])
         return history
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,440 @@
+"""Import a directory or tarball of markdown documents in bulk.
+
+Documents are written atomically in batches. The sections of each batch are
+embedded in one call to the embedding model, and keywords are extracted by
+a pool of workers spread over one or more instances of the keyword model.
+Progress is checkpointed after every batch, so an interrupted import picks
+up where it stopped when run again on the same source.
+
+    python -m services.bulk_import docs/                   # offline, server stopped
+    python -m services.bulk_import docs.tar.gz --instances 2
+    python -m services.bulk_import docs/ --url http://localhost:8000
+
+Offline imports write to the configured storage directly and must not run
+while the server is up; with --url the documents are uploaded as a tarball
+to POST /api/import of a running server instead.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from .config import configure_logging, get_model_profile, settings
+from .document_cache import content_hash, decode_document
+from .inference_queue import PRIORITY_BACKGROUND
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImportDocument:
+    filename: str
+    content: str
+    digest: str
+
+
+def _document_name(path: str) -> Optional[str]:
+    """Storage name for a markdown path inside the source, or None to skip it.
+
+    Nested directories are flattened into the name, since documents are
+    stored in one directory.
+    """
+    parts = [part for part in path.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or not parts[-1].endswith(".md"):
+        return None
+    # Hidden and underscore-prefixed files are not listed, so importing them is pointless
+    if any(part.startswith(".") for part in parts) or parts[-1].startswith("_"):
+        return None
+    return "-".join(parts)[:-3]
+
+
+def iter_markdown(source: str, read: bool = True) -> Iterator[Tuple[str, Optional[str]]]:
+    """Yield (name, content) for every markdown file in a directory or tarball.
+
+    Content is decoded with universal newlines, as the server reads documents,
+    so digests match theirs. With read=False content is None and files are
+    only listed. Files that are not valid UTF-8 are logged and yielded with content None, so one bad file
+    does not stop the import.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for entry in sorted(files):
+                path = os.path.join(root, entry)
+                name = _document_name(os.path.relpath(path, source))
+                if name is None:
+                    continue
+                if not read:
+                    yield name, None
+                    continue
+                with open(path, "rb") as f:
+                    yield name, _decode(name, f.read())
+        return
+
+    with tarfile.open(source, "r:*") as archive:
+        for member in archive:
+            name = _document_name(member.name) if member.isfile() else None
+            if name is None:
+                continue
+            if not read:
+                yield name, None
+                continue
+            with archive.extractfile(member) as f:
+                yield name, _decode(name, f.read())
+
+
+def _decode(name: str, data: bytes) -> Optional[str]:
+    try:
+        return decode_document(data)
+    except UnicodeDecodeError as e:
+        logger.warning("Skipping %s, which is not valid UTF-8: %s", name, e)
+        return None
+
+
+def source_fingerprint(source: str) -> str:
+    """Identifies a source across runs: its path for directories, its content for tarballs."""
+    digest = hashlib.sha256()
+    if os.path.isdir(source):
+        digest.update(os.path.abspath(source).encode("utf-8"))
+    else:
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def default_checkpoint_path(fingerprint: str) -> str:
+    return os.path.join(settings.markdown_dir, ".imports", f"{fingerprint}.json")
+
+
+class Checkpoint:
+    """Documents an import has fully processed, by name and content hash."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.done: Dict[str, str] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.done = json.load(f)["done"]
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Ignoring unreadable import checkpoint %s: %s", path, e)
+
+    def is_done(self, document: ImportDocument) -> bool:
+        return self.done.get(document.filename) == document.digest
+
+    def record(self, documents: List[ImportDocument]):
+        if not documents:
+            return
+        self.done.update({document.filename: document.digest for document in documents})
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"updated_at": datetime.now().isoformat(), "done": self.done}, f)
+        os.replace(tmp_path, self.path)
+
+
+class BulkImporter:
+    """Imports documents into a MarkdownService batch by batch.
+
+    keyword_services are instances of the keyword model to spread extraction
+    over; by default the service's own. Each instance gets
+    workers_per_instance workers, so its queue always has the next document
+    waiting while one is generating.
+    """
+
+    def __init__(self, markdown_service, keyword_services: Optional[List[Any]] = None, batch_size: int = 256,
+                 checkpoint_path: Optional[str] = None, embed: bool = True, workers_per_instance: int = 2):
+        self.markdown_service = markdown_service
+        self.keyword_service = markdown_service.keyword_service
+        self.keyword_services = keyword_services or [self.keyword_service.llm_service]
+        self.batch_size = batch_size
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.embed = embed
+        self.workers_per_instance = workers_per_instance
+        self.progress: Dict[str, Any] = {"state": "queued"}
+
+    async def run(self, source: str) -> Dict[str, Any]:
+        """Import every markdown document in source and return the progress summary."""
+        started = time.perf_counter()
+        self.progress.update({
+            "state": "running",
+            "total": await asyncio.to_thread(lambda: sum(1 for _ in iter_markdown(source, read=False))),
+            "processed": 0,
+            "resumed": 0,
+            "written": 0,
+            "embedded": 0,
+            "extracted": 0,
+            "failed": 0,
+            "workers": len(self.keyword_services) * self.workers_per_instance,
+            "started_at": datetime.now().isoformat(),
+            "finished_at": None,
+        })
+        try:
+            documents = iter_markdown(source)
+            while True:
+                batch, undecodable = await asyncio.to_thread(self._read_batch, documents)
+                if not batch and not undecodable:
+                    break
+                self.progress["processed"] += undecodable
+                self.progress["failed"] += undecodable
+                await self._import_batch(batch)
+                self._update_rates(started)
+            self.progress["state"] = "done"
+        except Exception:
+            self.progress["state"] = "failed"
+            raise
+        finally:
+            self._update_rates(started)
+            self.progress["finished_at"] = datetime.now().isoformat()
+        return self.progress
+
+    def _read_batch(self, documents: Iterator[Tuple[str, Optional[str]]]) -> Tuple[List[ImportDocument], int]:
+        """The next batch of documents and how many files were skipped as undecodable on the way."""
+        batch = []
+        undecodable = 0
+        for filename, content in documents:
+            if content is None:
+                undecodable += 1
+                continue
+            batch.append(ImportDocument(filename, content, content_hash(content)))
+            if len(batch) >= self.batch_size:
+                break
+        return batch, undecodable
+
+    def _update_rates(self, started: float):
+        elapsed = time.perf_counter() - started
+        self.progress["elapsed_s"] = round(elapsed, 3)
+        self.progress["docs_per_s"] = round(self.progress["processed"] / elapsed, 3) if elapsed > 0 else 0.0
+
+    async def _import_batch(self, batch: List[ImportDocument]):
+        todo = [document for document in batch if not self.checkpoint.is_done(document)]
+        self.progress["resumed"] += len(batch) - len(todo)
+
+        written = await asyncio.to_thread(self._write, todo)
+        # Listeners run on the event loop, like those of any other save
+        for filename in sorted(written):
+            self.markdown_service._notify_changed(filename)
+        embedded, (extracted, failed) = await asyncio.gather(self._embed(todo), self._extract(todo, written))
+
+        self.checkpoint.record([document for document in todo if document.filename not in failed])
+        self.progress["processed"] += len(batch)
+        self.progress["written"] += len(written)
+        self.progress["embedded"] += embedded
+        self.progress["extracted"] += extracted
+        self.progress["failed"] += len(failed)
+
+    def _write(self, documents: List[ImportDocument]) -> set:
+        """Write documents whose content changed; returns their names.
+
+        Runs on a worker thread, so change listeners are left to the caller.
+        """
+        written = set()
+        for document in documents:
+            if self.markdown_service.document_hash(document.filename) != document.digest:
+                self.markdown_service.write_file(document.filename, document.content)
+                written.add(document.filename)
+        return written
+
+    async def _embed(self, documents: List[ImportDocument]) -> int:
+        """Embed the sections of every document in one batch; returns the number of documents embedded."""
+        vector_store = self.markdown_service.vector_store
+        if not self.embed or vector_store is None or not documents:
+            return 0
+
+        def prepare():
+            pending = []
+            for document in documents:
+                if vector_store.has_document_sections(document.filename, document.digest):
+                    continue
+                sections = [
+                    {"heading": section.heading, "start": section.start, "end": section.end,
+                     "text": section.text(document.content)}
+                    for section in self.markdown_service.get_sections(document.filename, document.content)
+                ]
+                pending.append((document.filename, document.digest, sections))
+            return pending
+
+        pending = await asyncio.to_thread(prepare)
+        if pending:
+            with metrics.span("embedding", target="import"):
+                await asyncio.to_thread(vector_store.index_sections_batch, pending)
+        return len(pending)
+
+    async def _extract(self, documents: List[ImportDocument], written: set) -> Tuple[int, set]:
+        """Extract keywords for documents that need them and commit them as one batch.
+
+        Returns the number extracted and the names that failed.
+        """
+        pending = [document for document in documents
+                   if not self.keyword_service.is_up_to_date(document.filename, document.digest)]
+        if not pending:
+            return 0, set()
+
+        results, failed = await extract_keywords_pool(self.keyword_service, pending, self.keyword_services,
+                                                      self.workers_per_instance)
+        self.keyword_service.save_keywords_batch(results)
+        # Written documents were already announced; the others only got new keywords
+        for filename, _, _ in results:
+            if filename not in written:
+                self.markdown_service._notify_changed(filename)
+        return len(results), failed
+
+
+async def extract_keywords_pool(keyword_service, documents: List[ImportDocument], llm_services: List[Any],
+                                workers_per_instance: int = 2) -> Tuple[List[Tuple[str, List[str], str]], set]:
+    """Extract keywords for documents with workers_per_instance workers per model instance.
+
+    Returns (filename, keywords, digest) for every document that got
+    keywords, ready for save_keywords_batch, and the names of those that did
+    not. A document without keywords counts as failed, so it is neither
+    stored as up to date nor checkpointed.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for document in documents:
+        queue.put_nowait(document)
+
+    results: List[Tuple[str, List[str], str]] = []
+    failed = set()
+
+    async def worker(llm_service):
+        while not queue.empty():
+            document = queue.get_nowait()
+            try:
+                keywords = await keyword_service.extract_keywords(
+                    document.content, PRIORITY_BACKGROUND, llm_service=llm_service
+                )
+            except Exception as e:
+                logger.warning("Error extracting keywords for %s: %s", document.filename, e)
+                keywords = []
+            if keywords:
+                results.append((document.filename, keywords, document.digest))
+            else:
+                failed.add(document.filename)
+
+    await asyncio.gather(*(
+        worker(llm_service)
+        for llm_service in llm_services
+        for _ in range(workers_per_instance)
+    ))
+    return results, failed
+
+
+def keyword_model_instances(count: int) -> List[Any]:
+    """count separate instances of the keyword model, splitting the CPU cores between them."""
+    from .llm_service import LLMService
+
+    profile = get_model_profile(settings.keyword_profile)
+    threads = max(1, (os.cpu_count() or 1) // count)
+    return [LLMService(replace(profile, instance=i, n_threads=threads)) for i in range(count)]
+
+
+def default_instances() -> int:
+    """As many keyword model instances as there are cores for their configured thread count, up to 4."""
+    profile = get_model_profile(settings.keyword_profile)
+    return max(1, min(4, (os.cpu_count() or 1) // max(1, profile.n_threads or 1)))
+
+
+async def import_offline(args: argparse.Namespace) -> Dict[str, Any]:
+    from .llm_service import LLMService
+    from .markdown_service import MarkdownService
+
+    instances = keyword_model_instances(args.instances or default_instances())
+    vector_store = None
+    if not args.no_embeddings:
+        from .vector_store import VectorStore
+        vector_store = await asyncio.to_thread(VectorStore)
+    service = MarkdownService(LLMService.for_profile(settings.answer_profile), vector_store, instances[0])
+
+    checkpoint = args.checkpoint or default_checkpoint_path(await asyncio.to_thread(source_fingerprint, args.source))
+    importer = BulkImporter(service, instances, batch_size=args.batch_size, checkpoint_path=checkpoint,
+                            embed=not args.no_embeddings)
+    reporter = asyncio.create_task(_report(importer.progress))
+    try:
+        return await importer.run(args.source)
+    finally:
+        reporter.cancel()
+
+
+async def import_remote(args: argparse.Namespace) -> Dict[str, Any]:
+    """Upload source as a tarball to a running server and follow the import job."""
+    import httpx
+
+    archive_path = args.source
+    cleanup = None
+    if os.path.isdir(args.source):
+        fd, archive_path = tempfile.mkstemp(suffix=".tar.gz")
+        os.close(fd)
+        cleanup = archive_path
+        with tarfile.open(archive_path, "w:gz") as archive:
+            archive.add(args.source, arcname=".")
+    try:
+        async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+            response = await client.post("/api/import", content=_read_chunks(archive_path),
+                                         headers={"Content-Type": "application/gzip"})
+            response.raise_for_status()
+            job_id = response.json()["job_id"]
+            while True:
+                job = (await client.get(f"/api/jobs/{job_id}")).json()
+                if job["state"] in ("done", "failed"):
+                    if job["state"] == "failed":
+                        raise RuntimeError(f"Import failed: {job['error']}")
+                    return job["result"]
+                if job.get("progress"):
+                    _print_progress(job["progress"])
+                await asyncio.sleep(2)
+    finally:
+        if cleanup:
+            os.remove(cleanup)
+
+
+async def _read_chunks(path: str, chunk_size: int = 1 << 20) -> AsyncIterator[bytes]:
+    """Stream a file in chunks, so an upload never holds the whole archive in memory."""
+    with open(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def _report(progress: Dict[str, Any], interval: float = 5.0):
+    while True:
+        await asyncio.sleep(interval)
+        _print_progress(progress)
+
+
+def _print_progress(progress: Dict[str, Any]):
+    if progress.get("state") == "running":
+        print(f"{progress['processed']}/{progress['total']} documents, {progress.get('docs_per_s', 0)} docs/s",
+              flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Directory or tarball (.tar, .tar.gz, ...) of markdown files")
+    parser.add_argument("--url", help="Upload to a running server instead of writing storage directly")
+    parser.add_argument("--instances", type=int, help="Keyword model instances (default: cores / n_threads, up to 4)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Documents written and embedded together")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default markdown_storage/.imports/<source>.json)")
+    parser.add_argument("--no-embeddings", action="store_true", help="Skip section embeddings")
+    args = parser.parse_args()
+
+    configure_logging()
+    summary = asyncio.run(import_remote(args) if args.url else import_offline(args))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
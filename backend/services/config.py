@@ -0,0 +1,193 @@
+import json
+import logging
+import os
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Pick up a local .env file if present; real environment variables win
+load_dotenv()
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+def _env_str(name: str, default: str) -> str:
+    value = os.getenv(name)
+    return value if value not in (None, "") else default
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+@dataclass
+class Settings:
+    """Runtime settings, read from BNF_* environment variables."""
+    # Where markdown documents (and their suggestions) are stored
+    markdown_dir: str = os.path.join(BACKEND_DIR, "markdown_storage")
+    # Where the keyword database (keywords.db) is stored
+    keywords_dir: str = os.path.join(BACKEND_DIR, "keyword_storage")
+    # SQLite database holding feedback entries and counters
+    feedback_db_path: str = os.path.join(BACKEND_DIR, "feedback.db")
+    # Memory budget for cached markdown content and sections
+    document_cache_bytes: int = 64 * 1024 * 1024
+    # Index snapshot built by booknotfound-index, loaded at startup instead of
+    # re-indexing unchanged documents; a snapshot or a directory of them, empty disables
+    index_snapshot_dir: str = ""
+    # Maximum number of interactive LLM jobs waiting or running before new questions are rejected
+    inference_queue_depth: int = 8
+    # Maximum number of background LLM jobs, such as keyword extraction, waiting or
+    # running; further ones wait for a slot instead of growing the queue
+    inference_background_depth: int = 64
+    # Seconds suggested to clients in Retry-After when the queue is full
+    inference_retry_after: float = 5.0
+    # Upper bound on prompt tokens spent on retrieved context
+    context_token_budget: int = 1200
+    # Number of top-ranked files whose sections compete for the context budget
+    context_max_files: int = 3
+    # How documents are retrieved for a question: keyword, embedding or hybrid
+    retrieval_mode: str = "keyword"
+    # Number of nearest sections fetched in embedding and hybrid retrieval
+    embedding_top_k: int = 20
+    # Sections further than this cosine distance from the question are ignored
+    embedding_max_distance: float = 0.6
+    # JSON file with named model profiles; built-in defaults are used if it is missing
+    model_profiles_path: str = os.path.join(BACKEND_DIR, "model_profiles.json")
+    # Profile used to generate answers
+    answer_profile: str = "answer"
+    # Profile used for keyword extraction
+    keyword_profile: str = "keywords"
+    # RAM budget for cached prompt-prefix KV state; 0 disables the RAM tier
+    prefix_cache_ram_bytes: int = 512 * 1024 * 1024
+    # Disk budget for prefix state evicted from RAM; 0 disables the disk tier
+    prefix_cache_disk_bytes: int = 0
+    # Run one short generation and one embedding before reporting ready
+    warmup_enabled: bool = True
+    # Serve stored answers to semantically equivalent questions
+    answer_cache_enabled: bool = True
+    # Maximum cosine distance between a new question and a cached one
+    answer_cache_max_distance: float = 0.08
+    # Only answers at least this certain are stored and served from the cache
+    answer_cache_min_certainty: float = 0.8
+    # DEBUG, INFO, WARNING, ERROR or OFF
+    log_level: str = "INFO"
+
+    @classmethod
+    def from_env(cls) -> 'Settings':
+        return cls(
+            markdown_dir=_env_str("BNF_MARKDOWN_DIR", cls.markdown_dir),
+            keywords_dir=_env_str("BNF_KEYWORDS_DIR", cls.keywords_dir),
+            feedback_db_path=_env_str("BNF_FEEDBACK_DB", cls.feedback_db_path),
+            document_cache_bytes=_env_int("BNF_DOCUMENT_CACHE_BYTES", cls.document_cache_bytes),
+            index_snapshot_dir=_env_str("BNF_INDEX_SNAPSHOT", cls.index_snapshot_dir),
+            inference_queue_depth=_env_int("BNF_INFERENCE_QUEUE_DEPTH", cls.inference_queue_depth),
+            inference_background_depth=_env_int("BNF_INFERENCE_BACKGROUND_DEPTH", cls.inference_background_depth),
+            inference_retry_after=_env_float("BNF_INFERENCE_RETRY_AFTER", cls.inference_retry_after),
+            context_token_budget=_env_int("BNF_CONTEXT_TOKEN_BUDGET", cls.context_token_budget),
+            context_max_files=_env_int("BNF_CONTEXT_MAX_FILES", cls.context_max_files),
+            retrieval_mode=_env_str("BNF_RETRIEVAL_MODE", cls.retrieval_mode),
+            embedding_top_k=_env_int("BNF_EMBEDDING_TOP_K", cls.embedding_top_k),
+            embedding_max_distance=_env_float("BNF_EMBEDDING_MAX_DISTANCE", cls.embedding_max_distance),
+            model_profiles_path=_env_str("BNF_MODEL_PROFILES", cls.model_profiles_path),
+            answer_profile=_env_str("BNF_ANSWER_PROFILE", cls.answer_profile),
+            keyword_profile=_env_str("BNF_KEYWORD_PROFILE", cls.keyword_profile),
+            prefix_cache_ram_bytes=_env_int("BNF_PREFIX_CACHE_RAM_BYTES", cls.prefix_cache_ram_bytes),
+            prefix_cache_disk_bytes=_env_int("BNF_PREFIX_CACHE_DISK_BYTES", cls.prefix_cache_disk_bytes),
+            warmup_enabled=_env_bool("BNF_WARMUP", cls.warmup_enabled),
+            answer_cache_enabled=_env_bool("BNF_ANSWER_CACHE_ENABLED", cls.answer_cache_enabled),
+            answer_cache_max_distance=_env_float("BNF_ANSWER_CACHE_MAX_DISTANCE", cls.answer_cache_max_distance),
+            answer_cache_min_certainty=_env_float("BNF_ANSWER_CACHE_MIN_CERTAINTY", cls.answer_cache_min_certainty),
+            log_level=_env_str("BNF_LOG_LEVEL", cls.log_level),
+        )
+
+settings = Settings.from_env()
+
+def configure_logging(level: str = None):
+    """Set up leveled logging for the backend; OFF silences it entirely."""
+    level = (level or settings.log_level).upper()
+    if level == "OFF":
+        logging.disable(logging.CRITICAL)
+        return
+    logging.disable(logging.NOTSET)
+    logging.basicConfig(
+        level=getattr(logging, level, logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+@dataclass
+class ModelProfile:
+    """How to load a GGUF model and the sampling defaults to use with it."""
+    name: str
+    path: str
+    n_ctx: int = 2048
+    n_threads: Optional[int] = 4
+    n_batch: int = 512
+    use_mmap: bool = True
+    use_mlock: bool = False
+    sampling: Dict[str, Any] = field(default_factory=dict)
+    # Copies of a profile with different instance numbers load separate models,
+    # so they can run in parallel; with use_mmap they share the weights in memory
+    instance: int = 0
+
+    def load_key(self) -> tuple:
+        """Profiles with the same load key share one loaded model."""
+        return (os.path.abspath(self.path), self.n_ctx, self.n_threads, self.n_batch, self.use_mmap, self.use_mlock,
+                self.instance)
+
+DEFAULT_MODEL_PATH = os.path.join(BACKEND_DIR, "models", "llama-2-7b-chat.Q4_K_M.gguf")
+
+# Both roles use the 7B chat model unless model_profiles.json says otherwise
+DEFAULT_MODEL_PROFILES = {
+    "answer": ModelProfile(
+        name="answer",
+        path=DEFAULT_MODEL_PATH,
+        sampling={"max_tokens": 512, "temperature": 0.7, "top_p": 0.95, "repeat_penalty": 1.1},
+    ),
+    "keywords": ModelProfile(
+        name="keywords",
+        path=DEFAULT_MODEL_PATH,
+        sampling={"max_tokens": 256, "temperature": 0.1, "top_p": 0.9, "repeat_penalty": 1.0},
+    ),
+}
+
+def load_model_profiles(path: str) -> Dict[str, ModelProfile]:
+    """Load named model profiles from a JSON file on top of the built-in defaults.
+
+    The file looks like {"profiles": {"<name>": {"path": ..., "n_ctx": ..., ...}}}.
+    Relative model paths are resolved against the backend directory, and a
+    profile that shares a name with a default only overrides the keys it sets.
+    """
+    profiles = dict(DEFAULT_MODEL_PROFILES)
+    if not os.path.exists(path):
+        return profiles
+    with open(path, 'r') as f:
+        data = json.load(f)
+    for name, values in data.get("profiles", {}).items():
+        values = dict(values)
+        if "path" in values and not os.path.isabs(values["path"]):
+            values["path"] = os.path.join(BACKEND_DIR, values["path"])
+        base = profiles.get(name)
+        if base is None:
+            profiles[name] = ModelProfile(name=name, **values)
+        else:
+            sampling = {**base.sampling, **values.pop("sampling", {})}
+            profiles[name] = replace(base, sampling=sampling, **values)
+    return profiles
+
+_model_profiles: Optional[Dict[str, ModelProfile]] = None
+
+def get_model_profile(name: str) -> ModelProfile:
+    global _model_profiles
+    if _model_profiles is None:
+        _model_profiles = load_model_profiles(settings.model_profiles_path)
+    if name not in _model_profiles:
+        raise KeyError(f"Unknown model profile: {name}")
+    return _model_profiles[name]
@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+from .keyword_index import KeywordIndex
+from .keyword_service import KeywordMatch
+from .sections import Section
+
+SECTION_SEPARATOR = "\n\n---\n\n"
+
+# Sections are identified by file and start offset
+SectionKey = Tuple[str, int]
+
+
+@dataclass
+class ContextPiece:
+    section: Section
+    text: str
+    score: float
+    tokens: int
+
+
+class ContextBuilder:
+    """Packs the most relevant document sections into a token budget."""
+
+    def __init__(self, count_tokens: Callable[[str], int], truncate_tokens: Callable[[str, int], str],
+                 index: KeywordIndex):
+        self.count_tokens = count_tokens
+        self.truncate_tokens = truncate_tokens
+        self.index = index
+
+    def score_section(self, section: Section, text: str, file_score: float, query_keywords: List[str]) -> float:
+        """Score a section by its file's rank plus IDF-weighted keyword hits.
+
+        Hits in the heading count double.
+        """
+        heading = section.heading.lower()
+        body = text.lower()
+        score = file_score
+        for keyword in query_keywords:
+            if keyword in heading:
+                score += 2 * self.index.idf(keyword)
+            elif keyword in body:
+                score += self.index.idf(keyword)
+        return score
+
+    def keyword_scores(self, matches: List[KeywordMatch], documents: Dict[str, Tuple[str, List[Section]]],
+                       query_keywords: List[str]) -> Dict[SectionKey, float]:
+        """Score every section of the matched files against the query keywords."""
+        query_keywords = [k.lower() for k in query_keywords]
+        scores: Dict[SectionKey, float] = {}
+        for match in matches:
+            content, sections = documents[match.filename]
+            for section in sections:
+                key = (section.filename, section.start)
+                scores[key] = self.score_section(section, section.text(content), match.score, query_keywords)
+        return scores
+
+    def build(self, section_scores: Dict[SectionKey, float], documents: Dict[str, Tuple[str, List[Section]]],
+              file_order: List[str], budget: int) -> Tuple[str, List[ContextPiece]]:
+        """Return the packed context string and the pieces it was built from.
+
+        documents maps each candidate filename to its content and sections;
+        only sections present in section_scores are considered. Chosen
+        sections are presented grouped by file in file_order.
+        """
+        candidates: List[ContextPiece] = []
+        for filename in file_order:
+            content, sections = documents[filename]
+            for section in sections:
+                score = section_scores.get((section.filename, section.start))
+                if score is not None:
+                    candidates.append(ContextPiece(section, section.text(content), score, 0))
+
+        # Greedily take the best sections that still fit
+        candidates.sort(key=lambda piece: (-piece.score, piece.section.filename, piece.section.start))
+        separator_tokens = self.count_tokens(SECTION_SEPARATOR)
+        chosen: List[ContextPiece] = []
+        remaining = budget
+        for piece in candidates:
+            header = self._header(piece.section)
+            cost = self.count_tokens(header + piece.text) + (separator_tokens if chosen else 0)
+            if cost <= remaining:
+                piece.tokens = cost
+                chosen.append(piece)
+                remaining -= cost
+            elif not chosen and remaining > 0:
+                # Never return nothing: trim the single best section to fit
+                piece.text = self.truncate_tokens(piece.text, max(0, remaining - self.count_tokens(header)))
+                piece.tokens = remaining
+                chosen.append(piece)
+                remaining = 0
+            if remaining <= separator_tokens:
+                break
+
+        # Present sections in reading order, grouped by file rank
+        file_rank = {filename: rank for rank, filename in enumerate(file_order)}
+        chosen.sort(key=lambda piece: (file_rank[piece.section.filename], piece.section.start))
+        context = SECTION_SEPARATOR.join(self._header(p.section) + p.text for p in chosen)
+        return context, chosen
+
+    @staticmethod
+    def _header(section: Section) -> str:
+        return f"Source: {section.filename}\n"
@@ -0,0 +1,99 @@
+import difflib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+def compute_hunks(original: str, suggested: str, context: int = 3) -> List[Dict[str, Any]]:
+    """Line diff of two documents as unified-diff hunks.
+
+    Each hunk has 1-based old_start/new_start, old_lines/new_lines counts and
+    lines as [op, text] pairs, where op is " ", "-" or "+".
+    """
+    a = original.splitlines()
+    b = suggested.splitlines()
+    hunks = []
+    for group in difflib.SequenceMatcher(None, a, b, autojunk=False).get_grouped_opcodes(context):
+        i1, j1 = group[0][1], group[0][3]
+        i2, j2 = group[-1][2], group[-1][4]
+        lines: List[List[str]] = []
+        for tag, a1, a2, b1, b2 in group:
+            if tag == "equal":
+                lines.extend([" ", line] for line in a[a1:a2])
+                continue
+            if tag in ("replace", "delete"):
+                lines.extend(["-", line] for line in a[a1:a2])
+            if tag in ("replace", "insert"):
+                lines.extend(["+", line] for line in b[b1:b2])
+        hunks.append({
+            "old_start": i1 + 1,
+            "old_lines": i2 - i1,
+            "new_start": j1 + 1,
+            "new_lines": j2 - j1,
+            "lines": lines,
+        })
+    return hunks
+
+
+def _positioned_lines(hunk: Dict[str, Any]) -> Iterator[Tuple[int, int, str, str]]:
+    """(old line, new line, op, text) for each line of a hunk, the positions being where the line sits."""
+    old, new = hunk["old_start"], hunk["new_start"]
+    for op, text in hunk["lines"]:
+        yield old, new, op, text
+        if op != "+":
+            old += 1
+        if op != "-":
+            new += 1
+
+
+def _hunk_of(lines: List[Tuple[int, int, str, str]]) -> Dict[str, Any]:
+    return {
+        "old_start": lines[0][0],
+        "old_lines": sum(1 for _, _, op, _ in lines if op != "+"),
+        "new_start": lines[0][1],
+        "new_lines": sum(1 for _, _, op, _ in lines if op != "-"),
+        "lines": [[op, text] for _, _, op, text in lines],
+    }
+
+
+def page_hunks(hunks: List[Dict[str, Any]], from_line: int = 1, max_lines: int = 2000,
+               from_new_line: int = 1) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int]]]:
+    """Diff lines at original line from_line and suggested line from_new_line on, up to max_lines lines.
+
+    Hunks are kept whole when they fit; a hunk larger than a page is split at
+    line boundaries, so even a completely rewritten document is paged.
+    Returns the page and the (from_line, from_new_line) of the next page, or
+    None on the last page. Both positions are needed to resume inside a run
+    of added lines, which all sit at the same original line.
+    """
+    page: List[Dict[str, Any]] = []
+    budget = max_lines
+    for hunk in hunks:
+        lines = [line for line in _positioned_lines(hunk) if line[0] >= from_line and line[1] >= from_new_line]
+        if not lines:
+            continue
+        if len(lines) > budget:
+            if page:
+                return page, lines[0][:2]
+            page.append(_hunk_of(lines[:budget]))
+            return page, lines[budget][:2]
+        page.append(_hunk_of(lines))
+        budget -= len(lines)
+    return page, None
+
+
+def _unified_range(start: int, length: int) -> str:
+    # An empty range is reported as starting at the line before it, as in diff -u
+    if length == 0:
+        return f"{start - 1},0"
+    return str(start) if length == 1 else f"{start},{length}"
+
+
+def render_unified(hunks: List[Dict[str, Any]], filename: Optional[str] = None) -> str:
+    """Render hunks as unified diff text, with file headers if filename is given."""
+    out = []
+    if filename is not None:
+        out += [f"--- a/{filename}.md", f"+++ b/{filename}.md"]
+    for hunk in hunks:
+        out.append(f"@@ -{_unified_range(hunk['old_start'], hunk['old_lines'])}"
+                   f" +{_unified_range(hunk['new_start'], hunk['new_lines'])} @@")
+        out.extend(op + text for op, text in hunk["lines"])
+    return "\n".join(out) + "\n" if out else ""
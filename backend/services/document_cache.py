@@ -0,0 +1,141 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import metrics
+from .sections import Section, split_sections
+
+
+def content_hash(content: str) -> str:
+    """Stable hash identifying a document revision."""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def decode_document(data: bytes) -> str:
+    """Decode a markdown file's bytes the way DocumentCache reads it, with universal newlines.
+
+    Raises UnicodeDecodeError if data is not valid UTF-8.
+    """
+    return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+
+@dataclass
+class CachedDocument:
+    """A markdown file as last read from disk."""
+    path: str
+    content: str
+    digest: str
+    mtime_ns: int
+    size: int
+    sections: Optional[List[Section]] = None
+
+
+class DocumentCache:
+    """Byte-bounded LRU cache of markdown files, their sections and directory listings.
+
+    Every lookup stats the file and re-reads it if its mtime or size changed,
+    so edits made outside the application are picked up on the next access.
+    Directory listings are revalidated against the directory's mtime, which
+    changes whenever a file is created, removed or renamed into place.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._documents: "OrderedDict[str, CachedDocument]" = OrderedDict()
+        self._bytes = 0
+        # directory -> (mtime_ns, markdown file names without extension)
+        self._listings: Dict[str, Tuple[int, List[str]]] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        metrics.gauge("cache_hit_rate", lambda: self.stats()["hit_rate"], cache="documents")
+
+    def get(self, path: str) -> CachedDocument:
+        """Return the current content of path; raises FileNotFoundError if it does not exist."""
+        stat = os.stat(path)
+        with self._lock:
+            document = self._documents.get(path)
+            if document is not None and document.mtime_ns == stat.st_mtime_ns and document.size == stat.st_size:
+                self._documents.move_to_end(path)
+                self.hits += 1
+                return document
+            self.misses += 1
+
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        return self._store(path, content, stat)
+
+    def put(self, path: str, content: str) -> CachedDocument:
+        """Record content just written to path by this process."""
+        document = self._store(path, content, os.stat(path))
+        with self._lock:
+            # A newly created file changes the listing
+            self._listings.pop(os.path.dirname(path), None)
+        return document
+
+    def invalidate(self, path: str):
+        with self._lock:
+            document = self._documents.pop(path, None)
+            if document is not None:
+                self._bytes -= document.size
+            self._listings.pop(os.path.dirname(path), None)
+
+    def sections(self, document: CachedDocument, filename: str) -> List[Section]:
+        """Heading sections of a cached document, split on first use."""
+        if document.sections is None:
+            document.sections = split_sections(filename, document.content)
+        return document.sections
+
+    def list_markdown(self, directory: str) -> List[str]:
+        """Names of the markdown files in directory, without the .md extension."""
+        mtime_ns = os.stat(directory).st_mtime_ns
+        with self._lock:
+            cached = self._listings.get(directory)
+            if cached is not None and cached[0] == mtime_ns:
+                return list(cached[1])
+
+        files = []
+        for filename in os.listdir(directory):
+            if filename.endswith('.md'):
+                # Remove the .md extension
+                base_name = filename[:-3]
+                # Skip hidden files and system files
+                if not base_name.startswith('.') and not base_name.startswith('_'):
+                    files.append(base_name)
+        with self._lock:
+            self._listings[directory] = (mtime_ns, files)
+        return list(files)
+
+    def _store(self, path: str, content: str, stat: os.stat_result) -> CachedDocument:
+        document = CachedDocument(
+            path=path,
+            content=content,
+            digest=content_hash(content),
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+        )
+        with self._lock:
+            previous = self._documents.pop(path, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            if document.size <= self.max_bytes:
+                self._documents[path] = document
+                self._bytes += document.size
+            while self._bytes > self.max_bytes and self._documents:
+                _, evicted = self._documents.popitem(last=False)
+                self._bytes -= evicted.size
+        return document
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "documents": len(self._documents),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": float(self.hits / lookups) if lookups > 0 else 0.0,
+        }
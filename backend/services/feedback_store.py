@@ -0,0 +1,170 @@
+import logging
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .database import connect
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    question_id TEXT,
+    feedback INTEGER NOT NULL,
+    feedback_text TEXT NOT NULL DEFAULT '',
+    suggested_changes TEXT,
+    created_at TEXT NOT NULL,
+    -- 1 when the text has been embedded, NULL when there is no text to embed
+    embedded INTEGER
+);
+CREATE INDEX IF NOT EXISTS feedback_by_file ON feedback (file_name, created_at);
+CREATE INDEX IF NOT EXISTS feedback_pending ON feedback (embedded) WHERE embedded = 0;
+CREATE TABLE IF NOT EXISTS feedback_counts (
+    scope TEXT NOT NULL,  -- file or question
+    key TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    positive INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, key)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class FeedbackStore:
+    """Feedback entries and per-file and per-question counters in SQLite.
+
+    Writing feedback never touches the embedding model. Entries with text
+    are marked pending and embedded later in batches by whoever owns the
+    vector store; entries that only carry a thumbs up or down are never embedded.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = connect(path)
+        with self._db:
+            self._db.executescript(SCHEMA)
+
+    def add(self, file_name: str, feedback: bool, feedback_text: str = "",
+            suggested_changes: Optional[str] = None, question_id: Optional[str] = None) -> str:
+        """Store one feedback entry and update its counters; returns its id."""
+        entry = {
+            "id": str(uuid.uuid4()),
+            "file_name": file_name,
+            "question_id": question_id,
+            "feedback": bool(feedback),
+            "feedback_text": feedback_text or "",
+            "suggested_changes": suggested_changes,
+            "created_at": datetime.now().isoformat(),
+        }
+        self.add_many([entry])
+        return entry["id"]
+
+    def add_many(self, entries: Iterable[Dict[str, Any]]):
+        """Store entries in one transaction, skipping ids that are already stored."""
+        with self._lock, self._db:
+            for entry in entries:
+                has_text = bool(self._text(entry))
+                self._db.execute(
+                    "INSERT OR IGNORE INTO feedback (id, file_name, question_id, feedback, feedback_text,"
+                    " suggested_changes, created_at, embedded) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (entry["id"], entry["file_name"], entry.get("question_id"), int(bool(entry["feedback"])),
+                     entry.get("feedback_text") or "", entry.get("suggested_changes"), entry["created_at"],
+                     0 if has_text else None)
+                )
+                if self._db.execute("SELECT changes()").fetchone()[0] == 0:
+                    continue
+                self._count("file", entry["file_name"], entry["feedback"])
+                if entry.get("question_id"):
+                    self._count("question", entry["question_id"], entry["feedback"])
+
+    def _count(self, scope: str, key: str, positive: bool):
+        self._db.execute(
+            "INSERT INTO feedback_counts (scope, key, total, positive) VALUES (?, ?, 1, ?)"
+            " ON CONFLICT (scope, key) DO UPDATE SET total = total + 1, positive = positive + excluded.positive",
+            (scope, key, int(bool(positive)))
+        )
+
+    @staticmethod
+    def _text(entry: Dict[str, Any]) -> str:
+        return (entry.get("suggested_changes") or entry.get("feedback_text") or "").strip()
+
+    def pending_embeddings(self, limit: int = 64) -> List[Dict[str, Any]]:
+        """Oldest entries whose text still needs an embedding, with that text under "text"."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM feedback WHERE embedded = 0 ORDER BY created_at LIMIT ?", (limit,)
+            ).fetchall()
+        return [{**self._entry(row), "text": self._text(dict(row))} for row in rows]
+
+    def mark_embedded(self, ids: List[str]):
+        with self._lock, self._db:
+            self._db.executemany("UPDATE feedback SET embedded = 1 WHERE id = ?", [(i,) for i in ids])
+
+    def _stats(self, scope: str, key: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT total, positive FROM feedback_counts WHERE scope = ? AND key = ?", (scope, key)
+            ).fetchone()
+        total, positive = (row["total"], row["positive"]) if row else (0, 0)
+        return {
+            "total_feedback": total,
+            "positive_feedback": positive,
+            "feedback_ratio": float(positive / total) if total > 0 else 0.0
+        }
+
+    def get_feedback_stats(self, question_id: str) -> Dict[str, Any]:
+        """Get feedback statistics for a QA pair."""
+        return self._stats("question", question_id)
+
+    def get_file_stats(self, file_name: str) -> Dict[str, Any]:
+        """Get feedback statistics for a document."""
+        return self._stats("file", file_name)
+
+    def get_feedback_history(self, file_name: str, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """Get a page of a file's feedback, newest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM feedback WHERE file_name = ? ORDER BY created_at DESC, rowid DESC LIMIT ? OFFSET ?",
+                (file_name, limit, offset)
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    @staticmethod
+    def _entry(row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "feedback": bool(row["feedback"]),
+            "feedback_text": row["feedback_text"],
+            "suggested_changes": row["suggested_changes"] or "",
+            "created_at": row["created_at"],
+            "file_name": row["file_name"],
+        }
+
+    def import_once(self, name: str, load: Callable[[], List[Dict[str, Any]]]):
+        """Add the entries returned by load() unless an import called name already ran.
+
+        Used to carry feedback over from the vector store, where it used to live.
+        Imported texts are queued for embedding again, which replaces their old vectors.
+        """
+        with self._lock:
+            done = self._db.execute("SELECT 1 FROM meta WHERE key = ?", (f"import:{name}",)).fetchone()
+        if done:
+            return
+        entries = load()
+        self.add_many(entries)
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                             (f"import:{name}", datetime.now().isoformat()))
+        if entries:
+            logger.info("Imported %d feedback entries from %s", len(entries), name)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
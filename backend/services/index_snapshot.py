@@ -0,0 +1,405 @@
+"""Build, load and verify index snapshots.
+
+A snapshot holds everything indexing derives from the markdown documents:
+keywords, section offsets and section embeddings, each tagged with the
+content hash of its document. It is built once, offline, and loaded by every
+server at startup. Documents whose content still matches are not re-indexed,
+and the embeddings are memory-mapped, so servers on one host share a copy.
+
+    python -m services.index_snapshot build                     # into index_snapshots/
+    python -m services.index_snapshot build --output /srv/bnf-index --instances 2
+    python -m services.index_snapshot verify --snapshot /srv/bnf-index
+
+Each build is written to a new version directory and CURRENT is switched to
+it once complete; unchanged documents reuse the previous version's keywords
+and embeddings. Point BNF_INDEX_SNAPSHOT at the output directory to load the
+current version. verify exits with status 1 if the snapshot no longer
+matches the documents or the configured keyword model.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .config import BACKEND_DIR, configure_logging, get_model_profile, settings
+from .document_cache import DocumentCache
+from .sections import Section, split_sections
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+EMBEDDINGS = "embeddings.npy"
+# Names the version directory a snapshot directory currently points at
+CURRENT = "CURRENT"
+DEFAULT_OUTPUT = os.path.join(BACKEND_DIR, "index_snapshots")
+
+
+@dataclass
+class SnapshotDocument:
+    filename: str
+    content_hash: str
+    keywords: List[str]
+    sections: List[Section]
+    # Row of the first section's embedding, or None if the document was not embedded
+    first_row: Optional[int] = None
+
+
+def resolve_snapshot(path: str) -> str:
+    """The version directory path refers to: itself, or the one named by its CURRENT file."""
+    current = os.path.join(path, CURRENT)
+    if os.path.exists(current):
+        with open(current, "r") as f:
+            return os.path.join(path, f.read().strip())
+    return path
+
+
+class IndexSnapshot:
+    """A loaded snapshot. Embeddings stay memory-mapped; everything else is in memory."""
+
+    def __init__(self, path: str, manifest: Dict[str, Any], embeddings: Optional[np.ndarray] = None):
+        if manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {manifest.get('format')!r}")
+        self.path = path
+        self.version: str = manifest["version"]
+        self.created_at: str = manifest["created_at"]
+        self.keyword_model: Optional[str] = manifest.get("keyword_model")
+        self.embedding_model: Optional[str] = manifest.get("embedding_model")
+        self.embeddings = embeddings
+
+        self.documents: Dict[str, SnapshotDocument] = {}
+        # Document and section of every embedding row
+        self._rows: List[Optional[Tuple[SnapshotDocument, Section]]] = (
+            [None] * len(embeddings) if embeddings is not None else []
+        )
+        for filename, info in manifest["documents"].items():
+            document = SnapshotDocument(
+                filename, info["content_hash"], info["keywords"],
+                [Section(filename, heading, level, start, end) for heading, level, start, end in info["sections"]],
+                info.get("first_row")
+            )
+            self.documents[filename] = document
+            if document.first_row is None:
+                continue
+            if embeddings is None or document.first_row + len(document.sections) > len(self._rows):
+                raise ValueError(f"Embedding rows of {filename} are missing from the snapshot")
+            for i, section in enumerate(document.sections):
+                self._rows[document.first_row + i] = (document, section)
+        if any(row is None for row in self._rows):
+            raise ValueError("Snapshot has embedding rows that belong to no section")
+
+    @classmethod
+    def open(cls, path: str) -> 'IndexSnapshot':
+        path = resolve_snapshot(path)
+        with open(os.path.join(path, MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        embeddings_path = os.path.join(path, EMBEDDINGS)
+        embeddings = np.load(embeddings_path, mmap_mode="r") if os.path.exists(embeddings_path) else None
+        return cls(path, manifest, embeddings)
+
+    def document(self, filename: str, content_hash: str) -> Optional[SnapshotDocument]:
+        """The snapshot's entry for this revision of a document, or None if it has none."""
+        document = self.documents.get(filename)
+        return document if document is not None and document.content_hash == content_hash else None
+
+    def has_embeddings(self, filename: str, content_hash: str) -> bool:
+        document = self.document(filename, content_hash)
+        return document is not None and document.first_row is not None
+
+    def search(self, embedding: Optional[List[float]], top_k: int = 20) -> List[Dict[str, Any]]:
+        """Sections closest to a normalized query embedding, best first, shaped like VectorStore hits."""
+        if embedding is None or not self._rows:
+            return []
+        similarities = self.embeddings @ np.asarray(embedding, dtype=np.float32)
+        k = min(top_k, len(similarities))
+        best = np.argpartition(-similarities, k - 1)[:k]
+        best = best[np.argsort(-similarities[best])]
+        hits = []
+        for row in best:
+            document, section = self._rows[row]
+            hits.append({
+                "file_name": document.filename,
+                "content_hash": document.content_hash,
+                "heading": section.heading,
+                "start": section.start,
+                "end": section.end,
+                "distance": float(1.0 - similarities[row]),
+            })
+        return hits
+
+
+def load_snapshot(path: str) -> Optional[IndexSnapshot]:
+    """Open the snapshot at path, or return None if path is empty or the snapshot unusable."""
+    if not path:
+        return None
+    try:
+        snapshot = IndexSnapshot.open(path)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning("Ignoring index snapshot %s: %s", path, e)
+        return None
+    logger.info("Loaded index snapshot %s with %d documents", snapshot.version, len(snapshot.documents))
+    return snapshot
+
+
+def write_snapshot(output_dir: str, documents: List[Dict[str, Any]], embeddings: Optional[np.ndarray],
+                   keyword_model: Optional[str], embedding_model: Optional[str]) -> str:
+    """Write a new snapshot version under output_dir and make it current; returns the version.
+
+    documents are manifest entries: filename, content_hash, keywords,
+    sections as [heading, level, start, end] and first_row.
+    """
+    corpus = hashlib.sha256()
+    for document in sorted(documents, key=lambda document: document["filename"]):
+        corpus.update(f"{document['filename']}:{document['content_hash']}\n".encode("utf-8"))
+    version = f"{datetime.now():%Y%m%d-%H%M%S}-{corpus.hexdigest()[:8]}"
+    while os.path.exists(os.path.join(output_dir, version)):
+        version += "-1"
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "version": version,
+        "created_at": datetime.now().isoformat(),
+        "keyword_model": keyword_model,
+        "embedding_model": embedding_model if embeddings is not None else None,
+        "documents": {
+            document["filename"]: {key: document[key] for key in ("content_hash", "keywords", "sections", "first_row")}
+            for document in documents
+        },
+    }
+    tmp_dir = os.path.join(output_dir, f".tmp-{version}")
+    os.makedirs(tmp_dir)
+    if embeddings is not None:
+        np.save(os.path.join(tmp_dir, EMBEDDINGS), np.ascontiguousarray(embeddings, dtype=np.float32))
+    with open(os.path.join(tmp_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.rename(tmp_dir, os.path.join(output_dir, version))
+
+    current_tmp = os.path.join(output_dir, f".{CURRENT}.tmp")
+    with open(current_tmp, "w") as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(output_dir, CURRENT))
+    return version
+
+
+def prune_versions(output_dir: str, keep: int):
+    """Remove all but the newest keep versions; the current one is always kept."""
+    with open(os.path.join(output_dir, CURRENT), "r") as f:
+        current = f.read().strip()
+    versions = sorted(
+        entry for entry in os.listdir(output_dir)
+        if not entry.startswith(".") and os.path.isfile(os.path.join(output_dir, entry, MANIFEST))
+    )
+    for version in versions[:-keep] if keep > 0 else versions:
+        if version != current:
+            shutil.rmtree(os.path.join(output_dir, version), ignore_errors=True)
+
+
+def live_documents(markdown_dir: str) -> Dict[str, str]:
+    """Content hash of every document, listed the way the server lists them."""
+    documents = DocumentCache(0)
+    return {filename: documents.get(os.path.join(markdown_dir, f"{filename}.md")).digest
+            for filename in documents.list_markdown(markdown_dir)}
+
+
+async def build_snapshot(markdown_dir: str, output_dir: str, keyword_service, llm_services: List[Any],
+                         encode: Optional[Callable[[List[str]], np.ndarray]] = None,
+                         embedding_model: Optional[str] = None, batch_size: int = 256,
+                         workers_per_instance: int = 2) -> Dict[str, Any]:
+    """Index every document in markdown_dir into a new snapshot version and return a summary.
+
+    Keywords are taken from the previous version or the keyword store when
+    they are current and extracted with llm_services otherwise. encode turns
+    section texts into normalized embeddings; without it none are stored.
+    Documents left without keywords are counted as failed and left out, so
+    servers index them themselves.
+    """
+    from .bulk_import import ImportDocument, extract_keywords_pool
+
+    started = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    previous = load_snapshot(output_dir) if os.path.exists(os.path.join(output_dir, CURRENT)) else None
+    keyword_model = keyword_service.llm_service.model_id
+    summary = {"documents": 0, "sections": 0, "reused": 0, "extracted": 0, "embedded": 0, "failed": 0}
+
+    entries: List[Dict[str, Any]] = []
+    blocks: List[np.ndarray] = []
+    rows = 0
+    documents = DocumentCache(0)
+    filenames = sorted(documents.list_markdown(markdown_dir))
+    for i in range(0, len(filenames), batch_size):
+        batch = []
+        for filename in filenames[i:i + batch_size]:
+            document = documents.get(os.path.join(markdown_dir, f"{filename}.md"))
+            batch.append(ImportDocument(filename, document.content, document.digest))
+
+        keywords: Dict[str, List[str]] = {}
+        pending = []
+        for document in batch:
+            reused = previous.document(document.filename, document.digest) if previous is not None else None
+            stored = (keyword_service.load_keywords(document.filename)
+                      if keyword_service.is_up_to_date(document.filename, document.digest) else [])
+            # Empty keywords are what failed extractions used to be stored as; extract those again
+            if reused is not None and reused.keywords and previous.keyword_model == keyword_model:
+                keywords[document.filename] = reused.keywords
+                summary["reused"] += 1
+            elif stored:
+                keywords[document.filename] = stored
+            else:
+                pending.append(document)
+        if pending:
+            results, failed = await extract_keywords_pool(keyword_service, pending, llm_services,
+                                                          workers_per_instance)
+            # The build machine's keyword store doubles as a cache for the next build
+            keyword_service.save_keywords_batch(results)
+            keywords.update({filename: extracted for filename, extracted, _ in results})
+            summary["extracted"] += len(results)
+            summary["failed"] += len(failed)
+
+        texts: List[str] = []
+        # Blocks awaiting this batch's newly encoded embeddings
+        placeholders: List[int] = []
+        for document in batch:
+            if document.filename not in keywords:
+                continue
+            reused = previous.document(document.filename, document.digest) if previous is not None else None
+            sections = reused.sections if reused is not None else split_sections(document.filename, document.content)
+            entry = {
+                "filename": document.filename,
+                "content_hash": document.digest,
+                "keywords": keywords[document.filename],
+                "sections": [[section.heading, section.level, section.start, section.end] for section in sections],
+                "first_row": None,
+            }
+            if encode is not None:
+                entry["first_row"] = rows
+                rows += len(sections)
+                if (reused is not None and reused.first_row is not None
+                        and previous.embedding_model == embedding_model):
+                    blocks.append(np.array(previous.embeddings[reused.first_row:reused.first_row + len(sections)]))
+                else:
+                    texts.extend(section.text(document.content) for section in sections)
+                    placeholders.append(len(blocks))
+                    blocks.append(np.empty((len(sections), 0), dtype=np.float32))
+                    summary["embedded"] += 1
+            entries.append(entry)
+            summary["sections"] += len(sections)
+
+        if texts:
+            encoded = encode(texts)
+            offset = 0
+            for j in placeholders:
+                count = len(blocks[j])
+                blocks[j] = encoded[offset:offset + count]
+                offset += count
+        logger.info("Indexed %d/%d documents", min(i + batch_size, len(filenames)), len(filenames))
+
+    embeddings = None
+    if encode is not None:
+        blocks = [block for block in blocks if len(block)]
+        embeddings = np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+    version = await asyncio.to_thread(write_snapshot, output_dir, entries, embeddings, keyword_model,
+                                      embedding_model)
+    summary.update({
+        "version": version,
+        "path": os.path.join(output_dir, version),
+        "documents": len(entries),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    })
+    return summary
+
+
+def verify_snapshot(path: str, markdown_dir: str, keyword_model: Optional[str] = None) -> Dict[str, Any]:
+    """Compare a snapshot with the live documents.
+
+    Reports documents added, removed or changed since the build and, if
+    keyword_model is given, whether the keywords came from another model.
+    """
+    snapshot = IndexSnapshot.open(path)
+    live = live_documents(markdown_dir)
+    report: Dict[str, Any] = {
+        "version": snapshot.version,
+        "path": snapshot.path,
+        "created_at": snapshot.created_at,
+        "documents": len(snapshot.documents),
+        "live_documents": len(live),
+        "added": sorted(set(live) - set(snapshot.documents)),
+        "removed": sorted(set(snapshot.documents) - set(live)),
+        "changed": sorted(
+            filename for filename, digest in live.items()
+            if filename in snapshot.documents and snapshot.documents[filename].content_hash != digest
+        ),
+        "keyword_model": snapshot.keyword_model,
+        "keyword_model_matches": keyword_model is None or snapshot.keyword_model == keyword_model,
+    }
+    report["drift"] = bool(report["added"] or report["removed"] or report["changed"]
+                           or not report["keyword_model_matches"])
+    return report
+
+
+async def build_offline(args: argparse.Namespace) -> Dict[str, Any]:
+    from .bulk_import import default_instances, keyword_model_instances
+    from .keyword_service import KeywordService
+
+    instances = keyword_model_instances(args.instances or default_instances())
+    keyword_service = KeywordService(instances[0])
+    encode, embedding_model = None, None
+    if not args.no_embeddings:
+        from .vector_store import EMBEDDING_MODEL, encode_texts, load_embedding_model
+        model = await asyncio.to_thread(load_embedding_model)
+        embedding_model = EMBEDDING_MODEL
+        encode = partial(encode_texts, model)
+
+    summary = await build_snapshot(args.markdown_dir, args.output, keyword_service, instances, encode=encode,
+                                   embedding_model=embedding_model, batch_size=args.batch_size)
+    if args.keep:
+        prune_versions(args.output, args.keep)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build a new snapshot version")
+    build.add_argument("--markdown-dir", default=settings.markdown_dir, help="Documents to index")
+    build.add_argument("--output", default=settings.index_snapshot_dir or DEFAULT_OUTPUT,
+                       help="Snapshot directory (default BNF_INDEX_SNAPSHOT or index_snapshots/)")
+    build.add_argument("--instances", type=int, help="Keyword model instances (default: cores / n_threads, up to 4)")
+    build.add_argument("--batch-size", type=int, default=256, help="Documents read and embedded together")
+    build.add_argument("--no-embeddings", action="store_true", help="Skip section embeddings")
+    build.add_argument("--keep", type=int, default=3, help="Versions to keep, 0 for all")
+
+    verify = commands.add_parser("verify", help="Check a snapshot against the live documents")
+    verify.add_argument("--snapshot", default=settings.index_snapshot_dir or DEFAULT_OUTPUT,
+                        help="Snapshot directory or version (default BNF_INDEX_SNAPSHOT or index_snapshots/)")
+    verify.add_argument("--markdown-dir", default=settings.markdown_dir, help="Live documents")
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.command == "build":
+        print(json.dumps(asyncio.run(build_offline(args)), indent=2))
+        return
+
+    keyword_model = os.path.basename(get_model_profile(settings.keyword_profile).path)
+    try:
+        report = verify_snapshot(args.snapshot, args.markdown_dir, keyword_model)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Unreadable snapshot {args.snapshot}: {e}", file=sys.stderr)
+        sys.exit(2)
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["drift"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import asyncio
+import collections
+import itertools
+import math
+import queue
+import threading
+import time
+from typing import Any, Callable, Deque, Optional, Tuple
+
+from .metrics import metrics
+
+# Lower runs first: questions users are waiting on go ahead of indexing work
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+
+class QueueFullError(Exception):
+    """Raised when the inference queue cannot admit more work."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Inference queue is full, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class _Job:
+    def __init__(self, fn: Callable[[], Any], loop: asyncio.AbstractEventLoop, future: asyncio.Future,
+                 background: bool):
+        self.fn = fn
+        self.loop = loop
+        self.future = future
+        self.background = background
+        self.cancelled = False
+        self.submitted_at = time.monotonic()
+
+
+class InferenceQueue:
+    """Runs blocking model calls on a dedicated worker thread.
+
+    llama.cpp contexts are not thread-safe, so jobs are executed one at a time,
+    by priority and then in submission order. A running job is never
+    preempted. Callers await the result without blocking the event loop.
+
+    Admission only counts interactive jobs, since they run ahead of any
+    background backlog. Background jobs are capped at max_background waiting
+    or running; further ones wait for a slot before they are queued.
+    """
+
+    def __init__(self, max_depth: int = 8, retry_after: float = 5.0, name: str = "inference",
+                 max_background: int = 64):
+        self.name = name
+        self.max_depth = max_depth
+        self.max_background = max_background
+        self.retry_after = retry_after
+        self._jobs: "queue.PriorityQueue[tuple]" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._interactive_depth = 0
+        # Background slots taken, by jobs queued or about to be
+        self._background_depth = 0
+        # Background submitters waiting for a slot, in arrival order
+        self._slot_waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = collections.deque()
+        self._avg_duration: Optional[float] = None
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+        metrics.gauge("inference_queue_depth", lambda: self._depth, queue=name)
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting or running."""
+        return self._depth
+
+    @property
+    def interactive_depth(self) -> int:
+        """Number of interactive jobs waiting or running."""
+        return self._interactive_depth
+
+    def is_full(self) -> bool:
+        return self.interactive_depth >= self.max_depth
+
+    def check_admission(self):
+        """Raise QueueFullError if a new user request should be turned away."""
+        if self.is_full():
+            metrics.inc("inference_queue_rejections_total", queue=self.name)
+            raise QueueFullError(self.estimated_wait())
+
+    def estimated_wait(self) -> float:
+        """Rough seconds until the queue drains, used for Retry-After."""
+        if self._avg_duration is None:
+            return self.retry_after
+        return max(self.retry_after, math.ceil(self._avg_duration * self.interactive_depth))
+
+    async def submit(self, fn: Callable[[], Any], priority: int = PRIORITY_INTERACTIVE) -> Any:
+        """Run fn on the worker thread and return its result.
+
+        Cancelling the awaiting task drops the job if it has not started yet.
+        """
+        loop = asyncio.get_running_loop()
+        background = priority >= PRIORITY_BACKGROUND
+        if background:
+            await self._acquire_background_slot(loop)
+        job = _Job(fn, loop, loop.create_future(), background)
+        with self._lock:
+            self._depth += 1
+            if not background:
+                self._interactive_depth += 1
+        self._jobs.put((priority, next(self._sequence), job))
+        try:
+            return await job.future
+        except asyncio.CancelledError:
+            job.cancelled = True
+            raise
+
+    async def _acquire_background_slot(self, loop: asyncio.AbstractEventLoop):
+        with self._lock:
+            if self._background_depth < self.max_background and not self._slot_waiters:
+                self._background_depth += 1
+                return
+            waiter = loop.create_future()
+            self._slot_waiters.append((loop, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._slot_waiters.remove((loop, waiter))
+                except ValueError:
+                    # The slot was already handed over; pass it on
+                    self._release_background_slot()
+            raise
+
+    def _release_background_slot(self):
+        """Hand a finished background job's slot to the next waiter; the caller holds the lock."""
+        if self._slot_waiters:
+            loop, waiter = self._slot_waiters.popleft()
+            loop.call_soon_threadsafe(self._set_result, waiter, None)
+        else:
+            self._background_depth -= 1
+
+    def _run(self):
+        while True:
+            _, _, job = self._jobs.get()
+            try:
+                if job.cancelled or job.future.cancelled():
+                    continue
+                started = time.monotonic()
+                metrics.observe("stage_duration_seconds", started - job.submitted_at, stage="queue_wait", queue=self.name)
+                try:
+                    result = job.fn()
+                except BaseException as e:
+                    job.loop.call_soon_threadsafe(self._set_exception, job.future, e)
+                else:
+                    job.loop.call_soon_threadsafe(self._set_result, job.future, result)
+                self._record_duration(time.monotonic() - started)
+            finally:
+                with self._lock:
+                    self._depth -= 1
+                    if job.background:
+                        self._release_background_slot()
+                    else:
+                        self._interactive_depth -= 1
+
+    def _record_duration(self, duration: float):
+        # Exponential moving average keeps the estimate responsive to load changes
+        if self._avg_duration is None:
+            self._avg_duration = duration
+        else:
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+
+    @staticmethod
+    def _set_result(future: asyncio.Future, result: Any):
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    def _set_exception(future: asyncio.Future, exc: BaseException):
+        if not future.done():
+            future.set_exception(exc)
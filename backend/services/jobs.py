@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    key: str
+    state: str = "queued"  # queued, running, done or failed
+    created_at: str = ""
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+    result: Any = None
+    # Updated by long-running jobs while they run
+    progress: Optional[Dict[str, Any]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class JobQueue:
+    """Runs background jobs one at a time on the event loop.
+
+    A job submitted while another of the same kind and key is still queued
+    is merged into it, so job functions must read the current state when
+    they run rather than capture it at submit time. Finished jobs are kept
+    for status queries up to max_history.
+    """
+
+    def __init__(self, name: str = "jobs", max_history: int = 1000):
+        self.name = name
+        self.max_history = max_history
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._functions: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self._queued: Dict[Tuple[str, str], Job] = {}
+        self._pending: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        metrics.gauge("background_jobs_queued", lambda: len(self._queued), queue=name)
+
+    def submit(self, kind: str, key: str, fn: Callable[[], Awaitable[Any]]) -> Job:
+        """Queue fn and return its job, or the already queued job for the same kind and key."""
+        existing = self._queued.get((kind, key))
+        if existing is not None:
+            metrics.inc("background_jobs_total", queue=self.name, kind=kind, result="merged")
+            return existing
+
+        job = Job(id=uuid.uuid4().hex, kind=kind, key=key, created_at=datetime.now().isoformat())
+        self.jobs[job.id] = job
+        self._functions[job.id] = fn
+        self._queued[(kind, key)] = job
+        if self._pending is None:
+            self._pending = asyncio.Queue()
+        self._pending.put_nowait(job)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run())
+        self._trim()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def join(self):
+        """Wait until every queued job has finished."""
+        if self._pending is not None:
+            await self._pending.join()
+
+    async def _run(self):
+        while True:
+            job = await self._pending.get()
+            self._queued.pop((job.kind, job.key), None)
+            fn = self._functions.pop(job.id)
+            job.state = "running"
+            job.started_at = datetime.now().isoformat()
+            try:
+                with metrics.span("background_job", kind=job.kind):
+                    job.result = await fn()
+                job.state = "done"
+            except Exception as e:
+                logger.warning("Background %s job for %s failed: %s", job.kind, job.key, e)
+                job.state = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = datetime.now().isoformat()
+                metrics.inc("background_jobs_total", queue=self.name, kind=job.kind, result=job.state)
+                self._pending.task_done()
+
+    def _trim(self):
+        # Forget the oldest finished jobs; queued and running ones are always kept
+        excess = len(self.jobs) - self.max_history
+        for job_id in list(self.jobs):
+            if excess <= 0:
+                break
+            if self.jobs[job_id].state in ("done", "failed"):
+                del self.jobs[job_id]
+                excess -= 1
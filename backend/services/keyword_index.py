@@ -0,0 +1,96 @@
+import heapq
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class KeywordIndex:
+    """In-memory inverted index from keyword to the documents that contain it.
+
+    Documents are ranked with BM25, treating each document's extracted keyword
+    list as its bag of terms. Query cost depends on the posting lists of the
+    query terms, not on the number of documents.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # keyword -> {filename: term frequency}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        # filename -> distinct keywords, used to undo a document's postings
+        self.doc_terms: Dict[str, Set[str]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self.doc_lengths
+
+    @staticmethod
+    def _normalize(keyword: str) -> str:
+        return keyword.lower().strip()
+
+    def add_document(self, filename: str, keywords: Iterable[str]):
+        """Index a document, replacing any previous keywords for it."""
+        self.remove_document(filename)
+        counts = Counter(k for k in (self._normalize(k) for k in keywords) if k)
+        for keyword, tf in counts.items():
+            self.postings.setdefault(keyword, {})[filename] = tf
+        length = sum(counts.values())
+        self.doc_terms[filename] = set(counts)
+        self.doc_lengths[filename] = length
+        self._total_length += length
+
+    def remove_document(self, filename: str):
+        """Drop a document from the index if present."""
+        terms = self.doc_terms.pop(filename, None)
+        if terms is None:
+            return
+        for keyword in terms:
+            posting = self.postings.get(keyword)
+            if posting is None:
+                continue
+            posting.pop(filename, None)
+            if not posting:
+                del self.postings[keyword]
+        self._total_length -= self.doc_lengths.pop(filename)
+
+    def idf(self, keyword: str) -> float:
+        """BM25 inverse document frequency, always positive."""
+        n_docs = len(self.doc_lengths)
+        df = len(self.postings.get(keyword, ()))
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, query_keywords: Iterable[str], top_k: int = 5, allowed: Optional[Set[str]] = None,
+               min_matched: int = 1) -> List[Tuple[str, float, List[str]]]:
+        """Return up to top_k (filename, score, matched keywords), best first.
+
+        Documents matching fewer than min_matched query keywords, or outside
+        allowed when it is given, are ignored.
+        """
+        if not self.doc_lengths:
+            return []
+        avg_length = self._total_length / len(self.doc_lengths) or 1.0
+        scores: Dict[str, float] = {}
+        matched: Dict[str, List[str]] = {}
+
+        for keyword in dict.fromkeys(self._normalize(k) for k in query_keywords):
+            posting = self.postings.get(keyword)
+            if not posting:
+                continue
+            idf = self.idf(keyword)
+            for filename, tf in posting.items():
+                if allowed is not None and filename not in allowed:
+                    continue
+                length_norm = 1 - self.b + self.b * self.doc_lengths[filename] / avg_length
+                scores[filename] = scores.get(filename, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+                matched.setdefault(filename, []).append(keyword)
+
+        if min_matched > 1:
+            scores = {f: score for f, score in scores.items() if len(matched[f]) >= min_matched}
+
+        # Ties are broken by filename so results are deterministic
+        ranked = heapq.nsmallest(top_k, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(filename, score, matched[filename]) for filename, score in ranked]
@@ -1,149 +1,242 @@
-from typing import List, Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
 import json
+import logging
+import math
 import os
+import re
+import time
+from .cache import LRUCache
+from .config import settings
+from .inference_queue import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from .keyword_index import KeywordIndex
+from .keyword_store import KeywordEntry, KeywordStore
 from .llm_service import LLMService
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class KeywordExtractionError(Exception):
+    """Every attempt to extract keywords failed or returned none."""
+
+# Output is always {"keywords": ["...", ...]}; whitespace is limited so the
+# model cannot pad its way to max_tokens
+KEYWORDS_GRAMMAR = r'''
+root    ::= "{" ws "\"keywords\"" ws ":" ws "[" ws (keyword (ws "," ws keyword)*)? ws "]" ws "}"
+keyword ::= "\"" [^"\\\n]+ "\""
+ws      ::= " "?
+'''
+
+# Static part of the prompt, kept first so its evaluated state can be cached
+KEYWORDS_PREFIX = """Extract up to {limit} search keywords from the text below.
+Use short lowercase terms: product names, technologies, tasks and concepts.
+Respond with a JSON object of the form {{"keywords": ["keyword1", "keyword2"]}}.
+
+Text to analyze:
+"""
+
+KEYWORDS_PROMPT = """{prefix}{text}
+
+JSON:"""
+
+def normalize_question(question: str) -> str:
+    """Normalize a question so trivially different phrasings share a cache key."""
+    # Lowercase, drop punctuation and collapse whitespace
+    normalized = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(normalized.split())
+
+@dataclass
+class KeywordMatch:
+    """A file matched against a set of query keywords."""
+    filename: str
+    score: float
+    matched_keywords: List[str] = field(default_factory=list)
 
 class KeywordService:
-    def __init__(self, llm_service: LLMService):
+    def __init__(self, llm_service: LLMService, cache_size: int = 1024, cache_ttl: float = 3600):
         self.llm_service = llm_service
-        self.keywords_dir = os.path.join(os.path.dirname(__file__), "..", "keyword_storage")
+        self.keywords_dir = settings.keywords_dir
         os.makedirs(self.keywords_dir, exist_ok=True)
         self.max_retries = 3
+        self.max_keywords = 32
+
+        # Keywords with the content hash and model that produced them; older
+        # versions kept one JSON file per document plus a manifest
+        self.store = KeywordStore(os.path.join(self.keywords_dir, "keywords.db"))
+        self.store.import_json(self.keywords_dir)
+        self.entries: Dict[str, KeywordEntry] = self.store.load_all()
+
+        # Inverted index over all stored keywords, kept in sync by save/remove
+        self.index = KeywordIndex()
+        for entry in self.entries.values():
+            self.index.add_document(entry.filename, entry.keywords)
+
+        # Question -> keywords cache, keyed on the normalized question
+        self.question_cache = LRUCache(max_size=cache_size, ttl=cache_ttl)
+        metrics.gauge("cache_hit_rate", lambda: self.question_cache.stats()["hit_rate"], cache="question_keywords")
+
+    async def extract_question_keywords(self, question: str) -> List[str]:
+        """Extract keywords from a user question, reusing cached results."""
+        key = normalize_question(question)
+        cached = self.question_cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        try:
+            keywords = await self.extract_keywords(question, PRIORITY_INTERACTIVE)
+        except KeywordExtractionError as e:
+            # Retrieval goes on without keywords; not cached, so the next ask retries
+            logger.info("No keywords for question: %s", e)
+            return []
+        self.question_cache.set(key, tuple(keywords))
+        return keywords
+
+    async def extract_keywords(self, text: str, priority: int = PRIORITY_BACKGROUND,
+                               llm_service: Optional[LLMService] = None) -> List[str]:
+        """Extract keywords from text using LLM with retry logic.
+
+        Runs at background priority unless a user is waiting on the result.
+        llm_service selects another instance of the keyword model, as used by
+        bulk imports. Raises KeywordExtractionError if every attempt fails or
+        returns nothing, so a failure is never stored as a document without keywords.
+        """
+        # Tokenizing needs the model; read it on its inference thread rather than on the event loop
+        model = llm_service or self.llm_service
+        if not model.loaded:
+            await model.load()
 
-    async def extract_keywords(self, text: str) -> List[str]:
-        """Extract keywords from text using LLM with retry logic."""
         retries = 0
         while retries < self.max_retries:
             try:
-                print(f"Attempt {retries + 1} to extract keywords from text: {text[:100]}...")  # Print first 100 chars
-                keywords = await self._attempt_keyword_extraction(text)
+                with metrics.span("keyword_extraction_attempt"):
+                    keywords = await self._attempt_keyword_extraction(text, priority, llm_service)
                 
                 if keywords:
-                    print(f"Successfully extracted keywords on attempt {retries + 1}: {keywords}")
+                    logger.debug("Extracted keywords on attempt %d: %s", retries + 1, keywords)
                     return keywords
                 
-                print(f"No keywords extracted on attempt {retries + 1}, retrying...")
+                logger.info("No keywords extracted on attempt %d, retrying", retries + 1)
                 retries += 1
             except Exception as e:
-                print(f"Error on attempt {retries + 1}: {str(e)}")
+                logger.warning("Keyword extraction attempt %d failed: %s", retries + 1, e)
                 retries += 1
                 
-        print("Failed to extract keywords after all retries")
-        return []
+        raise KeywordExtractionError(f"No keywords after {self.max_retries} attempts")
+
+    async def _attempt_keyword_extraction(self, text: str, priority: int = PRIORITY_BACKGROUND,
+                                          llm_service: Optional[LLMService] = None) -> List[str]:
+        """Single attempt at keyword extraction.
 
-    async def _attempt_keyword_extraction(self, text: str) -> List[str]:
-        """Single attempt at keyword extraction."""
-        prompt = f"""
-        Extract keywords from the text below. Return ONLY a JSON object, nothing else.
+        Generation is constrained by KEYWORDS_GRAMMAR, so the response is valid
+        JSON unless it was cut off at max_tokens.
+        """
+        llm_service = llm_service or self.llm_service
+        prefix = KEYWORDS_PREFIX.format(limit=self.max_keywords)
+        empty_prompt = KEYWORDS_PROMPT.format(prefix=prefix, text="")
+        text_budget = llm_service.available_tokens(empty_prompt, llm_service.max_tokens)
+        prompt = KEYWORDS_PROMPT.format(prefix=prefix, text=llm_service.truncate_tokens(text, text_budget))
 
-        REQUIRED FORMAT:
-        {{"keywords": ["keyword1", "keyword2", "keyword3", ...]}}
+        try:
+            response = await llm_service.generate_json(
+                prompt,
+                KEYWORDS_GRAMMAR,
+                prefix_name="keywords",
+                prefix=prefix,
+                priority=priority
+            )
+        except Exception:
+            metrics.inc("keyword_extraction_attempts_total", outcome="error")
+            raise
 
-        NO explanations.
-        NO additional text.
-        NO formatting.
-        ONLY the JSON object.
+        metrics.inc("keyword_extraction_tokens_total", response["completion_tokens"])
 
-        Text to analyze:
-        {text}
-        """
-        
-        response = await self.llm_service.generate_answer(prompt, "")
-        answer = response["answer"].strip()
-        print(f"Raw LLM response: {answer}")
-        
         try:
-            # Try to find JSON object if there's additional text
-            start_idx = answer.find('{')
-            end_idx = answer.rfind('}')
-            if start_idx != -1 and end_idx != -1:
-                json_str = answer[start_idx:end_idx + 1]
-            else:
-                json_str = answer
-
-            # Parse JSON response
-            data = json.loads(json_str)
-            keywords = data.get("keywords", [])
-            
-            # Preprocess keywords
-            cleaned_keywords = []
-            for keyword in keywords:
-                # Convert to lowercase and strip whitespace and punctuation
-                cleaned = keyword.lower().strip().strip('"\'[]{}()').strip()
-                if cleaned and len(cleaned) > 1:  # Ensure keyword is not empty and has at least 2 chars
-                    cleaned_keywords.append(cleaned)
-            
-            print(f"Cleaned keywords: {cleaned_keywords}")
-            return cleaned_keywords[:32]  # Limit to 32 keywords
-            
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse JSON response: {answer}")
-            print(f"JSON error: {str(e)}")
-            
-            # Fallback: try to extract keywords from the response if it contains a list-like structure
-            if '[' in answer and ']' in answer:
-                start = answer.find('[')
-                end = answer.rfind(']')
-                if start != -1 and end != -1:
-                    keywords_str = answer[start+1:end]
-                    # Split by commas and clean up
-                    keywords = [k.strip().strip('"\'').lower() for k in keywords_str.split(',')]
-                    keywords = [k for k in keywords if k and len(k) > 1]
-                    print(f"Extracted keywords using fallback: {keywords}")
-                    return keywords[:32]
-            
+            data = json.loads(response["text"])
+        except json.JSONDecodeError:
+            # Only happens when the output hit max_tokens before closing the object
+            logger.info("Truncated keyword response (finish_reason=%s)", response["finish_reason"])
+            metrics.inc("keyword_extraction_attempts_total", outcome="invalid")
             return []
 
-    def save_keywords(self, filename: str, keywords: List[str]):
-        """Save keywords for a markdown file."""
-        filepath = os.path.join(self.keywords_dir, f"{filename}.json")
-        with open(filepath, 'w') as f:
-            json.dump(keywords, f, indent=2)
+        # Preprocess keywords
+        cleaned_keywords = []
+        for keyword in data.get("keywords", []):
+            # Convert to lowercase and strip whitespace and punctuation
+            cleaned = keyword.lower().strip().strip('"\'[]{}()').strip()
+            if cleaned and len(cleaned) > 1 and cleaned not in cleaned_keywords:  # At least 2 chars, no duplicates
+                cleaned_keywords.append(cleaned)
+
+        metrics.inc("keyword_extraction_attempts_total", outcome="success" if cleaned_keywords else "empty")
+        return cleaned_keywords[:self.max_keywords]
+
+    def is_up_to_date(self, filename: str, content_hash: str) -> bool:
+        """Check whether stored keywords were extracted from this content by the current model."""
+        entry = self.entries.get(filename)
+        return (
+            entry is not None
+            and entry.content_hash == content_hash
+            and entry.model == self.llm_service.model_id
+        )
+
+    def indexed_files(self) -> List[str]:
+        """List files that have stored keywords."""
+        return list(self.entries.keys())
+
+    def save_keywords(self, filename: str, keywords: List[str], content_hash: Optional[str] = None):
+        """Save keywords for a markdown file.
+
+        When content_hash is given the file is skipped on the next refresh
+        as long as its content and the model stay the same.
+        """
+        self.save_keywords_batch([(filename, keywords, content_hash)])
+
+    def save_keywords_batch(self, items: List[Tuple[str, List[str], Optional[str]]]):
+        """Save (filename, keywords, content_hash) for several files in one atomic commit."""
+        now = time.time()
+        entries = [
+            KeywordEntry(filename, list(keywords), content_hash,
+                         self.llm_service.model_id if content_hash is not None else None, now)
+            for filename, keywords, content_hash in items
+        ]
+        self.store.put_many(entries)
+        for entry in entries:
+            self.entries[entry.filename] = entry
+            self.index.add_document(entry.filename, entry.keywords)
+
+    def remove_keywords(self, filename: str):
+        """Remove stored keywords for a file."""
+        self.store.remove(filename)
+        self.entries.pop(filename, None)
+        self.index.remove_document(filename)
+
+    def keywords_modified(self, filename: str) -> Optional[float]:
+        """When a file's keywords were last saved, or None if there are none."""
+        entry = self.entries.get(filename)
+        return entry.updated_at if entry is not None else None
 
     def load_keywords(self, filename: str) -> List[str]:
         """Load keywords for a markdown file."""
-        filepath = os.path.join(self.keywords_dir, f"{filename}.json")
-        if not os.path.exists(filepath):
-            return []
-        with open(filepath, 'r') as f:
-            data = json.load(f)
-            # Handle both old format (dict with "keywords" field) and new format (direct list)
-            if isinstance(data, dict):
-                return data.get("keywords", [])
-            return data
-
-    def find_best_match(self, query_keywords: List[str], all_files: List[str]) -> Optional[str]:
-        """Find the best matching markdown file based on keyword similarity."""
-        best_match = None
-        best_score = 0
+        entry = self.entries.get(filename)
+        return list(entry.keywords) if entry is not None else []
+
+    def find_top_matches(self, query_keywords: List[str], all_files: Optional[List[str]] = None,
+                         top_k: int = 5) -> List[KeywordMatch]:
+        """Rank markdown files against the query keywords with BM25.
+
+        Files that match fewer than min_score_threshold of the query keywords
+        are dropped. If all_files is given, only those files are considered.
+        """
         min_score_threshold = 0.1  # At least 10% of keywords should match
         min_matches = 1  # At least 1 keyword must match
+        if not query_keywords:
+            return []
 
-        print(f"Finding best match for keywords: {query_keywords}")
-        print(f"Available files: {all_files}")
-
-        for filename in all_files:
-            file_keywords = self.load_keywords(filename)
-            print(f"Keywords for {filename}: {file_keywords}")
-
-            if not file_keywords:
-                print(f"No keywords found for {filename}")
-                continue
-
-            # Calculate similarity score
-            matching_keywords = set(query_keywords) & set(file_keywords)
-            num_matches = len(matching_keywords)
-            
-            # Score is the percentage of query keywords that match
-            score = num_matches / len(query_keywords) if query_keywords else 0
-            
-            print(f"File: {filename}, Matching keywords: {matching_keywords}, Score: {score}")
-            
-            # Must meet both minimum matches and threshold
-            if num_matches >= min_matches and score >= min_score_threshold and score > best_score:
-                best_score = score
-                best_match = filename
-                print(f"New best match: {filename} with score {score}")
-
-        print(f"Final best match: {best_match} with score {best_score if best_match else 0}")
-        return best_match 
\ No newline at end of file
+        allowed = set(all_files) if all_files is not None else None
+        min_matched = max(min_matches, math.ceil(min_score_threshold * len(set(query_keywords))))
+        results = self.index.search(query_keywords, top_k=top_k, allowed=allowed, min_matched=min_matched)
+        return [KeywordMatch(filename, score, sorted(matched)) for filename, score, matched in results]
+
+    def find_best_match(self, query_keywords: List[str], all_files: Optional[List[str]] = None) -> Optional[KeywordMatch]:
+        """Find the best matching markdown file based on keyword similarity."""
+        matches = self.find_top_matches(query_keywords, all_files, top_k=1)
+        return matches[0] if matches else None
@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from .database import connect
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS keywords (
+    filename TEXT PRIMARY KEY,
+    keywords TEXT NOT NULL,
+    -- Content hash and model the keywords were extracted with; NULL if unknown
+    content_hash TEXT,
+    model TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+@dataclass
+class KeywordEntry:
+    filename: str
+    keywords: List[str] = field(default_factory=list)
+    content_hash: Optional[str] = None
+    model: Optional[str] = None
+    # Seconds since the epoch
+    updated_at: float = 0.0
+
+
+class KeywordStore:
+    """Extracted keywords of every document in one SQLite database.
+
+    Each document has one row holding its keywords and the content hash and
+    model they were extracted with. put_many writes a batch in a single
+    transaction, so a crash leaves either all or none of it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = connect(path)
+        with self._db:
+            self._db.executescript(SCHEMA)
+
+    def load_all(self) -> Dict[str, KeywordEntry]:
+        """Read every entry with one query."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT filename, keywords, content_hash, model, updated_at FROM keywords"
+            ).fetchall()
+        return {
+            row["filename"]: KeywordEntry(row["filename"], json.loads(row["keywords"]), row["content_hash"],
+                                          row["model"], row["updated_at"])
+            for row in rows
+        }
+
+    def put(self, entry: KeywordEntry):
+        self.put_many([entry])
+
+    def put_many(self, entries: Iterable[KeywordEntry]):
+        """Write entries in one transaction."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO keywords (filename, keywords, content_hash, model, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(entry.filename, json.dumps(entry.keywords, separators=(",", ":")), entry.content_hash,
+                  entry.model, entry.updated_at) for entry in entries]
+            )
+
+    def remove(self, filename: str):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM keywords WHERE filename = ?", (filename,))
+
+    def import_json(self, directory: str):
+        """Import per-file keyword JSON and its manifest, as written by earlier versions, once.
+
+        Keyword files may hold a list or a dict with a "keywords" field.
+        Entries missing from the manifest are imported without a content hash,
+        so they are re-extracted on the next refresh.
+        """
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM meta WHERE key = 'import:json'").fetchone():
+                return
+
+        manifest: Dict[str, Dict[str, str]] = {}
+        manifest_path = os.path.join(directory, "manifest.json")
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r') as f:
+                    manifest = json.load(f).get("documents", {})
+            except (OSError, ValueError) as e:
+                logger.warning("Ignoring unreadable keyword manifest: %s", e)
+
+        entries = []
+        for name in os.listdir(directory):
+            if not name.endswith('.json') or name == "manifest.json":
+                continue
+            filename = name[:-5]
+            path = os.path.join(directory, name)
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("Skipping unreadable keywords for %s: %s", filename, e)
+                continue
+            keywords = data.get("keywords", []) if isinstance(data, dict) else data
+            info = manifest.get(filename, {})
+            entries.append(KeywordEntry(filename, list(keywords), info.get("content_hash"), info.get("model"),
+                                        os.path.getmtime(path)))
+
+        self.put_many(entries)
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('import:json', ?)", (str(time.time()),))
+        if entries:
+            logger.info("Imported keywords of %d documents from %s", len(entries), directory)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,37 +1,242 @@
-from llama_cpp import Llama
+from llama_cpp import Llama, LlamaGrammar
+import asyncio
 import os
-from typing import Dict, Any
+import threading
+import time
+from functools import partial
+from typing import AsyncIterator, Dict, Any, Iterator, Optional
 import json
+from .config import ModelProfile, get_model_profile, settings
+from .inference_queue import PRIORITY_INTERACTIVE, InferenceQueue
+from .metrics import metrics
+from .prefix_cache import PrefixCache
 
-class LLMService:
-    def __init__(self):
-        model_path = os.path.join(os.path.dirname(__file__), "..", "models", "llama-2-7b-chat.Q4_K_M.gguf")
-        self.llm = Llama(
-            model_path=model_path,
-            n_ctx=2048,  # Context window
-            n_threads=4,  # Number of CPU threads to use
+# Static instructions come first so their KV state can be reused across questions
+ANSWER_PREFIX = """You are an AI assistant for a documentation system. The context below is from verified documentation files and should be treated as factual, even if it contains unusual or surprising information.
+
+Please provide a detailed answer based on the context. The context is from verified documentation, so use it as your source of truth. If the context doesn't contain enough information to answer the question confidently, please indicate this in your response.
+
+"""
+
+class ModelNotLoadedError(Exception):
+    """The model has not been loaded yet, or loading it failed."""
+
+class _LoadedModel:
+    """A GGUF model with its inference queue and prefix cache.
+
+    Shared by every profile with the same load settings, since one llama.cpp
+    context can only run one job at a time. The model itself is only read
+    from disk by load().
+    """
+
+    def __init__(self, profile: ModelProfile):
+        self.profile = profile
+        self.llm: Optional[Llama] = None
+        self._lock = threading.Lock()
+
+        # All inference runs on one worker thread so the event loop stays free
+        self.queue = InferenceQueue(
+            max_depth=settings.inference_queue_depth,
+            retry_after=settings.inference_retry_after,
+            name=f"inference-{profile.name}",
+            max_background=settings.inference_background_depth,
         )
 
-    async def generate_answer(self, question: str, context: str = "") -> Dict[str, Any]:
-        # Construct the prompt with context and question
-        prompt = f"""You are an AI assistant for a documentation system. The following context is from verified documentation files and should be treated as factual, even if it contains unusual or surprising information.
+        # Evaluated KV state of static prompt prefixes
+        self.prefix_cache = None
+        if settings.prefix_cache_ram_bytes > 0 or settings.prefix_cache_disk_bytes > 0:
+            self.prefix_cache = PrefixCache(
+                ram_bytes=settings.prefix_cache_ram_bytes,
+                disk_dir=os.path.join(os.path.dirname(__file__), "..", "prefix_cache", os.path.basename(profile.path)),
+                disk_bytes=settings.prefix_cache_disk_bytes,
+            )
+            cache = self.prefix_cache
+            metrics.gauge("cache_hit_rate", lambda: cache.stats()["hit_rate"], cache=f"prefix-{profile.name}")
 
-Context: {context}
+        # Parsed GBNF grammars, keyed by their source text
+        self.grammars: Dict[str, LlamaGrammar] = {}
 
-Question: {question}
+    def load(self) -> Llama:
+        with self._lock:
+            if self.llm is None:
+                with metrics.span("model_load", profile=self.profile.name):
+                    self.llm = Llama(
+                        model_path=self.profile.path,
+                        n_ctx=self.profile.n_ctx,  # Context window
+                        n_threads=self.profile.n_threads,  # Number of CPU threads to use
+                        n_batch=self.profile.n_batch,
+                        use_mmap=self.profile.use_mmap,
+                        use_mlock=self.profile.use_mlock,
+                    )
+            return self.llm
+
+_loaded_models: Dict[tuple, _LoadedModel] = {}
+_services: Dict[str, 'LLMService'] = {}
+
+class LLMService:
+    def __init__(self, profile: Optional[ModelProfile] = None):
+        self.profile = profile or get_model_profile(settings.answer_profile)
+        key = self.profile.load_key()
+        if key not in _loaded_models:
+            _loaded_models[key] = _LoadedModel(self.profile)
+        self._model = _loaded_models[key]
+        model = self._model
+
+        self.queue = model.queue
+        self.prefix_cache = model.prefix_cache
+        self._grammars = model.grammars
+        # Sampling defaults for completions made through this profile
+        self.sampling: Dict[str, Any] = dict(self.profile.sampling)
+        # Identifies the model in indexes built from its output
+        self.model_id = os.path.basename(self.profile.path)
+
+    @classmethod
+    def for_profile(cls, name: str) -> 'LLMService':
+        """Get the shared service for a named model profile."""
+        if name not in _services:
+            _services[name] = cls(get_model_profile(name))
+        return _services[name]
+
+    @property
+    def max_tokens(self) -> int:
+        return self.sampling.get("max_tokens", 512)
+
+    @property
+    def llm(self) -> Llama:
+        """The loaded llama.cpp model.
+
+        Tokenizing helpers run on the event loop, so this never reads the model
+        from disk; it raises ModelNotLoadedError until load() has finished.
+        """
+        if self._model.llm is None:
+            raise ModelNotLoadedError(f"Model {self.profile.name} is not loaded")
+        return self._model.llm
+
+    @property
+    def loaded(self) -> bool:
+        return self._model.llm is not None
+
+    async def load(self):
+        """Load the model on its inference thread, so queued completions wait for it."""
+        await self.queue.submit(self._model.load)
+
+    async def warm_up(self):
+        """Run one short generation so the first real request does not pay for cold caches."""
+        with metrics.span("warmup", profile=self.profile.name):
+            await self.queue.submit(partial(self._complete, "Hello", max_tokens=4))
+
+    def _stream_completion(self, prompt: str, prefix_name: Optional[str] = None, prefix: str = "",
+                           **kwargs) -> Iterator[Dict[str, Any]]:
+        """Stream a completion on the inference thread, reusing a cached prefix if given.
+
+        prompt must start with prefix. Prompt evaluation (up to the first
+        token) and generation are timed as separate stages.
+        """
+        started = time.perf_counter()
+        # On the inference thread, so the model may be read from disk here if needed
+        llm = self._model.load()
+        if self.prefix_cache is not None and prefix:
+            self.prefix_cache.prepare(llm, prefix_name, prefix)
+        metrics.inc("llm_prompt_tokens_total", len(llm.tokenize(prompt.encode('utf-8'))), profile=self.profile.name)
+
+        first_token_at = None
+        count = 0
+        try:
+            for chunk in llm(prompt, stream=True, **kwargs):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    metrics.observe("stage_duration_seconds", first_token_at - started,
+                                    stage="prompt_eval", profile=self.profile.name)
+                count += 1
+                yield chunk
+        finally:
+            if first_token_at is not None:
+                metrics.observe("stage_duration_seconds", time.perf_counter() - first_token_at,
+                                stage="generation", profile=self.profile.name)
+            metrics.inc("llm_completion_tokens_total", count, profile=self.profile.name)
+
+    def _complete(self, prompt: str, prefix_name: Optional[str] = None, prefix: str = "", **kwargs) -> Dict[str, Any]:
+        """Run a completion to the end and return it in llama-cpp's response shape."""
+        parts = []
+        finish_reason = None
+        for chunk in self._stream_completion(prompt, prefix_name, prefix, **kwargs):
+            choice = chunk["choices"][0]
+            parts.append(choice["text"])
+            finish_reason = choice.get("finish_reason") or finish_reason
+        return {
+            "choices": [{"text": "".join(parts), "finish_reason": finish_reason}],
+            "usage": {"completion_tokens": len(parts)},
+        }
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with the model's own tokenizer."""
+        return len(self.llm.tokenize(text.encode('utf-8'), add_bos=False))
+
+    def truncate_tokens(self, text: str, max_tokens: int) -> str:
+        """Cut text down to at most max_tokens tokens."""
+        tokens = self.llm.tokenize(text.encode('utf-8'), add_bos=False)
+        if len(tokens) <= max_tokens:
+            return text
+        return self.llm.detokenize(tokens[:max_tokens]).decode('utf-8', errors='ignore')
+
+    def available_tokens(self, prompt: str, max_tokens: int) -> int:
+        """Tokens of n_ctx left after prompt and a completion of max_tokens."""
+        used = len(self.llm.tokenize(prompt.encode('utf-8')))
+        return max(0, self.llm.n_ctx() - max_tokens - used)
+
+    def context_budget(self, question: str) -> int:
+        """Tokens left for context once the prompt template, question and answer are accounted for."""
+        available = self.available_tokens(self._build_prompt(question, ""), self.max_tokens)
+        return min(settings.context_token_budget, available)
+
+    async def generate_json(self, prompt: str, grammar: str, max_tokens: Optional[int] = None,
+                            prefix_name: Optional[str] = None, prefix: str = "",
+                            priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+        """Generate text constrained by a GBNF grammar.
 
-Please provide a detailed answer based on the context above. The context is from verified documentation, so use it as your source of truth. If the context doesn't contain enough information to answer the question confidently, please indicate this in your response.
+        Returns the raw text together with completion token count and latency
+        so callers can report per-attempt cost. If prompt starts with a static
+        prefix, pass it with a name so its evaluated state is cached. Pass
+        PRIORITY_BACKGROUND for work no user is waiting on.
+        """
+        if grammar not in self._grammars:
+            self._grammars[grammar] = LlamaGrammar.from_string(grammar, verbose=False)
+
+        started = time.monotonic()
+        response = await self.queue.submit(partial(
+            self._complete,
+            prompt,
+            prefix_name,
+            prefix,
+            grammar=self._grammars[grammar],
+            **{**self.sampling, "max_tokens": max_tokens or self.max_tokens},
+        ), priority)
+        return {
+            "text": response["choices"][0]["text"],
+            "finish_reason": response["choices"][0].get("finish_reason"),
+            "completion_tokens": response.get("usage", {}).get("completion_tokens", 0),
+            "seconds": time.monotonic() - started,
+        }
+
+    def _build_prompt(self, question: str, context: str) -> str:
+        """Construct the prompt with context and question."""
+        return f"""{ANSWER_PREFIX}Context: {context}
+
+Question: {question}
 
 Answer:"""
 
+    async def generate_answer(self, question: str, context: str = "") -> Dict[str, Any]:
+        prompt = self._build_prompt(question, context)
+
         # Generate response
-        response = self.llm(
-            prompt,
-            max_tokens=512,
-            temperature=0.7,
-            top_p=0.95,
-            repeat_penalty=1.1,
-        )
+        started = time.monotonic()
+        response = await self.queue.submit(partial(self._complete, prompt, "answer", ANSWER_PREFIX, **self.sampling))
+        elapsed = time.monotonic() - started
+
+        completion_tokens = response.get("usage", {}).get("completion_tokens", 0)
+        if completion_tokens and elapsed > 0:
+            metrics.observe("llm_tokens_per_second", completion_tokens / elapsed, mode="blocking")
 
         # Extract the generated text
         answer = response["choices"][0]["text"].strip()
@@ -43,9 +248,72 @@ Answer:"""
         return {
             "answer": answer,
             "certainty": certainty,
-            "model": "llama-2-7b-chat"
+            "model": self.model_id
         }
 
+    async def stream_answer(self, question: str, context: str = "") -> AsyncIterator[Dict[str, Any]]:
+        """Generate an answer token by token.
+
+        Yields {"token": text} for each generated token, then a final dict shaped
+        like the result of generate_answer. Generation stops early if the consumer
+        stops iterating, e.g. because the client disconnected.
+        """
+        prompt = self._build_prompt(question, context)
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        requested = time.monotonic()
+
+        def run() -> Dict[str, Any]:
+            first_token_at = None
+            count = 0
+            try:
+                for chunk in self._stream_completion(prompt, "answer", ANSWER_PREFIX, **self.sampling):
+                    if stop.is_set():
+                        break
+                    if first_token_at is None:
+                        first_token_at = time.monotonic()
+                    count += 1
+                    loop.call_soon_threadsafe(tokens.put_nowait, chunk["choices"][0]["text"])
+            finally:
+                # Sentinel: no more tokens, whether we finished, stopped or failed
+                loop.call_soon_threadsafe(tokens.put_nowait, None)
+            return {"first_token_at": first_token_at, "finished_at": time.monotonic(), "tokens": count}
+
+        job = asyncio.ensure_future(self.queue.submit(run))
+        parts = []
+        try:
+            while True:
+                token = await tokens.get()
+                if token is None:
+                    break
+                parts.append(token)
+                yield {"token": token}
+
+            stats = await job
+            ttft = None
+            tokens_per_second = None
+            if stats["first_token_at"] is not None:
+                ttft = stats["first_token_at"] - requested
+                generation_time = stats["finished_at"] - stats["first_token_at"]
+                metrics.observe("llm_time_to_first_token_seconds", ttft)
+                if generation_time > 0:
+                    tokens_per_second = stats["tokens"] / generation_time
+                    metrics.observe("llm_tokens_per_second", tokens_per_second, mode="stream")
+
+            answer = "".join(parts).strip()
+            yield {
+                "answer": answer,
+                "certainty": self._calculate_certainty(answer, context),
+                "model": self.model_id,
+                "time_to_first_token": ttft,
+                "tokens_per_second": tokens_per_second,
+            }
+        finally:
+            stop.set()
+            if not job.done():
+                job.cancel()
+
     def _calculate_certainty(self, answer: str, context: str) -> float:
         """
         Calculate a certainty score between 0 and 1 based on the answer and context.
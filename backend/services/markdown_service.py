@@ -1,201 +1,554 @@
+import asyncio
+import logging
 import os
-from typing import Dict, List, Any, Optional
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Any, Optional, Tuple
 import markdown
 from datetime import datetime
-import json
+from .config import settings
+from .context_builder import ContextBuilder
+from .diffs import compute_hunks, page_hunks
+from .document_cache import CachedDocument, DocumentCache, content_hash
+from .index_snapshot import load_snapshot
+from .jobs import Job, JobQueue
 from .keyword_service import KeywordService
 from .llm_service import LLMService
+from .metrics import metrics
+from .ranking import reciprocal_rank_fusion
+from .sections import Section, split_sections
+from .suggestion_store import SuggestionStore
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_MODES = ("keyword", "embedding", "hybrid")
+
+@dataclass
+class RetrievalResult:
+    """Outcome of retrieving context for a single question.
+
+    Returned to the caller instead of being stored on the service so that
+    concurrent questions never see each other's match.
+    """
+    file: Optional[str] = None
+    score: float = 0.0
+    matched_keywords: List[str] = field(default_factory=list)
+    context: str = ""
+    # Sections packed into the context, in prompt order
+    sections: List[Section] = field(default_factory=list)
+    context_tokens: int = 0
+    # Content hash of every file the context was taken from
+    file_hashes: Dict[str, str] = field(default_factory=dict)
 
 class MarkdownService:
-    def __init__(self, llm_service: LLMService = None):
-        self.storage_dir = os.path.join(os.path.dirname(__file__), "..", "markdown_storage")
+    def __init__(self, llm_service: LLMService = None, vector_store=None, keyword_llm_service: LLMService = None):
+        self.storage_dir = settings.markdown_dir
         self.suggestions_dir = os.path.join(self.storage_dir, "suggestions")
         
         # Create directories if they don't exist
         os.makedirs(self.storage_dir, exist_ok=True)
         os.makedirs(self.suggestions_dir, exist_ok=True)
 
+        # Suggested changes; older versions kept one JSON file per suggestion
+        self.suggestions = SuggestionStore(os.path.join(self.suggestions_dir, "suggestions.db"))
+        self.suggestions.import_json(self.suggestions_dir)
+
         # Initialize services
         self.llm_service = llm_service or LLMService()
-        self.keyword_service = KeywordService(self.llm_service)
-        
-        # Track current matching file
-        self._current_matching_file = None
+        # Optional; enables embedding and hybrid retrieval
+        self.vector_store = vector_store
+        # Keyword extraction may run on a smaller model than answering
+        self.keyword_service = KeywordService(keyword_llm_service or self.llm_service)
+        self.context_builder = ContextBuilder(
+            self.llm_service.count_tokens,
+            self.llm_service.truncate_tokens,
+            self.keyword_service.index
+        )
+
+        # Content, content hash and section offsets of recently read files
+        self.documents = DocumentCache(settings.document_cache_bytes)
+
+        # Prebuilt keywords, sections and embeddings; documents it covers are not re-indexed
+        self.snapshot = load_snapshot(settings.index_snapshot_dir)
+
+        # Called with a filename whenever a document's content changes
+        self.change_listeners: List[Callable[[str], None]] = []
+        # Bumped on every document change, so results derived from the corpus can tell it moved on
+        self.version = 0
+
+        # Re-indexing of saved documents, kept off the request path
+        self.jobs = JobQueue("documents")
+
+        # Progress of the background keyword refresh
+        self.indexing_task: Optional[asyncio.Task] = None
+        self.index_status: Dict[str, Any] = {"state": "idle"}
 
     @classmethod
-    async def create(cls, llm_service: LLMService = None) -> 'MarkdownService':
-        """Async factory method to create and initialize MarkdownService."""
-        service = cls(llm_service)
-        await service._clear_and_init_keywords()
+    async def create(cls, llm_service: LLMService = None, vector_store=None,
+                     keyword_llm_service: LLMService = None) -> 'MarkdownService':
+        """Async factory method to create and initialize MarkdownService.
+
+        Keyword indexing runs in the background; the existing index is served
+        while changed documents are re-extracted.
+        """
+        service = cls(llm_service, vector_store, keyword_llm_service)
+        service.start_indexing()
         return service
 
-    async def _clear_and_init_keywords(self):
-        """Clear all existing keywords and regenerate them for all markdown files."""
+    def start_indexing(self) -> asyncio.Task:
+        """Start refreshing keywords and embeddings in the background."""
+        if self.indexing_task is None or self.indexing_task.done():
+            self.indexing_task = asyncio.create_task(self.refresh_keywords())
+        return self.indexing_task
+
+    async def refresh_keywords(self):
+        """Re-extract keywords for new or changed markdown files.
+
+        Files whose content hash and model match the keyword store are
+        skipped, keywords of files the index snapshot covers are taken from
+        it, and keywords of deleted files are dropped.
+        """
+        # Keywords taken from the snapshot, saved in batches, and which of those documents changed
+        loaded: List[Tuple[str, List[str], str]] = []
+        loaded_changed: List[str] = []
+
+        def save_loaded():
+            self.keyword_service.save_keywords_batch(loaded)
+            for filename in loaded_changed:
+                self._notify_changed(filename)
+            loaded.clear()
+            loaded_changed.clear()
+
+        snapshot_keywords = (
+            self.snapshot is not None and self.snapshot.keyword_model == self.keyword_service.llm_service.model_id
+        )
         try:
-            # Clear the keyword storage directory
-            keyword_storage = os.path.join(os.path.dirname(__file__), "..", "keyword_storage")
-            os.makedirs(keyword_storage, exist_ok=True)
-            for file in os.listdir(keyword_storage):
-                if file.endswith('.json'):
-                    os.remove(os.path.join(keyword_storage, file))
-
-            # Generate fresh keywords for all markdown files
             files = self.list_files()
-            print(f"Generating keywords for files: {files}")  # Debug log
+            self.index_status.update({
+                "state": "running",
+                "total": len(files),
+                "processed": 0,
+                "extracted": 0,
+                "skipped": 0,
+                "loaded": 0,
+                "embedded": 0,
+                "failed": 0,
+                "removed": 0,
+                "current": None,
+                "started_at": datetime.now().isoformat(),
+                "finished_at": None
+            })
+
+            # Drop keywords for documents that no longer exist
+            for filename in set(self.keyword_service.indexed_files()) - set(files):
+                self.keyword_service.remove_keywords(filename)
+                self.documents.invalidate(self._path(filename))
+                if self.vector_store is not None:
+                    await asyncio.to_thread(self.vector_store.remove_document_sections, filename)
+                self._notify_changed(filename)
+                self.index_status["removed"] += 1
+
             for filename in files:
+                self.index_status["current"] = filename
                 try:
-                    content = self.get_markdown(filename)
-                    print(f"Extracting keywords for {filename}")  # Debug log
-                    keywords = await self.keyword_service.extract_keywords(content)
-                    print(f"Got keywords for {filename}: {keywords}")  # Debug log
-                    self.keyword_service.save_keywords(filename, keywords)
+                    document = self.get_document(filename)
+                    content, digest = document.content, document.digest
+                    # Listeners only hear of documents edited since their keywords were extracted
+                    changed = self._content_changed(filename, digest)
+                    prebuilt = self.snapshot.document(filename, digest) if self.snapshot is not None else None
+                    if prebuilt is not None and document.sections is None:
+                        document.sections = prebuilt.sections
+                    self.documents.sections(document, filename)
+                    if await self._embed_sections(filename, content):
+                        self.index_status["embedded"] += 1
+                    if self.keyword_service.is_up_to_date(filename, digest):
+                        self.index_status["skipped"] += 1
+                    elif prebuilt is not None and prebuilt.keywords and snapshot_keywords:
+                        loaded.append((filename, prebuilt.keywords, digest))
+                        if changed:
+                            loaded_changed.append(filename)
+                        if len(loaded) >= 512:
+                            save_loaded()
+                        self.index_status["loaded"] += 1
+                    else:
+                        # Snapshot keywords should not wait behind a slow extraction
+                        save_loaded()
+                        logger.info("Extracting keywords for %s", filename)
+                        keywords = await self.keyword_service.extract_keywords(content)
+                        logger.debug("Got keywords for %s: %s", filename, keywords)
+                        self.keyword_service.save_keywords(filename, keywords, digest)
+                        if changed:
+                            self._notify_changed(filename)
+                        self.index_status["extracted"] += 1
                 except Exception as e:
-                    print(f"Error processing file {filename}: {str(e)}")
+                    logger.warning("Error processing file %s: %s", filename, e)
+                    self.index_status["failed"] += 1
+                self.index_status["processed"] += 1
+
+            save_loaded()
+            self.index_status["state"] = "ready"
         except Exception as e:
-            print(f"Warning: Error during keyword regeneration: {str(e)}")
+            logger.error("Error during keyword refresh: %s", e)
+            self.index_status["state"] = "failed"
+        finally:
+            self.index_status["current"] = None
+            self.index_status["finished_at"] = datetime.now().isoformat()
+
+    async def _embed_sections(self, filename: str, content: str) -> bool:
+        """Embed a document's sections unless this revision is already embedded.
+
+        Returns True if new embeddings were written.
+        """
+        if self.vector_store is None:
+            return False
+        digest = content_hash(content)
+        if self._snapshot_embeddings() and self.snapshot.has_embeddings(filename, digest):
+            return False
+        if await asyncio.to_thread(self.vector_store.has_document_sections, filename, digest):
+            return False
+        sections = [
+            {"heading": section.heading, "start": section.start, "end": section.end, "text": section.text(content)}
+            for section in self.get_sections(filename, content)
+        ]
+        with metrics.span("embedding", target="sections"):
+            await asyncio.to_thread(self.vector_store.index_document_sections, filename, digest, sections)
+        return True
+
+    def _content_changed(self, filename: str, digest: str) -> bool:
+        """Whether digest differs from the revision the stored keywords were extracted from."""
+        entry = self.keyword_service.entries.get(filename)
+        return entry is None or entry.content_hash != digest
+
+    def _snapshot_embeddings(self) -> bool:
+        """Whether the snapshot's embeddings come from the model the vector store embeds questions with."""
+        return (
+            self.snapshot is not None
+            and self.snapshot.embedding_model is not None
+            and self.snapshot.embedding_model == getattr(self.vector_store, "model_name", None)
+        )
+
+    def _notify_changed(self, filename: str):
+        self.version += 1
+        for listener in self.change_listeners:
+            try:
+                listener(filename)
+            except Exception as e:
+                logger.warning("Error notifying change of %s: %s", filename, e)
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.storage_dir, f"{filename}.md")
 
     def list_files(self) -> List[str]:
         """List all markdown files in the storage directory."""
-        files = []
-        for filename in os.listdir(self.storage_dir):
-            if filename.endswith('.md'):
-                # Remove the .md extension
-                base_name = filename[:-3]
-                # Skip hidden files and system files
-                if not base_name.startswith('.') and not base_name.startswith('_'):
-                    files.append(base_name)
-        return files
+        return self.documents.list_markdown(self.storage_dir)
+
+    def get_document(self, filename: str) -> CachedDocument:
+        """Get a markdown file's current content, hash and modification time."""
+        try:
+            return self.documents.get(self._path(filename))
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Markdown file {filename} not found")
 
     def get_markdown(self, filename: str) -> str:
         """Get the content of a markdown file."""
-        filepath = os.path.join(self.storage_dir, f"{filename}.md")
-        if not os.path.exists(filepath):
-            raise FileNotFoundError(f"Markdown file {filename} not found")
-        
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
+        return self.get_document(filename).content
 
-    async def save_markdown(self, filename: str, content: str):
-        """Save content to a markdown file and generate keywords."""
+    def write_markdown(self, filename: str, content: str) -> str:
+        """Atomically replace a markdown file's content and return its normalized name.
+
+        Readers see either the old or the new file, never a partial write.
+        Keywords and embeddings are left to reindex().
+        """
+        filename = self.write_file(filename, content)
+        self._notify_changed(filename)
+        return filename
+
+    def write_file(self, filename: str, content: str) -> str:
+        """write_markdown without notifying change listeners, safe to run on a worker thread.
+
+        The caller must call _notify_changed from the event loop afterwards.
+        """
         # Remove .md extension if present
         filename = filename[:-3] if filename.endswith('.md') else filename
-        
-        print(f"Saving markdown file: {filename}")
-        filepath = os.path.join(self.storage_dir, f"{filename}.md")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"Markdown file saved successfully")
+
+        filepath = self._path(filename)
+        tmp_path = f"{filepath}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, filepath)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        logger.info("Saved markdown file %s", filename)
+        self.documents.put(filepath, content)
+        return filename
+
+    async def reindex(self, filename: str) -> Dict[str, Any]:
+        """Embed a file's sections and re-extract its keywords from its current content.
+
+        Raises if no keywords could be extracted, so the job is reported as failed.
+        """
+        content = self.get_markdown(filename)
+        try:
+            await self._embed_sections(filename, content)
+        except Exception as e:
+            logger.warning("Error embedding sections of %s: %s", filename, e)
 
         # Generate and save keywords
-        print(f"Extracting keywords for {filename}")
         try:
             keywords = await self.keyword_service.extract_keywords(content)
-            print(f"Extracted keywords: {keywords}")
-            self.keyword_service.save_keywords(filename, keywords)
-            print(f"Keywords saved successfully")
         except Exception as e:
-            print(f"Error extracting keywords: {str(e)}")
-            # Save empty keywords rather than failing
+            logger.warning("Error extracting keywords for %s: %s", filename, e)
+            # Drop the old revision's keywords; without a content hash the next refresh retries
             self.keyword_service.save_keywords(filename, [])
+            raise
+        logger.debug("Extracted keywords for %s: %s", filename, keywords)
+        self.keyword_service.save_keywords(filename, keywords, content_hash(content))
+        return {"keywords": len(keywords)}
+
+    def queue_save(self, filename: str, content: str) -> Job:
+        """Write a markdown file now and re-index it in the background.
+
+        Saves of a file whose re-index has not started yet share one job.
+        """
+        filename = self.write_markdown(filename, content)
+        return self.jobs.submit("reindex", filename, lambda: self.reindex(filename))
+
+    async def save_markdown(self, filename: str, content: str):
+        """Save content to a markdown file and wait for its keywords and embeddings."""
+        filename = self.write_markdown(filename, content)
+        await self.reindex(filename)
 
     def get_keywords(self, filename: str) -> List[str]:
         """Get keywords for a markdown file."""
         return self.keyword_service.load_keywords(filename)
 
-    async def find_best_context(self, question: str) -> str:
-        """Find the best matching markdown file for a question."""
-        # Extract keywords from the question
-        question_keywords = await self.keyword_service.extract_keywords(question)
-        print(f"Extracted keywords from question: {question_keywords}")
-        
-        # Find best matching file
+    def document_hash(self, filename: str) -> Optional[str]:
+        """Content hash of a file's current revision, or None if it does not exist."""
+        try:
+            return self.get_document(filename).digest
+        except FileNotFoundError:
+            return None
+
+    def get_sections(self, filename: str, content: Optional[str] = None) -> List[Section]:
+        """Get heading-level sections of a file, re-splitting only when its content changed."""
+        document = self.get_document(filename)
+        if content is not None and content_hash(content) != document.digest:
+            # The file moved on since content was read
+            return split_sections(filename, content)
+        return self.documents.sections(document, filename)
+
+    async def find_best_context(self, question: str, question_keywords: Optional[List[str]] = None,
+                                mode: Optional[str] = None) -> RetrievalResult:
+        """Find the best matching sections for a question.
+
+        mode selects keyword retrieval (LLM keyword extraction + BM25),
+        embedding retrieval (embeds only the question) or hybrid, which fuses
+        both rankings with reciprocal rank fusion. The highest-ranked sections
+        are packed into the model's context budget. Pass question_keywords
+        when they were already extracted to avoid a second LLM run.
+        """
+        mode = mode or settings.retrieval_mode
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        if mode != "keyword" and self.vector_store is None:
+            mode = "keyword"
+
         all_files = self.list_files()
-        print(f"Available files: {all_files}")
-        best_match = self.keyword_service.find_best_match(question_keywords, all_files)
-        print(f"Best matching file: {best_match}")
-        
-        # Store the matching file
-        self._current_matching_file = best_match
-        
-        if best_match:
-            content = self.get_markdown(best_match)
-            print(f"Found matching content from {best_match}: {content[:100]}...")  # Print first 100 chars
-            return content
-        return ""
-
-    def get_current_matching_file(self) -> Optional[str]:
-        """Get the filename of the current matching markdown file."""
-        return self._current_matching_file
-
-    def get_suggested_changes(self) -> List[Dict[str, Any]]:
-        """Get all suggested changes for markdown files."""
-        suggestions = []
-        for filename in os.listdir(self.suggestions_dir):
-            if filename.endswith('.json'):
-                with open(os.path.join(self.suggestions_dir, filename), 'r', encoding='utf-8') as f:
-                    suggestion = json.load(f)
-                    suggestions.append(suggestion)
-        return suggestions
+        documents: Dict[str, Tuple[str, List[Section]]] = {}
+        # Content hash of each loaded document, as of when it was loaded
+        digests: Dict[str, str] = {}
 
-    def add_suggestion(self, filename: str, original_content: str, suggested_content: str, feedback_context: str):
-        """Add a new suggestion for changes to a markdown file."""
-        suggestion_id = f"{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        suggestion_path = os.path.join(self.suggestions_dir, f"{suggestion_id}.json")
-        
-        suggestion = {
+        keyword_matches = []
+        keyword_scores: Dict[Tuple[str, int], float] = {}
+        if mode != "embedding":
+            if question_keywords is None:
+                question_keywords = await self.keyword_service.extract_question_keywords(question)
+            with metrics.span("keyword_search"):
+                keyword_matches = self.keyword_service.find_top_matches(
+                    question_keywords, all_files, top_k=settings.context_max_files
+                )
+                self._load_documents([match.filename for match in keyword_matches], documents, digests)
+                keyword_scores = self.context_builder.keyword_scores(keyword_matches, documents, question_keywords)
+            logger.debug("Keyword matches: %s", [match.filename for match in keyword_matches])
+
+        embedding_scores: Dict[Tuple[str, int], float] = {}
+        if mode != "keyword":
+            with metrics.span("embedding_search"):
+                embedding_scores = await self._embedding_scores(question, set(all_files), documents, digests)
+            logger.debug("Embedding matches: %s", list(dict.fromkeys(f for f, _ in embedding_scores)))
+
+        if mode == "keyword":
+            section_scores = keyword_scores
+            file_scores = {match.filename: match.score for match in keyword_matches}
+        elif mode == "embedding":
+            section_scores = embedding_scores
+            file_scores = self._best_per_file(embedding_scores)
+        else:
+            rankings = [self._ranked(keyword_scores), self._ranked(embedding_scores)]
+            section_scores = reciprocal_rank_fusion(rankings)
+            file_scores = reciprocal_rank_fusion([
+                [match.filename for match in keyword_matches],
+                self._ranked(self._best_per_file(embedding_scores))
+            ])
+
+        if not section_scores:
+            return RetrievalResult()
+
+        file_order = self._ranked(file_scores)[:settings.context_max_files]
+        section_scores = {key: score for key, score in section_scores.items() if key[0] in file_order}
+        with metrics.span("context_assembly"):
+            budget = self.llm_service.context_budget(question)
+            context, pieces = self.context_builder.build(section_scores, documents, file_order, budget)
+
+        best_file = file_order[0]
+        matched_keywords = next(
+            (match.matched_keywords for match in keyword_matches if match.filename == best_file), []
+        )
+        return RetrievalResult(
+            file=best_file,
+            score=file_scores[best_file],
+            matched_keywords=matched_keywords,
+            context=context,
+            sections=[piece.section for piece in pieces],
+            context_tokens=sum(piece.tokens for piece in pieces),
+            file_hashes={
+                filename: digests[filename]
+                for filename in dict.fromkeys(piece.section.filename for piece in pieces)
+            }
+        )
+
+    def _load_documents(self, filenames: List[str], documents: Dict[str, Tuple[str, List[Section]]],
+                        digests: Dict[str, str]):
+        for filename in filenames:
+            if filename not in documents:
+                document = self.get_document(filename)
+                documents[filename] = (document.content, self.documents.sections(document, filename))
+                digests[filename] = document.digest
+
+    async def _embedding_scores(self, question: str, existing_files: set,
+                                documents: Dict[str, Tuple[str, List[Section]]],
+                                digests: Dict[str, str]) -> Dict[Tuple[str, int], float]:
+        """Score sections by cosine similarity to the question.
+
+        Sections in the index snapshot are searched alongside the vector
+        store. Hits from an outdated revision of a file are skipped until it
+        is re-embedded.
+        """
+        embedding = None
+        hits = []
+        if self._snapshot_embeddings():
+            embedding = await asyncio.to_thread(self.vector_store.embed_query, question)
+            hits = await asyncio.to_thread(self.snapshot.search, embedding, settings.embedding_top_k)
+        hits += await asyncio.to_thread(self.vector_store.search_sections, question, settings.embedding_top_k,
+                                        embedding)
+        scores: Dict[Tuple[str, int], float] = {}
+        for hit in hits:
+            filename = hit["file_name"]
+            if hit["distance"] > settings.embedding_max_distance or filename not in existing_files:
+                continue
+            self._load_documents([filename], documents, digests)
+            if digests[filename] != hit["content_hash"]:
+                continue
+            scores[(filename, hit["start"])] = 1.0 - hit["distance"]
+        return scores
+
+    @staticmethod
+    def _best_per_file(section_scores: Dict[Tuple[str, int], float]) -> Dict[str, float]:
+        file_scores: Dict[str, float] = {}
+        for (filename, _), score in section_scores.items():
+            file_scores[filename] = max(score, file_scores.get(filename, score))
+        return file_scores
+
+    @staticmethod
+    def _ranked(scores: Dict[Any, float]) -> List[Any]:
+        """Keys of scores, best first, with ties broken by key."""
+        return [key for key, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))]
+
+    def get_suggested_changes(self, status: Optional[str] = None, filename: Optional[str] = None,
+                              created_after: Optional[str] = None, created_before: Optional[str] = None,
+                              limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        """Get a page of suggestion summaries, newest first, and the total matching the filters.
+
+        Summaries leave out the document bodies; use get_suggestion for those.
+        """
+        return self.suggestions.list(status, filename, created_after, created_before, limit, offset)
+
+    def get_suggestion(self, suggestion_id: str) -> Dict[str, Any]:
+        """Get a suggestion including its original and suggested content."""
+        suggestion = self.suggestions.get(suggestion_id)
+        if suggestion is None:
+            raise FileNotFoundError(f"Suggestion {suggestion_id} not found")
+        return suggestion
+
+    def get_suggestion_diff(self, suggestion_id: str, from_line: int = 1, max_lines: int = 2000,
+                            from_new_line: int = 1) -> Dict[str, Any]:
+        """Get a page of the line diff between a suggestion and the revision it was made against.
+
+        The diff is computed once per (revision hash, suggested hash) pair.
+        Pages start at original line from_line and suggested line
+        from_new_line; next_from_line and next_from_new_line are None on the
+        last page. stale is True when the file has changed since the
+        suggestion was made.
+        """
+        suggestion = self.suggestions.get(suggestion_id, bodies=False)
+        if suggestion is None:
+            raise FileNotFoundError(f"Suggestion {suggestion_id} not found")
+
+        revision_hash, suggested_hash = suggestion["revision_hash"], suggestion["suggested_hash"]
+        hunks = self.suggestions.get_diff(revision_hash, suggested_hash)
+        metrics.inc("diff_cache_lookups_total", result="miss" if hunks is None else "hit")
+        if hunks is None:
+            full = self.suggestions.get(suggestion_id)
+            with metrics.span("suggestion_diff"):
+                hunks = compute_hunks(full["original_content"], full["suggested_content"])
+            self.suggestions.save_diff(revision_hash, suggested_hash, hunks)
+
+        page, next_page = page_hunks(hunks, from_line, max_lines, from_new_line)
+        next_from_line, next_from_new_line = next_page if next_page is not None else (None, None)
+        current_hash = self.document_hash(suggestion["filename"])
+        return {
             "id": suggestion_id,
-            "filename": filename,
-            "original_content": original_content,
-            "suggested_content": suggested_content,
-            "feedback_context": feedback_context,
-            "created_at": datetime.now().isoformat(),
-            "status": "pending"
+            "filename": suggestion["filename"],
+            "revision_hash": revision_hash,
+            "suggested_hash": suggested_hash,
+            "current_hash": current_hash,
+            "stale": current_hash != revision_hash,
+            "total_hunks": len(hunks),
+            "hunks": page,
+            "next_from_line": next_from_line,
+            "next_from_new_line": next_from_new_line,
         }
-        
-        with open(suggestion_path, 'w', encoding='utf-8') as f:
-            json.dump(suggestion, f, indent=2)
-        
-        return suggestion_id
+
+    def add_suggestion(self, filename: str, original_content: str, suggested_content: str, feedback_context: str):
+        """Add a new suggestion for changes to a markdown file."""
+        return self.suggestions.add(filename, original_content, suggested_content, feedback_context)
 
     def apply_suggestion(self, suggestion_id: str):
-        """Apply a suggested change to a markdown file."""
-        suggestion_path = os.path.join(self.suggestions_dir, f"{suggestion_id}.json")
-        
-        if not os.path.exists(suggestion_path):
-            raise FileNotFoundError(f"Suggestion {suggestion_id} not found")
-        
-        with open(suggestion_path, 'r', encoding='utf-8') as f:
-            suggestion = json.load(f)
-        
+        """Apply a suggested change to a markdown file.
+
+        The file is written immediately and re-indexed in the background; the
+        returned suggestion carries the re-index job_id.
+        """
+        suggestion = self.get_suggestion(suggestion_id)
+
         # Save the new content
-        self.save_markdown(suggestion["filename"], suggestion["suggested_content"])
-        
+        job = self.queue_save(suggestion["filename"], suggestion["suggested_content"])
+
         # Update suggestion status
-        suggestion["status"] = "applied"
-        suggestion["applied_at"] = datetime.now().isoformat()
-        
-        with open(suggestion_path, 'w', encoding='utf-8') as f:
-            json.dump(suggestion, f, indent=2)
-        
+        updates = {"status": "applied", "job_id": job.id, "applied_at": datetime.now().isoformat()}
+        self.suggestions.update(suggestion_id, **updates)
+        suggestion.update(updates)
         return suggestion
 
     def reject_suggestion(self, suggestion_id: str, reason: str = None):
         """Reject a suggested change."""
-        suggestion_path = os.path.join(self.suggestions_dir, f"{suggestion_id}.json")
-        
-        if not os.path.exists(suggestion_path):
-            raise FileNotFoundError(f"Suggestion {suggestion_id} not found")
-        
-        with open(suggestion_path, 'r', encoding='utf-8') as f:
-            suggestion = json.load(f)
-        
-        # Update suggestion status
-        suggestion["status"] = "rejected"
-        suggestion["rejected_at"] = datetime.now().isoformat()
+        updates = {"status": "rejected", "rejected_at": datetime.now().isoformat()}
         if reason:
-            suggestion["rejection_reason"] = reason
-        
-        with open(suggestion_path, 'w', encoding='utf-8') as f:
-            json.dump(suggestion, f, indent=2)
-        
-        return suggestion 
\ No newline at end of file
+            updates["rejection_reason"] = reason
+        if not self.suggestions.update(suggestion_id, **updates):
+            raise FileNotFoundError(f"Suggestion {suggestion_id} not found")
+        return self.get_suggestion(suggestion_id)
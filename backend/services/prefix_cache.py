@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _common_prefix_length(a: Sequence[int], b: Sequence[int]) -> int:
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+class PrefixCache:
+    """Keeps evaluated KV state for static prompt prefixes.
+
+    Before a generation, prepare() makes sure the model context already holds
+    the prefix: either it is still resident from the previous call, or its
+    saved state is restored, or it is evaluated once and saved. llama-cpp then
+    only evaluates the tokens after the prefix.
+
+    States live in RAM up to ram_bytes and spill to disk_dir up to disk_bytes,
+    least recently used first. All methods must run on the inference thread.
+    """
+
+    def __init__(self, ram_bytes: int, disk_dir: Optional[str] = None, disk_bytes: int = 0):
+        self.ram_bytes = ram_bytes
+        self.disk_dir = disk_dir if disk_bytes > 0 else None
+        self.disk_bytes = disk_bytes
+        # prefix text -> (tokens, llama state, state size)
+        self._ram: "OrderedDict[str, Tuple[List[int], Any, int]]" = OrderedDict()
+        # prefix text -> (tokens, path, state size)
+        self._disk: "OrderedDict[str, Tuple[List[int], str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.tokens_skipped = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def prepare(self, llm, name: str, prefix: str) -> int:
+        """Load or evaluate the prefix in llm's context.
+
+        Returns the number of prompt tokens that did not need evaluating.
+        """
+        tokens = llm.tokenize(prefix.encode('utf-8'))
+        resident = llm.input_ids[:llm.n_tokens].tolist()
+        if _common_prefix_length(resident, tokens) == len(tokens):
+            return self._hit(name, len(tokens))
+
+        state = self._lookup(prefix, tokens)
+        if state is not None:
+            llm.load_state(state)
+            return self._hit(name, len(tokens))
+
+        self.misses += 1
+        metrics.inc("prefix_cache_lookups_total", prefix=name, result="miss")
+        llm.reset()
+        llm.eval(tokens)
+        state = llm.save_state()
+        self._store(prefix, tokens, state, int(state.llama_state_size))
+        return 0
+
+    def _hit(self, name: str, skipped: int) -> int:
+        self.hits += 1
+        self.tokens_skipped += skipped
+        metrics.inc("prefix_cache_lookups_total", prefix=name, result="hit")
+        metrics.inc("prompt_tokens_skipped_total", skipped, prefix=name)
+        return skipped
+
+    def _lookup(self, prefix: str, tokens: List[int]) -> Any:
+        with self._lock:
+            entry = self._ram.get(prefix)
+            if entry is not None and entry[0] == tokens:
+                self._ram.move_to_end(prefix)
+                return entry[1]
+            disk_entry = self._disk.get(prefix)
+        if disk_entry is None or disk_entry[0] != tokens:
+            return None
+        try:
+            with open(disk_entry[1], 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError) as e:
+            logger.warning("Dropping unreadable prefix state %s: %s", disk_entry[1], e)
+            self._forget_disk(prefix)
+            return None
+        # Promote back to RAM; the disk copy stays as a fallback
+        self._store(prefix, tokens, state, disk_entry[2], spill=False)
+        return state
+
+    def _store(self, prefix: str, tokens: List[int], state: Any, size: int, spill: bool = True):
+        evicted = []
+        with self._lock:
+            if size <= self.ram_bytes:
+                self._ram[prefix] = (tokens, state, size)
+                self._ram.move_to_end(prefix)
+            while self._ram and sum(entry[2] for entry in self._ram.values()) > self.ram_bytes:
+                evicted.append(self._ram.popitem(last=False))
+        for evicted_prefix, (evicted_tokens, evicted_state, evicted_size) in evicted:
+            self._spill(evicted_prefix, evicted_tokens, evicted_state, evicted_size)
+        if spill and size > self.ram_bytes:
+            self._spill(prefix, tokens, state, size)
+
+    def _spill(self, prefix: str, tokens: List[int], state: Any, size: int):
+        if not self.disk_dir or size > self.disk_bytes or prefix in self._disk:
+            return
+        path = os.path.join(self.disk_dir, hashlib.sha256(prefix.encode('utf-8')).hexdigest() + ".state")
+        with open(path, 'wb') as f:
+            pickle.dump(state, f)
+        with self._lock:
+            self._disk[prefix] = (tokens, path, size)
+            while sum(entry[2] for entry in self._disk.values()) > self.disk_bytes:
+                _, (_, old_path, _) = self._disk.popitem(last=False)
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+
+    def _forget_disk(self, prefix: str):
+        with self._lock:
+            entry = self._disk.pop(prefix, None)
+        if entry is not None and os.path.exists(entry[1]):
+            os.remove(entry[1])
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": float(self.hits / lookups) if lookups > 0 else 0.0,
+            "tokens_skipped": self.tokens_skipped,
+            "ram_entries": len(self._ram),
+            "ram_bytes": sum(entry[2] for entry in self._ram.values()),
+            "disk_entries": len(self._disk),
+        }
@@ -0,0 +1,14 @@
+from typing import Dict, Hashable, List
+
+
+def reciprocal_rank_fusion(rankings: List[List[Hashable]], k: int = 60) -> Dict[Hashable, float]:
+    """Fuse several best-first rankings into one score per item.
+
+    Each ranking contributes 1 / (k + rank) for the items it contains, so an
+    item ranked well by several retrievers beats one ranked first by only one.
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return scores
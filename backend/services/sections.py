@@ -0,0 +1,47 @@
+import re
+from dataclasses import dataclass
+from typing import List
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$")
+FENCE_PATTERN = re.compile(r"^(```|~~~)")
+
+
+@dataclass
+class Section:
+    """A heading-delimited slice of a markdown document, stored as character offsets."""
+    filename: str
+    heading: str
+    level: int
+    start: int
+    end: int
+
+    def text(self, content: str) -> str:
+        return content[self.start:self.end].strip()
+
+
+def split_sections(filename: str, content: str) -> List[Section]:
+    """Split markdown into sections at ATX headings, ignoring fenced code blocks.
+
+    Text before the first heading becomes a level-0 section with an empty heading.
+    A section runs until the next heading of any level.
+    """
+    sections: List[Section] = []
+    heading, level, start = "", 0, 0
+    in_fence = False
+    offset = 0
+
+    for line in content.splitlines(keepends=True):
+        stripped = line.rstrip("\r\n")
+        if FENCE_PATTERN.match(stripped):
+            in_fence = not in_fence
+        elif not in_fence:
+            match = HEADING_PATTERN.match(stripped)
+            if match:
+                if content[start:offset].strip():
+                    sections.append(Section(filename, heading, level, start, offset))
+                heading, level, start = match.group(2).strip(), len(match.group(1)), offset
+        offset += len(line)
+
+    if content[start:].strip():
+        sections.append(Section(filename, heading, level, start, len(content)))
+    return sections
@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from .metrics import metrics
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time.
+
+    Callers that arrive while a computation for their key is in flight wait
+    for it and share its result instead of starting their own. The
+    computation runs as its own task, so one caller going away does not
+    cancel it for the others; it is only cancelled once every caller has.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        # key -> (task, number of callers waiting on it)
+        self._calls: Dict[Hashable, list] = {}
+        self.leaders = 0
+        self.joined = 0
+        metrics.gauge("single_flight_coalescing_rate", lambda: self.stats()["coalescing_rate"], flight=name)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.ensure_future(fn())
+            call = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _, key=key, task=task: self._forget(key, task))
+            self.leaders += 1
+            metrics.inc("single_flight_calls_total", flight=self.name, result="leader")
+        else:
+            self.joined += 1
+            metrics.inc("single_flight_calls_total", flight=self.name, result="joined")
+
+        task = call[0]
+        call[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            call[1] -= 1
+            if call[1] == 0 and not task.done():
+                # Nobody is waiting for the result any more; later callers start afresh
+                self._forget(key, task)
+                task.cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        call = self._calls.get(key)
+        if call is not None and call[0] is task:
+            del self._calls[key]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.joined
+        return {
+            "leaders": self.leaders,
+            "joined": self.joined,
+            "coalescing_rate": float(self.joined / calls) if calls > 0 else 0.0,
+            "in_flight": self.in_flight,
+        }
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .database import connect
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS revisions (
+    hash TEXT PRIMARY KEY,
+    content TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS suggestions (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    feedback_context TEXT NOT NULL DEFAULT '',
+    preview TEXT NOT NULL DEFAULT '',
+    revision_hash TEXT NOT NULL REFERENCES revisions (hash),
+    suggested_hash TEXT NOT NULL,
+    job_id TEXT,
+    applied_at TEXT,
+    rejected_at TEXT,
+    rejection_reason TEXT
+);
+CREATE INDEX IF NOT EXISTS suggestions_by_status ON suggestions (status, created_at);
+CREATE INDEX IF NOT EXISTS suggestions_by_file ON suggestions (filename, status, created_at);
+CREATE INDEX IF NOT EXISTS suggestions_by_date ON suggestions (created_at);
+-- Suggested bodies are kept apart so listing never reads them
+CREATE TABLE IF NOT EXISTS suggestion_bodies (
+    id TEXT PRIMARY KEY REFERENCES suggestions (id),
+    content TEXT NOT NULL
+);
+-- Line diffs between a revision and a suggested body, computed once per pair
+CREATE TABLE IF NOT EXISTS diffs (
+    revision_hash TEXT NOT NULL,
+    suggested_hash TEXT NOT NULL,
+    hunks TEXT NOT NULL,
+    PRIMARY KEY (revision_hash, suggested_hash)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+SUMMARY_COLUMNS = (
+    "id, filename, status, created_at, feedback_context, preview, revision_hash, suggested_hash,"
+    " job_id, applied_at, rejected_at, rejection_reason"
+)
+
+PREVIEW_CHARS = 200
+
+
+def _hash(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class SuggestionStore:
+    """Suggested document changes in SQLite.
+
+    Listing returns summaries only; the original and suggested bodies are
+    read by get(). The original content is stored once per document revision
+    (by content hash), however many suggestions are made against it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = connect(path)
+        with self._db:
+            self._db.executescript(SCHEMA)
+
+    def add(self, filename: str, original_content: str, suggested_content: str, feedback_context: str,
+            suggestion_id: Optional[str] = None, created_at: Optional[str] = None, status: str = "pending",
+            **extra: Any) -> str:
+        """Store a suggestion and return its id."""
+        suggestion_id = suggestion_id or uuid.uuid4().hex
+        revision_hash = _hash(original_content)
+        with self._lock, self._db:
+            self._db.execute("INSERT OR IGNORE INTO revisions (hash, content) VALUES (?, ?)",
+                             (revision_hash, original_content))
+            self._db.execute(
+                "INSERT INTO suggestions (id, filename, status, created_at, feedback_context, preview,"
+                " revision_hash, suggested_hash, job_id, applied_at, rejected_at, rejection_reason)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (suggestion_id, filename, status, created_at or datetime.now().isoformat(), feedback_context or "",
+                 suggested_content[:PREVIEW_CHARS], revision_hash, _hash(suggested_content),
+                 extra.get("job_id"), extra.get("applied_at"), extra.get("rejected_at"),
+                 extra.get("rejection_reason"))
+            )
+            self._db.execute("INSERT INTO suggestion_bodies (id, content) VALUES (?, ?)",
+                             (suggestion_id, suggested_content))
+        return suggestion_id
+
+    def list(self, status: Optional[str] = None, filename: Optional[str] = None,
+             created_after: Optional[str] = None, created_before: Optional[str] = None,
+             limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        """A page of suggestion summaries, newest first, with the total number matching the filters."""
+        conditions, params = [], []
+        for column, operator, value in (("status", "=", status), ("filename", "=", filename),
+                                        ("created_at", ">=", created_after), ("created_at", "<", created_before)):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM suggestions{where}", params).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT {SUMMARY_COLUMNS} FROM suggestions{where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return {"suggestions": [self._summary(row) for row in rows], "total": total}
+
+    def get(self, suggestion_id: str, bodies: bool = True) -> Optional[Dict[str, Any]]:
+        """A suggestion with its original and suggested content, or None.
+
+        With bodies=False only the summary is read.
+        """
+        if not bodies:
+            with self._lock:
+                row = self._db.execute(f"SELECT {SUMMARY_COLUMNS} FROM suggestions WHERE id = ?",
+                                       (suggestion_id,)).fetchone()
+            return self._summary(row) if row is not None else None
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {SUMMARY_COLUMNS}, revisions.content AS original_content,"
+                " suggestion_bodies.content AS suggested_content FROM suggestions"
+                " JOIN revisions ON revisions.hash = suggestions.revision_hash"
+                " JOIN suggestion_bodies USING (id) WHERE id = ?",
+                (suggestion_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            **self._summary(row),
+            "original_content": row["original_content"],
+            "suggested_content": row["suggested_content"],
+        }
+
+    def update(self, suggestion_id: str, **fields: Any) -> bool:
+        """Set status and lifecycle fields of a suggestion; returns False if it does not exist."""
+        allowed = {"status", "job_id", "applied_at", "rejected_at", "rejection_reason"}
+        unknown = set(fields) - allowed
+        if unknown:
+            raise ValueError(f"Cannot update suggestion fields: {', '.join(sorted(unknown))}")
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._db:
+            cursor = self._db.execute(f"UPDATE suggestions SET {assignments} WHERE id = ?",
+                                      list(fields.values()) + [suggestion_id])
+        return cursor.rowcount > 0
+
+    def get_diff(self, revision_hash: str, suggested_hash: str) -> Optional[List[Dict[str, Any]]]:
+        """Stored diff hunks between a revision and a suggested body, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT hunks FROM diffs WHERE revision_hash = ? AND suggested_hash = ?",
+                                   (revision_hash, suggested_hash)).fetchone()
+        return json.loads(row["hunks"]) if row is not None else None
+
+    def save_diff(self, revision_hash: str, suggested_hash: str, hunks: List[Dict[str, Any]]):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO diffs (revision_hash, suggested_hash, hunks) VALUES (?, ?, ?)",
+                             (revision_hash, suggested_hash, json.dumps(hunks)))
+
+    @staticmethod
+    def _summary(row) -> Dict[str, Any]:
+        summary = {key: row[key] for key in (
+            "id", "filename", "status", "created_at", "feedback_context", "preview", "revision_hash", "suggested_hash"
+        )}
+        for key in ("job_id", "applied_at", "rejected_at", "rejection_reason"):
+            if row[key] is not None:
+                summary[key] = row[key]
+        return summary
+
+    def import_json(self, directory: str):
+        """Import suggestions saved as one JSON file each by earlier versions, once."""
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM meta WHERE key = 'import:json'").fetchone():
+                return
+        imported = 0
+        for entry in sorted(os.listdir(directory)):
+            if not entry.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, entry), 'r', encoding='utf-8') as f:
+                    suggestion = json.load(f)
+                if self.get(suggestion["id"]) is None:
+                    self.add(
+                        suggestion["filename"], suggestion.get("original_content", ""),
+                        suggestion["suggested_content"], suggestion.get("feedback_context", ""),
+                        suggestion_id=suggestion["id"], created_at=suggestion.get("created_at"),
+                        status=suggestion.get("status", "pending"),
+                        **{key: suggestion.get(key) for key in ("job_id", "applied_at", "rejected_at",
+                                                                 "rejection_reason")}
+                    )
+                    imported += 1
+            except (OSError, KeyError, ValueError) as e:
+                logger.warning("Skipping unreadable suggestion %s: %s", entry, e)
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('import:json', ?)",
+                             (datetime.now().isoformat(),))
+        if imported:
+            logger.info("Imported %d suggestions from %s", imported, directory)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
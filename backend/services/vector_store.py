@@ -1,18 +1,36 @@
 import chromadb
 from chromadb.config import Settings
+import json
+import logging
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import uuid
 from datetime import datetime
 import numpy as np
 from sentence_transformers import SentenceTransformer
 import torch
 
+logger = logging.getLogger(__name__)
+
+# Sentence embedding model; index snapshots record it so stale vectors are never mixed in
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+def load_embedding_model() -> SentenceTransformer:
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    model.eval()  # Set to evaluation mode
+    return model
+
+def encode_texts(model: SentenceTransformer, texts: List[str], batch_size: int = 256) -> np.ndarray:
+    """Normalized float32 embeddings of texts, one row per text."""
+    with torch.no_grad():
+        embeddings = model.encode(texts, batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True)
+    return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1)
+
 class VectorStore:
     def __init__(self):
         # Initialize the embedding model
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.model.eval()  # Set to evaluation mode
+        self.model_name = EMBEDDING_MODEL
+        self.model = load_embedding_model()
         
         # Initialize ChromaDB with persistent storage
         self.client = chromadb.PersistentClient(
@@ -33,6 +51,13 @@ class VectorStore:
             embedding_function=self._get_embedding_function()
         )
 
+        # Markdown sections embedded at index time for question-only retrieval
+        self.section_collection = self.client.get_or_create_collection(
+            name="doc_sections",
+            metadata={"hnsw:space": "cosine"},
+            embedding_function=self._get_embedding_function()
+        )
+
     def _get_embedding_function(self):
         """Get embedding function using Sentence Transformers that matches ChromaDB's interface"""
         class EmbeddingFunction:
@@ -52,6 +77,82 @@ class VectorStore:
 
         return EmbeddingFunction(self.model)
 
+    def warm_up(self):
+        """Embed one short text so the first real query does not pay for cold caches."""
+        self._get_embedding_function()(["warm up"])
+
+    def has_document_sections(self, file_name: str, content_hash: str) -> bool:
+        """Check whether sections of this document revision are already embedded."""
+        results = self.section_collection.get(
+            where={"$and": [{"file_name": file_name}, {"content_hash": content_hash}]},
+            limit=1,
+            include=[]
+        )
+        return bool(results["ids"])
+
+    def index_document_sections(self, file_name: str, content_hash: str, sections: List[Dict[str, Any]]):
+        """Replace the embedded sections of a document.
+
+        Each section dict needs heading, start, end and text. All sections are
+        embedded in one batch.
+        """
+        self.index_sections_batch([(file_name, content_hash, sections)])
+
+    def index_sections_batch(self, documents: List[Tuple[str, str, List[Dict[str, Any]]]], batch_size: int = 4096):
+        """Replace the embedded sections of several (file_name, content_hash, sections) documents.
+
+        Sections of all documents are embedded together, batch_size at a time.
+        """
+        if not documents:
+            return
+        self.section_collection.delete(where={"file_name": {"$in": [file_name for file_name, _, _ in documents]}})
+        rows = [
+            (f"{file_name}:{section['start']}", section["text"], {
+                "file_name": file_name,
+                "content_hash": content_hash,
+                "heading": section["heading"],
+                "start": section["start"],
+                "end": section["end"]
+            })
+            for file_name, content_hash, sections in documents
+            for section in sections
+        ]
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            self.section_collection.add(
+                ids=[row[0] for row in batch],
+                documents=[row[1] for row in batch],
+                metadatas=[row[2] for row in batch]
+            )
+
+    def remove_document_sections(self, file_name: str):
+        """Drop all embedded sections of a document."""
+        self.section_collection.delete(where={"file_name": file_name})
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embedding of a single query, for callers searching more than one index."""
+        return self._get_embedding_function()([query])[0]
+
+    def search_sections(self, query: str, n_results: int = 20,
+                        embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """Find the sections closest to the query, best first.
+
+        Pass the query's embedding if it is already known to skip embedding it again.
+        """
+        count = self.section_collection.count()
+        if count == 0:
+            return []
+        query_args = {"query_embeddings": [embedding]} if embedding is not None else {"query_texts": [query]}
+        results = self.section_collection.query(
+            **query_args,
+            n_results=min(n_results, count),
+            include=["metadatas", "distances"]
+        )
+        return [
+            {**metadata, "distance": float(distance)}
+            for metadata, distance in zip(results["metadatas"][0], results["distances"][0])
+        ]
+
     def search(self, query: str, n_results: int = 3) -> str:
         """Search for relevant context based on the query."""
         results = self.qa_collection.query(
@@ -63,22 +164,33 @@ class VectorStore:
         # Combine the results into a single context string
         context = ""
         for doc, metadata in zip(results["documents"][0], results["metadatas"][0]):
+            # Older pairs embedded the answer; newer ones embed the question and keep the answer in metadata
+            answer = metadata.get("answer", doc)
             context += f"Previous Q&A (Certainty: {metadata.get('certainty', 0.5)}):\n"
             context += f"Q: {metadata.get('question', '')}\n"
-            context += f"A: {doc}\n\n"
+            context += f"A: {answer}\n\n"
         
         return context.strip()
 
-    def add_qa_pair(self, question: str, answer: str, certainty: float):
-        """Add a new QA pair to the vector store."""
+    def add_qa_pair(self, question: str, answer: str, certainty: float,
+                    source_hashes: Optional[Dict[str, str]] = None, source_file: Optional[str] = None):
+        """Add a new QA pair to the vector store.
+
+        The question is embedded so the pair can be found again by similar
+        questions. source_hashes maps each document the answer was built from
+        to its content hash, so the answer can be discarded once they change.
+        """
         qa_id = str(uuid.uuid4())
         
         # Add to QA collection
         self.qa_collection.add(
-            documents=[answer],
+            documents=[question],
             metadatas=[{
                 "question": question,
+                "answer": answer,
                 "certainty": float(certainty),
+                "source_file": source_file or "",
+                "source_hashes": json.dumps(source_hashes or {}),
                 "timestamp": datetime.now().isoformat(),
                 "id": qa_id
             }],
@@ -87,65 +199,72 @@ class VectorStore:
         
         return qa_id
 
-    def update_feedback(self, file_name: str, feedback: bool, feedback_text: str, suggested_changes: str = None):
-        """Update feedback for a document."""
-        # Store feedback
-        feedback_id = str(uuid.uuid4())
-        self.feedback_collection.add(
-            documents=[suggested_changes or ""],
-            metadatas=[{
-                "file_name": file_name,
-                "feedback": bool(feedback),
-                "feedback_text": feedback_text,
-                "timestamp": datetime.now().isoformat()
-            }],
-            ids=[feedback_id]
+    def find_cached_answers(self, question: str, max_distance: float, min_certainty: float) -> List[Dict[str, Any]]:
+        """Find stored answers to semantically equivalent questions, nearest first.
+
+        Each is the pair's metadata plus its id and distance. The caller is
+        responsible for checking source_hashes against current documents.
+        """
+        if self.qa_collection.count() == 0:
+            return []
+        results = self.qa_collection.query(
+            query_texts=[question],
+            n_results=3,
+            where={"certainty": {"$gte": float(min_certainty)}},
+            include=["metadatas", "distances"]
         )
+        candidates = []
+        for qa_id, metadata, distance in zip(results["ids"][0], results["metadatas"][0], results["distances"][0]):
+            if distance > max_distance:
+                break
+            # Skip legacy pairs that embedded the answer instead of the question
+            if "answer" not in metadata or not metadata.get("source_file"):
+                continue
+            candidates.append({
+                **metadata,
+                "id": qa_id,
+                "distance": float(distance),
+                "source_hashes": json.loads(metadata.get("source_hashes") or "{}")
+            })
+        return candidates
 
-    def get_feedback_stats(self, question_id: str) -> Dict[str, Any]:
-        """Get feedback statistics for a QA pair."""
-        results = self.feedback_collection.get(
-            where={"question_id": question_id}
+    def delete_qa_pair(self, qa_id: str):
+        """Remove a single QA pair."""
+        self.qa_collection.delete(ids=[qa_id])
+
+    def invalidate_source(self, file_name: str):
+        """Drop cached answers built primarily from a document that changed."""
+        self.qa_collection.delete(where={"source_file": file_name})
+
+    def add_feedback_embeddings(self, entries: List[Dict[str, Any]]):
+        """Embed the text of feedback entries in one batch.
+
+        Each entry needs id, file_name, feedback, created_at and a non-empty text.
+        """
+        if not entries:
+            return
+        self.feedback_collection.upsert(
+            documents=[entry["text"] for entry in entries],
+            metadatas=[{
+                "file_name": entry["file_name"],
+                "feedback": bool(entry["feedback"]),
+                "timestamp": entry["created_at"]
+            } for entry in entries],
+            ids=[entry["id"] for entry in entries]
         )
-        
-        if not results["ids"]:
-            return {"total_feedback": 0, "positive_feedback": 0}
-        
-        positive_count = sum(1 for meta in results["metadatas"] if meta["feedback"])
-        total_count = len(results["ids"])
-        
-        return {
-            "total_feedback": total_count,
-            "positive_feedback": positive_count,
-            "feedback_ratio": float(positive_count / total_count) if total_count > 0 else 0.0
-        }
-
-    def get_feedback_history(self, file_name: str) -> List[Dict[str, Any]]:
-        """Get feedback history for a specific file."""
-        try:
-            # Get all feedback entries for the file
-            results = self.feedback_collection.get(
-                where={"file_name": file_name}
-            )
-            
-            if not results["ids"]:
-                return []
-            
-            # Convert to list of feedback entries
-            feedback_history = []
-            for i in range(len(results["ids"])):
-                feedback_history.append({
-                    "id": results["ids"][i],
-                    "feedback": results["metadatas"][i]["feedback"],
-                    "feedback_text": results["metadatas"][i].get("feedback_text", ""),
-                    "suggested_changes": results["documents"][i],
-                    "created_at": results["metadatas"][i]["timestamp"]
-                })
-            
-            # Sort by timestamp, newest first
-            feedback_history.sort(key=lambda x: x["created_at"], reverse=True)
-            return feedback_history
-            
-        except Exception as e:
-            print(f"Error getting feedback history: {e}")
-            return [] 
\ No newline at end of file
+
+    def legacy_feedback(self) -> List[Dict[str, Any]]:
+        """Feedback entries stored in the feedback collection by earlier versions."""
+        results = self.feedback_collection.get(include=["metadatas", "documents"])
+        return [
+            {
+                "id": feedback_id,
+                "file_name": metadata.get("file_name", ""),
+                "question_id": metadata.get("question_id"),
+                "feedback": bool(metadata.get("feedback")),
+                "feedback_text": metadata.get("feedback_text", ""),
+                "suggested_changes": document or None,
+                "created_at": metadata.get("timestamp", ""),
+            }
+            for feedback_id, metadata, document in zip(results["ids"], results["metadatas"], results["documents"])
+        ]
@@ -15,4 +15,10 @@ setup(
         "pytest==8.0.0",
         "httpx==0.26.0",
     ],
+    entry_points={
+        "console_scripts": [
+            "booknotfound-import=services.bulk_import:main",
+            "booknotfound-index=services.index_snapshot:main",
+        ],
+    },
 ) 
\ No newline at end of file
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import random
+import sys
+import types
+
+import pytest
+
+
+class _Unavailable:
+    def __init__(self, *args, **kwargs):
+        raise RuntimeError("not installed")
+
+    @classmethod
+    def from_string(cls, *args, **kwargs):
+        raise RuntimeError("not installed")
+
+
+def _placeholder(name: str, *classes: str):
+    """Install module name with classes that raise when used, unless it is installed."""
+    try:
+        __import__(name)
+    except ImportError:
+        module = types.ModuleType(name)
+        for cls in classes:
+            setattr(module, cls, _Unavailable)
+        sys.modules[name] = module
+
+
+# Tests never load a real model or vector store; where their packages are not
+# installed placeholders let services.llm_service, services.vector_store and main import
+_placeholder("llama_cpp", "Llama", "LlamaGrammar")
+_placeholder("chromadb", "PersistentClient")
+_placeholder("chromadb.config", "Settings")
+_placeholder("sentence_transformers", "SentenceTransformer")
+_placeholder("torch")
+
+TOPICS = ["docker", "kubernetes", "postgres", "redis", "nginx", "kafka", "terraform", "grafana"]
+
+
+class StubLLMService:
+    """Deterministic stand-in for LLMService with random latency.
+
+    Keyword extraction returns the TOPICS mentioned in the text.
+    """
+
+    max_tokens = 256
+    model_id = "stub.gguf"
+    loaded = True
+
+    def count_tokens(self, text: str) -> int:
+        return len(text.split())
+
+    def truncate_tokens(self, text: str, max_tokens: int) -> str:
+        return " ".join(text.split()[:max_tokens])
+
+    def context_budget(self, question: str) -> int:
+        return 1000
+
+    def available_tokens(self, prompt: str, max_tokens: int) -> int:
+        return 1000
+
+    async def generate_json(self, prompt: str, grammar: str, max_tokens: int = 128, prefix_name=None, prefix="",
+                            priority=0):
+        # Yield to other questions so their pipelines interleave
+        await asyncio.sleep(random.uniform(0, 0.01))
+        text = prompt.split("Text to analyze:", 1)[1].lower()
+        keywords = [topic for topic in TOPICS if topic in text]
+        return {"text": json.dumps({"keywords": keywords}), "finish_reason": "stop", "completion_tokens": 8,
+                "seconds": 0.0}
+
+    async def generate_answer(self, question: str, context: str = ""):
+        await asyncio.sleep(random.uniform(0, 0.01))
+        return {"answer": f"Answer from: {context.splitlines()[0]}", "certainty": 0.8, "model": "stub"}
+
+
+@pytest.fixture
+def stub_llm() -> StubLLMService:
+    return StubLLMService()
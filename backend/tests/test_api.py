@@ -0,0 +1,157 @@
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+import main
+from conftest import TOPICS, StubLLMService
+from services.config import settings
+from services.inference_queue import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, InferenceQueue
+from services.llm_service import LLMService
+from services.markdown_service import MarkdownService
+from services.metrics import metrics
+
+
+class StreamingLLMService(StubLLMService):
+    """Runs LLMService's streaming loop over a canned completion."""
+
+    sampling = {}
+    stream_answer = LLMService.stream_answer
+    _build_prompt = LLMService._build_prompt
+    _calculate_certainty = LLMService._calculate_certainty
+
+    def __init__(self):
+        self.queue = InferenceQueue(name="test-stream")
+
+    def _stream_completion(self, prompt, prefix_name=None, prefix="", **kwargs):
+        for token in ["Run ", "docker ", "compose ", "up."]:
+            yield {"choices": [{"text": token}]}
+
+
+class CachedAnswers:
+    """Answer cache of a vector store returning fixed candidates, nearest first."""
+
+    def __init__(self, candidates):
+        self.candidates = candidates
+        self.deleted = []
+
+    def find_cached_answers(self, question, max_distance, min_certainty):
+        return [candidate for candidate in self.candidates if candidate["id"] not in self.deleted]
+
+    def delete_qa_pair(self, qa_id):
+        self.deleted.append(qa_id)
+
+
+def _post(path: str, body: dict) -> httpx.Response:
+    async def post():
+        # Startup does not run under ASGITransport, so no models are loaded
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, json=body)
+
+    return asyncio.run(post())
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch, stub_llm):
+    monkeypatch.setattr(settings, "markdown_dir", str(tmp_path / "markdown"))
+    monkeypatch.setattr(settings, "keywords_dir", str(tmp_path / "keywords"))
+    service = MarkdownService(stub_llm)
+    for topic in TOPICS:
+        (tmp_path / "markdown" / f"{topic}.md").write_text(f"# {topic}\nHow to run {topic} in production.\n")
+        service.keyword_service.save_keywords(topic, [topic, "production"])
+    monkeypatch.setattr(main, "markdown_service", service)
+    monkeypatch.setitem(main.readiness, "models", "ready")
+    return service
+
+
+def _fill(queue: InferenceQueue, release: threading.Event, priority: int) -> threading.Thread:
+    """Queue max_depth jobs that wait for release, from a loop on another thread."""
+    async def occupy():
+        await asyncio.gather(*(queue.submit(release.wait, priority) for _ in range(queue.max_depth)))
+
+    thread = threading.Thread(target=asyncio.run, args=(occupy(),), daemon=True)
+    thread.start()
+    while queue.depth < queue.max_depth:
+        time.sleep(0.001)
+    return thread
+
+
+def test_question_is_rejected_with_retry_after_when_the_queue_is_full(service, monkeypatch):
+    queue = InferenceQueue(max_depth=2, retry_after=7.0, name="test-full")
+    monkeypatch.setattr(main.llm_service, "queue", queue)
+    release = threading.Event()
+    filler = _fill(queue, release, PRIORITY_INTERACTIVE)
+    try:
+        response = _post("/api/question", {"question": "How do I run docker?"})
+    finally:
+        release.set()
+        filler.join()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+
+
+def test_background_backlog_does_not_reject_questions(service, monkeypatch):
+    queue = InferenceQueue(max_depth=2, name="test-background", max_background=2)
+    monkeypatch.setattr(main.llm_service, "queue", queue)
+    release = threading.Event()
+    filler = _fill(queue, release, PRIORITY_BACKGROUND)
+    try:
+        response = _post("/api/question", {"question": "How do I run docker?"})
+    finally:
+        release.set()
+        filler.join()
+
+    assert response.status_code == 200
+    assert response.json()["matching_file"] == "docker"
+
+
+def _events(body: str):
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        yield event[len("event: "):], json.loads(data[len("data: "):])
+
+
+def _ttft_count() -> int:
+    return sum(h.count for h in metrics.histograms.get("llm_time_to_first_token_seconds", {}).values())
+
+
+def test_stream_sends_tokens_before_the_final_answer(service, monkeypatch):
+    monkeypatch.setattr(service, "llm_service", StreamingLLMService())
+    observed = _ttft_count()
+
+    response = _post("/api/question/stream", {"question": "How do I run docker?"})
+
+    assert response.status_code == 200
+    events = list(_events(response.text))
+    assert [event for event, _ in events] == ["token"] * 4 + ["answer"]
+    assert "".join(data["token"] for _, data in events[:-1]) == "Run docker compose up."
+    answer = events[-1][1]
+    assert answer["answer"] == "Run docker compose up."
+    assert answer["matching_file"] == "docker"
+    assert answer["suggested_keywords"] == ["docker"]
+    assert 0 < answer["certainty"] <= 1
+    assert answer["time_to_first_token"] > 0
+    assert _ttft_count() == observed + 1
+
+
+def test_stale_cached_answers_are_deleted_and_the_next_valid_one_served(service, monkeypatch):
+    current = service.document_hash("docker")
+    candidates = [
+        {"id": "stale", "answer": "Use docker run.", "certainty": 0.9, "source_file": "docker",
+         "source_hashes": {"docker": "outdated"}},
+        {"id": "valid", "answer": "Use docker compose.", "certainty": 0.9, "source_file": "docker",
+         "source_hashes": {"docker": current}},
+    ]
+    cache = CachedAnswers(candidates)
+    monkeypatch.setattr(main, "vector_store", cache)
+
+    response = _post("/api/question", {"question": "How do I run docker?"})
+
+    assert response.status_code == 200
+    assert (response.json()["answer"], response.json()["cached"]) == ("Use docker compose.", True)
+    assert cache.deleted == ["stale"]
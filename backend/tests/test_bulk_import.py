@@ -0,0 +1,85 @@
+import asyncio
+import io
+import tarfile
+
+from services.bulk_import import BulkImporter, Checkpoint, ImportDocument, extract_keywords_pool, iter_markdown
+from services.config import settings
+from services.keyword_service import KeywordExtractionError
+from services.markdown_service import MarkdownService
+
+
+def _tarball(path, files):
+    with tarfile.open(path, "w:gz") as archive:
+        for name, content in files.items():
+            data = content if isinstance(content, bytes) else content.encode("utf-8")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+def test_directories_and_tarballs_yield_the_same_flattened_documents(tmp_path):
+    files = {
+        "guide.md": "# Guide",
+        "ops/deploy.md": "# Deploy",
+        "ops/_draft.md": "# Draft",
+        ".git/notes.md": "# Hidden",
+        "image.png": "not markdown",
+    }
+    source = tmp_path / "docs"
+    for name, content in files.items():
+        (source / name).parent.mkdir(parents=True, exist_ok=True)
+        (source / name).write_text(content)
+    _tarball(tmp_path / "docs.tar.gz", {f"./{name}": content for name, content in files.items()})
+
+    expected = [("guide", "# Guide"), ("ops-deploy", "# Deploy")]
+    assert sorted(iter_markdown(str(source))) == expected
+    assert sorted(iter_markdown(str(tmp_path / "docs.tar.gz"))) == expected
+    assert sorted(iter_markdown(str(source), read=False)) == [("guide", None), ("ops-deploy", None)]
+
+
+def test_checkpoint_resumes_only_unchanged_documents(tmp_path):
+    path = str(tmp_path / "imports" / "source.json")
+    Checkpoint(path).record([ImportDocument("guide", "# Guide", "v1"), ImportDocument("faq", "# FAQ", "v1")])
+
+    resumed = Checkpoint(path)
+    assert resumed.is_done(ImportDocument("guide", "# Guide", "v1"))
+    assert not resumed.is_done(ImportDocument("faq", "# FAQ v2", "v2"))
+    assert not resumed.is_done(ImportDocument("new", "# New", "v1"))
+
+
+def test_undecodable_files_are_yielded_without_content(tmp_path):
+    _tarball(tmp_path / "docs.tar", {"bad.md": b"caf\xe9", "good.md": "# Good"})
+    assert sorted(iter_markdown(str(tmp_path / "docs.tar"))) == [("bad", None), ("good", "# Good")]
+
+
+class KeywordServiceStub:
+    async def extract_keywords(self, text, priority, llm_service=None):
+        if "fails" in text:
+            raise KeywordExtractionError("No keywords after 3 attempts")
+        return [] if "empty" in text else ["docker"]
+
+
+def test_documents_without_keywords_count_as_failed():
+    documents = [ImportDocument(name, text, "v1") for name, text in
+                 (("ok", "docker"), ("broken", "fails"), ("blank", "empty"))]
+    results, failed = asyncio.run(extract_keywords_pool(KeywordServiceStub(), documents, [None]))
+    assert results == [("ok", ["docker"], "v1")]
+    assert failed == {"broken", "blank"}
+
+
+def test_crlf_documents_are_not_rewritten_or_re_extracted_on_a_second_run(tmp_path, monkeypatch, stub_llm):
+    monkeypatch.setattr(settings, "markdown_dir", str(tmp_path / "markdown"))
+    monkeypatch.setattr(settings, "keywords_dir", str(tmp_path / "keywords"))
+    service = MarkdownService(stub_llm)
+    source = tmp_path / "docs"
+    source.mkdir()
+    (source / "guide.md").write_bytes(b"# Guide\r\nRun docker.\r\n")
+
+    first = asyncio.run(BulkImporter(service, embed=False).run(str(source)))
+    assert (first["written"], first["extracted"]) == (1, 1)
+    # A fresh service reads the file from disk, as the server does after a restart
+    service = MarkdownService(stub_llm)
+    assert service.keyword_service.is_up_to_date("guide", service.document_hash("guide"))
+
+    second = asyncio.run(BulkImporter(service, embed=False).run(str(source)))
+    assert (second["written"], second["extracted"]) == (0, 0)
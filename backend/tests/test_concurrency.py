@@ -0,0 +1,35 @@
+import asyncio
+import random
+
+import pytest
+
+from conftest import TOPICS
+from services.config import settings
+from services.markdown_service import MarkdownService
+
+
+@pytest.fixture
+def markdown_service(tmp_path, monkeypatch, stub_llm):
+    monkeypatch.setattr(settings, "markdown_dir", str(tmp_path / "markdown"))
+    monkeypatch.setattr(settings, "keywords_dir", str(tmp_path / "keywords"))
+    service = MarkdownService(stub_llm)
+    for topic in TOPICS:
+        (tmp_path / "markdown" / f"{topic}.md").write_text(f"# {topic}\nHow to run {topic} in production.\n")
+        service.keyword_service.save_keywords(topic, [topic, "production"])
+    return service
+
+
+def test_concurrent_questions_get_their_own_matching_file(markdown_service):
+    async def ask(topic: str):
+        retrieval = await markdown_service.find_best_context(f"How do I configure {topic}?")
+        response = await markdown_service.llm_service.generate_answer(topic, retrieval.context)
+        return topic, retrieval, response
+
+    async def run_all():
+        questions = [random.choice(TOPICS) for _ in range(200)]
+        return await asyncio.gather(*(ask(topic) for topic in questions))
+
+    for topic, retrieval, response in asyncio.run(run_all()):
+        assert retrieval.file == topic
+        assert retrieval.matched_keywords == [topic]
+        assert response["answer"] == f"Answer from: Source: {topic}"
@@ -0,0 +1,44 @@
+import difflib
+
+from services.diffs import compute_hunks, page_hunks, render_unified
+
+
+def _document(n, changed=()):
+    return "\n".join(f"line {i}{' changed' if i in changed else ''}" for i in range(n)) + "\n"
+
+
+def test_unified_rendering_matches_difflib():
+    original, suggested = _document(40), _document(40, changed={3, 30})
+    expected = "".join(difflib.unified_diff(
+        original.splitlines(keepends=True), suggested.splitlines(keepends=True), "a/guide.md", "b/guide.md"
+    ))
+    assert render_unified(compute_hunks(original, suggested), "guide") == expected
+
+
+def test_pages_follow_original_line_ranges():
+    hunks = compute_hunks(_document(1000), _document(1000, changed={10, 500, 900}))
+    assert len(hunks) == 3
+
+    first, next_page = page_hunks(hunks, max_lines=10)
+    assert first == hunks[:1] and next_page == (hunks[1]["old_start"], hunks[1]["new_start"])
+    rest, last = page_hunks(hunks, next_page[0], from_new_line=next_page[1])
+    assert rest == hunks[1:] and last is None
+
+
+def test_a_fully_rewritten_large_document_is_split_into_pages():
+    original = _document(5000)
+    suggested = "\n".join(f"new {i}" for i in range(12000)) + "\n"
+    hunks = compute_hunks(original, suggested)
+    assert len(hunks) == 1
+
+    pages, cursor = [], (1, 1)
+    while cursor is not None:
+        page, cursor = page_hunks(hunks, cursor[0], max_lines=2000, from_new_line=cursor[1])
+        assert sum(len(hunk["lines"]) for hunk in page) <= 2000
+        pages.append(page)
+    assert len(pages) == 9
+    # Consecutive pages rejoin into the original hunk's lines, and render as one patch
+    assert [line for page in pages for hunk in page for line in hunk["lines"]] == hunks[0]["lines"]
+    rendered = "".join(render_unified(page, "guide" if i == 0 else None) for i, page in enumerate(pages))
+    patched = [text for page in pages for hunk in page for op, text in hunk["lines"] if op != "-"]
+    assert patched == suggested.splitlines() and rendered.startswith("--- a/guide.md")
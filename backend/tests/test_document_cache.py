@@ -0,0 +1,54 @@
+import os
+
+from services.document_cache import DocumentCache
+
+
+def _write(path, content, mtime_ns):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_outside_edits_are_picked_up_by_mtime(tmp_path):
+    cache = DocumentCache(max_bytes=1024)
+    path = str(tmp_path / "guide.md")
+    _write(path, "# Guide\n\nold", 1_000_000_000)
+
+    first = cache.get(path)
+    assert cache.get(path) is first
+    assert cache.hits == 1
+
+    _write(path, "# Guide\n\nnew", 2_000_000_000)
+    second = cache.get(path)
+    assert second.content == "# Guide\n\nnew"
+    assert second.digest != first.digest
+
+
+def test_least_recently_used_documents_are_evicted(tmp_path):
+    cache = DocumentCache(max_bytes=25)
+    paths = []
+    for name in ("a", "b", "c"):
+        path = str(tmp_path / f"{name}.md")
+        _write(path, f"# {name}\n\n" + "x" * 6, 1_000_000_000)
+        paths.append(path)
+
+    cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])
+    cache.get(paths[2])
+
+    assert cache.stats()["documents"] == 2
+    assert cache.stats()["bytes"] <= 25
+    cache.get(paths[1])
+    assert cache.misses == 4
+
+
+def test_listing_follows_created_files(tmp_path):
+    cache = DocumentCache(max_bytes=1024)
+    (tmp_path / "a.md").write_text("# A")
+    (tmp_path / "_draft.md").write_text("# Draft")
+    assert cache.list_markdown(str(tmp_path)) == ["a"]
+
+    (tmp_path / "b.md").write_text("# B")
+    cache.put(str(tmp_path / "b.md"), "# B")
+    assert sorted(cache.list_markdown(str(tmp_path))) == ["a", "b"]
@@ -0,0 +1,40 @@
+from services.feedback_store import FeedbackStore
+
+
+def test_only_feedback_with_text_is_queued_for_embedding(tmp_path):
+    store = FeedbackStore(str(tmp_path / "feedback.db"))
+    store.add("guide", True)
+    store.add("guide", False, "   ")
+    with_text = store.add("guide", False, "The install steps are outdated")
+
+    pending = store.pending_embeddings()
+    assert [entry["id"] for entry in pending] == [with_text]
+    assert pending[0]["text"] == "The install steps are outdated"
+
+    store.mark_embedded([with_text])
+    assert store.pending_embeddings() == []
+
+
+def test_counters_and_paged_history(tmp_path):
+    store = FeedbackStore(str(tmp_path / "feedback.db"))
+    ids = [store.add("guide", i % 3 != 0, f"note {i}", question_id="q1") for i in range(5)]
+    store.add("other", True)
+
+    assert store.get_file_stats("guide") == {"total_feedback": 5, "positive_feedback": 3, "feedback_ratio": 0.6}
+    assert store.get_feedback_stats("q1")["total_feedback"] == 5
+    assert store.get_file_stats("missing")["total_feedback"] == 0
+
+    first = store.get_feedback_history("guide", limit=2)
+    rest = store.get_feedback_history("guide", limit=10, offset=2)
+    assert [entry["id"] for entry in first + rest] == ids[::-1]
+
+
+def test_import_runs_once_and_skips_known_ids(tmp_path):
+    store = FeedbackStore(str(tmp_path / "feedback.db"))
+    legacy = [{"id": "old", "file_name": "guide", "feedback": True, "feedback_text": "",
+               "suggested_changes": None, "created_at": "2024-01-01T00:00:00"}]
+    store.import_once("vector_store", lambda: legacy)
+    store.import_once("vector_store", lambda: legacy + legacy)
+
+    assert store.get_file_stats("guide")["total_feedback"] == 1
+    assert store.pending_embeddings() == []
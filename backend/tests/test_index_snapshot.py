@@ -0,0 +1,111 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+
+from services.index_snapshot import IndexSnapshot, build_snapshot, verify_snapshot
+from services.keyword_service import KeywordExtractionError
+
+
+class KeywordServiceStub:
+    def __init__(self):
+        self.llm_service = SimpleNamespace(model_id="keywords.gguf")
+
+    def is_up_to_date(self, filename, content_hash):
+        return False
+
+    async def extract_keywords(self, text, priority, llm_service=None):
+        if "Broken" in text:
+            raise KeywordExtractionError("No keywords after 3 attempts")
+        return text.split()[1:2]
+
+    def save_keywords_batch(self, items):
+        pass
+
+
+HEADINGS = ["Install", "Upgrade", "Billing", "Refunds"]
+
+
+def _encode(texts):
+    # One axis per heading, so a section matches exactly the queries naming its heading
+    vectors = np.zeros((len(texts), len(HEADINGS)), dtype=np.float32)
+    for i, text in enumerate(texts):
+        vectors[i, HEADINGS.index(text.split()[1])] = 1.0
+    return vectors
+
+
+def _build(markdown_dir, output_dir, keyword_service):
+    return asyncio.run(build_snapshot(str(markdown_dir), str(output_dir), keyword_service, [None],
+                                      encode=_encode, embedding_model="test-embeddings", batch_size=1))
+
+
+def test_build_writes_a_loadable_snapshot_and_reuses_it_for_unchanged_documents(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "guide.md").write_text("# Install\nRun it.\n\n# Upgrade\nRun it again.\n")
+    (docs / "faq.md").write_text("# Billing\nInvoices monthly.\n")
+    keywords = KeywordServiceStub()
+
+    first = _build(docs, tmp_path / "index", keywords)
+    assert (first["documents"], first["sections"], first["embedded"], first["reused"]) == (2, 3, 2, 0)
+
+    snapshot = IndexSnapshot.open(str(tmp_path / "index"))
+    assert snapshot.version == first["version"]
+    assert isinstance(snapshot.embeddings, np.memmap)
+    assert [section.heading for section in snapshot.documents["guide"].sections] == ["Install", "Upgrade"]
+    assert snapshot.documents["faq"].keywords == ["Billing"]
+
+    query = _encode(["# Upgrade"])[0]
+    best = snapshot.search(query.tolist(), top_k=1)[0]
+    assert (best["file_name"], best["heading"], best["distance"]) == ("guide", "Upgrade", 0.0)
+
+    (docs / "faq.md").write_text("# Refunds\nWithin 30 days.\n")
+    second = _build(docs, tmp_path / "index", keywords)
+    assert (second["reused"], second["extracted"], second["embedded"]) == (1, 1, 1)
+    rebuilt = IndexSnapshot.open(str(tmp_path / "index"))
+    assert rebuilt.version != snapshot.version
+    assert rebuilt.search(_encode(["# Refunds"])[0].tolist(), top_k=1)[0]["file_name"] == "faq"
+    old, new = snapshot.documents["guide"].first_row, rebuilt.documents["guide"].first_row
+    assert np.array_equal(rebuilt.embeddings[new:new + 2], snapshot.embeddings[old:old + 2])
+
+
+def test_documents_whose_extraction_failed_are_left_out(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "guide.md").write_text("# Install\n")
+    (docs / "broken.md").write_text("# Broken\n")
+
+    for _ in range(2):
+        summary = _build(docs, tmp_path / "index", KeywordServiceStub())
+        assert (summary["documents"], summary["failed"]) == (1, 1)
+        assert list(IndexSnapshot.open(str(tmp_path / "index")).documents) == ["guide"]
+
+
+def test_verify_reports_drift_against_live_documents(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "guide.md").write_text("# Install\n")
+    (docs / "faq.md").write_text("# Billing\n")
+    _build(docs, tmp_path / "index", KeywordServiceStub())
+
+    clean = verify_snapshot(str(tmp_path / "index"), str(docs), "keywords.gguf")
+    assert not clean["drift"]
+
+    (docs / "guide.md").write_text("# Install\nNew steps.\n")
+    (docs / "faq.md").unlink()
+    (docs / "news.md").write_text("# News\n")
+    report = verify_snapshot(str(tmp_path / "index"), str(docs), "other.gguf")
+    assert report["drift"]
+    assert (report["added"], report["removed"], report["changed"]) == (["news"], ["faq"], ["guide"])
+    assert not report["keyword_model_matches"]
+
+
+def test_crlf_documents_verify_clean_right_after_a_build(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "guide.md").write_bytes(b"# Install\r\nRun it.\r\n")
+    _build(docs, tmp_path / "index", KeywordServiceStub())
+
+    report = verify_snapshot(str(tmp_path / "index"), str(docs), "keywords.gguf")
+    assert not report["drift"]
+    assert report["changed"] == []
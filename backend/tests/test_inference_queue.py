@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+from services.inference_queue import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, InferenceQueue
+
+
+def test_interactive_jobs_run_before_queued_background_jobs():
+    queue = InferenceQueue(max_depth=16, name="test")
+    release = threading.Event()
+    order = []
+
+    async def run():
+        # Occupy the worker so the rest queue up behind it
+        blocker = asyncio.ensure_future(queue.submit(release.wait))
+        await asyncio.sleep(0.01)
+        background = [
+            asyncio.ensure_future(queue.submit(lambda i=i: order.append(f"index{i}"), PRIORITY_BACKGROUND))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        question = asyncio.ensure_future(queue.submit(lambda: order.append("question"), PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(blocker, question, *background)
+
+    asyncio.run(run())
+
+    assert order == ["question", "index0", "index1", "index2"]
+
+
+def test_cancelled_job_that_has_not_started_never_runs():
+    queue = InferenceQueue(max_depth=16, name="test")
+    release = threading.Event()
+    ran = []
+
+    async def run():
+        blocker = asyncio.ensure_future(queue.submit(release.wait))
+        await asyncio.sleep(0.01)
+        cancelled = asyncio.ensure_future(queue.submit(lambda: ran.append("cancelled")))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        await blocker
+        # Jobs run in order, so once this one finishes the cancelled one was dropped
+        await queue.submit(lambda: ran.append("next"))
+        assert cancelled.cancelled()
+
+    asyncio.run(run())
+
+    assert ran == ["next"]
+    assert queue.depth == 0
+
+
+def test_background_jobs_over_the_cap_wait_for_a_slot():
+    queue = InferenceQueue(max_depth=1, name="test", max_background=2)
+    release = threading.Event()
+
+    async def run():
+        background = [asyncio.ensure_future(queue.submit(release.wait, PRIORITY_BACKGROUND)) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        # Two are queued and two wait for a slot, but none count toward admission
+        assert (queue.depth, queue.interactive_depth) == (2, 0)
+        queue.check_admission()
+        cancelled = background.pop()
+        cancelled.cancel()
+        release.set()
+        await asyncio.gather(*background)
+        assert cancelled.cancelled()
+
+    asyncio.run(run())
+
+    assert queue.depth == 0
+    assert queue._background_depth == 0
@@ -0,0 +1,45 @@
+import asyncio
+
+from services.jobs import JobQueue
+
+
+def test_queued_duplicates_are_merged_and_run_once():
+    jobs = JobQueue("test")
+    runs = []
+
+    async def reindex(name):
+        runs.append(name)
+        await asyncio.sleep(0)
+        return name
+
+    async def run():
+        first = jobs.submit("reindex", "a", lambda: reindex("a"))
+        second = jobs.submit("reindex", "a", lambda: reindex("a"))
+        other = jobs.submit("reindex", "b", lambda: reindex("b"))
+        await jobs.join()
+        return first, second, other
+
+    first, second, other = asyncio.run(run())
+
+    assert first is second
+    assert other.id != first.id
+    assert runs == ["a", "b"]
+    assert first.state == "done" and first.result == "a"
+
+
+def test_failed_job_records_error():
+    jobs = JobQueue("test")
+
+    async def fail():
+        raise ValueError("no such file")
+
+    async def run():
+        job = jobs.submit("reindex", "missing", fail)
+        await jobs.join()
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.state == "failed"
+    assert job.error == "no such file"
+    assert jobs.get(job.id) is job
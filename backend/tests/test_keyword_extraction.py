@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from conftest import StubLLMService
+from services.config import settings
+from services.keyword_service import KeywordExtractionError
+from services.markdown_service import MarkdownService
+
+
+class FailingLLMService(StubLLMService):
+    async def generate_json(self, *args, **kwargs):
+        raise RuntimeError("model crashed")
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "markdown_dir", str(tmp_path / "markdown"))
+    monkeypatch.setattr(settings, "keywords_dir", str(tmp_path / "keywords"))
+    service = MarkdownService(FailingLLMService())
+    (tmp_path / "markdown" / "guide.md").write_text("# Guide\nRun docker.\n")
+    return service
+
+
+def test_failed_extraction_is_counted_and_retried_on_the_next_refresh(service):
+    with pytest.raises(KeywordExtractionError):
+        asyncio.run(service.keyword_service.extract_keywords("Run docker."))
+
+    asyncio.run(service.refresh_keywords())
+    assert (service.index_status["extracted"], service.index_status["failed"]) == (0, 1)
+    assert not service.keyword_service.is_up_to_date("guide", service.document_hash("guide"))
+
+    with pytest.raises(KeywordExtractionError):
+        asyncio.run(service.reindex("guide"))
+    assert not service.keyword_service.is_up_to_date("guide", service.document_hash("guide"))
+    assert asyncio.run(service.keyword_service.extract_question_keywords("How do I run docker?")) == []
+
+
+def test_refresh_notifies_listeners_only_of_edited_documents(tmp_path, monkeypatch, stub_llm):
+    monkeypatch.setattr(settings, "markdown_dir", str(tmp_path / "markdown"))
+    monkeypatch.setattr(settings, "keywords_dir", str(tmp_path / "keywords"))
+    service = MarkdownService(stub_llm)
+    (tmp_path / "markdown" / "guide.md").write_text("# Guide\nRun docker.\n")
+    (tmp_path / "markdown" / "faq.md").write_text("# FAQ\nRun redis.\n")
+    changed = []
+    service.change_listeners.append(changed.append)
+
+    asyncio.run(service.refresh_keywords())
+    assert sorted(changed) == ["faq", "guide"]
+
+    # Same content, keywords from another model: re-extracted, but cached answers stay valid
+    service.keyword_service.llm_service.model_id = "other.gguf"
+    (tmp_path / "markdown" / "faq.md").write_text("# FAQ\nRun redis and kafka.\n")
+    changed.clear()
+    asyncio.run(service.refresh_keywords())
+    assert service.index_status["extracted"] == 2
+    assert changed == ["faq"]
@@ -0,0 +1,35 @@
+from services.keyword_index import KeywordIndex
+
+
+def test_rare_keywords_outrank_common_ones():
+    index = KeywordIndex()
+    index.add_document("docker", ["docker", "setup"])
+    index.add_document("redis", ["redis", "setup"])
+    index.add_document("nginx", ["nginx", "setup"])
+
+    results = index.search(["setup", "redis"])
+
+    assert [filename for filename, _, _ in results] == ["redis", "docker", "nginx"]
+    assert sorted(results[0][2]) == ["redis", "setup"]
+
+
+def test_update_and_remove_keep_postings_in_sync():
+    index = KeywordIndex()
+    index.add_document("guide", ["docker"])
+    index.add_document("guide", ["kafka"])
+
+    assert index.search(["docker"]) == []
+    assert [filename for filename, _, _ in index.search(["kafka"])] == ["guide"]
+
+    index.remove_document("guide")
+    assert len(index) == 0
+    assert index.postings == {}
+
+
+def test_search_respects_allowed_and_min_matched():
+    index = KeywordIndex()
+    index.add_document("a", ["x", "y"])
+    index.add_document("b", ["x"])
+
+    assert [f for f, _, _ in index.search(["x"], allowed={"b"})] == ["b"]
+    assert [f for f, _, _ in index.search(["x", "y"], min_matched=2)] == ["a"]
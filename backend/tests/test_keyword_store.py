@@ -0,0 +1,34 @@
+import json
+
+from services.keyword_store import KeywordEntry, KeywordStore
+
+
+def test_json_keywords_and_manifest_are_migrated_once(tmp_path):
+    (tmp_path / "guide.json").write_text(json.dumps(["docker", "compose"], indent=2))
+    (tmp_path / "legacy.json").write_text(json.dumps({"keywords": ["nginx"]}))
+    (tmp_path / "broken.json").write_text("[\"trunc")
+    (tmp_path / "manifest.json").write_text(json.dumps({"version": 1, "documents": {
+        "guide": {"content_hash": "abc", "model": "m", "updated_at": "2024-01-01T00:00:00"}
+    }}))
+
+    store = KeywordStore(str(tmp_path / "keywords.db"))
+    store.import_json(str(tmp_path))
+    store.remove("legacy")
+    store.import_json(str(tmp_path))
+
+    entries = store.load_all()
+    assert sorted(entries) == ["guide"]
+    assert entries["guide"].keywords == ["docker", "compose"]
+    assert (entries["guide"].content_hash, entries["guide"].model) == ("abc", "m")
+
+
+def test_batches_are_written_together_and_survive_reopening(tmp_path):
+    path = str(tmp_path / "keywords.db")
+    store = KeywordStore(path)
+    store.put_many([KeywordEntry(f"doc{i}", [f"term{i}"], f"hash{i}", "m", 1.0) for i in range(100)])
+    store.put(KeywordEntry("doc0", ["updated"], "hash0b", "m", 2.0))
+    store.close()
+
+    entries = KeywordStore(path).load_all()
+    assert len(entries) == 100
+    assert entries["doc0"].keywords == ["updated"] and entries["doc0"].content_hash == "hash0b"
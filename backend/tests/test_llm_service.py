@@ -0,0 +1,14 @@
+import pytest
+
+from services.config import ModelProfile
+from services.llm_service import LLMService, ModelNotLoadedError
+
+
+def test_tokenizing_before_load_raises_instead_of_loading_on_the_caller():
+    service = LLMService(ModelProfile(name="unloaded", path="/nonexistent/model.gguf"))
+    assert not service.loaded
+    with pytest.raises(ModelNotLoadedError):
+        service.count_tokens("hello")
+    with pytest.raises(ModelNotLoadedError):
+        service.available_tokens("hello", 16)
+    assert not service.loaded
@@ -0,0 +1,30 @@
+from services.metrics import MetricsRegistry
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    registry.inc("requests_total", route="/api/question")
+    registry.inc("requests_total", 2, route="/api/question")
+    registry.gauge("queue_depth", lambda: 3, queue="answer")
+    with registry.span("retrieval"):
+        pass
+    registry.observe("stage_duration_seconds", 200.0, stage="generation")
+
+    text = registry.render()
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/api/question"} 3.0' in text
+    assert 'queue_depth{queue="answer"} 3.0' in text
+    assert '# TYPE stage_duration_seconds histogram' in text
+    assert 'stage_duration_seconds_bucket{stage="retrieval",le="0.001"} 1' in text
+    # Values above the largest bucket only show up in +Inf
+    assert 'stage_duration_seconds_bucket{stage="generation",le="120.0"} 0' in text
+    assert 'stage_duration_seconds_bucket{stage="generation",le="+Inf"} 1' in text
+    assert 'stage_duration_seconds_count{stage="generation"} 1' in text
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.inc("errors_total", detail='bad "quote"\nline')
+
+    assert 'errors_total{detail="bad \\"quote\\"\\nline"} 1.0' in registry.render()
@@ -0,0 +1,26 @@
+from services.sections import split_sections
+
+DOC = """Intro paragraph.
+
+# Install
+Run the installer.
+
+## Docker
+```bash
+# not a heading
+docker run app
+```
+
+# Configure
+Edit config.yaml.
+"""
+
+
+def test_split_sections_at_headings_outside_code_fences():
+    sections = split_sections("guide", DOC)
+
+    assert [(s.heading, s.level) for s in sections] == [("", 0), ("Install", 1), ("Docker", 2), ("Configure", 1)]
+    assert sections[0].text(DOC) == "Intro paragraph."
+    assert "# not a heading" in sections[2].text(DOC)
+    assert sections[-1].text(DOC) == "# Configure\nEdit config.yaml."
+    assert sections[-1].end == len(DOC)
@@ -0,0 +1,57 @@
+import asyncio
+
+from services.single_flight import SingleFlight
+
+
+def test_concurrent_duplicates_share_one_computation():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"answer": "shared"}
+
+    async def run():
+        return await asyncio.gather(*(flight.do("same", compute) for _ in range(10)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(result == {"answer": "shared"} for result in results)
+    assert flight.stats()["joined"] == 9
+    assert flight.in_flight == 0
+
+
+def test_leaving_caller_does_not_cancel_others():
+    flight = SingleFlight("test")
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert asyncio.run(flight.do("key", lambda: asyncio.sleep(0, result="ok"))) == "ok"
@@ -0,0 +1,40 @@
+import json
+
+from services.suggestion_store import SuggestionStore
+
+
+def test_listing_returns_filtered_summaries_and_bodies_are_fetched_lazily(tmp_path):
+    store = SuggestionStore(str(tmp_path / "suggestions.db"))
+    original = "# Guide\n\n" + "text " * 1000
+    ids = [store.add("guide", original, f"# Guide\n\nfix {i}", "typo") for i in range(3)]
+    store.add("other", "# Other", "# Other\n\nmore", "missing section")
+    store.update(ids[0], status="rejected", rejection_reason="wrong")
+
+    page = store.list(filename="guide", status="pending", limit=1)
+    assert page["total"] == 2
+    assert [summary["id"] for summary in page["suggestions"]] == [ids[2]]
+    assert "suggested_content" not in page["suggestions"][0]
+    assert len(set(ids)) == 3
+
+    full = store.get(ids[0])
+    assert full["original_content"] == original
+    assert full["suggested_content"] == "# Guide\n\nfix 0"
+    assert full["status"] == "rejected" and full["rejection_reason"] == "wrong"
+    # The shared original revision is stored once
+    assert store._db.execute("SELECT COUNT(*) FROM revisions").fetchone()[0] == 2
+
+
+def test_json_suggestions_are_imported_once(tmp_path):
+    with open(tmp_path / "guide_20240101_120000.json", "w") as f:
+        json.dump({"id": "guide_20240101_120000", "filename": "guide", "original_content": "# Old",
+                   "suggested_content": "# New", "feedback_context": "", "created_at": "2024-01-01T12:00:00",
+                   "status": "applied", "applied_at": "2024-01-02T00:00:00"}, f)
+
+    store = SuggestionStore(str(tmp_path / "suggestions.db"))
+    store.import_json(str(tmp_path))
+    store.import_json(str(tmp_path))
+
+    page = store.list()
+    assert page["total"] == 1
+    assert page["suggestions"][0]["status"] == "applied"
+    assert store.get("guide_20240101_120000")["original_content"] == "# Old"
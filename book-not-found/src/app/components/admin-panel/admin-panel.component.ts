@@ -16,6 +16,9 @@ export class AdminPanelComponent implements OnInit {
   markdownFiles = signal<string[]>([]);
   selectedFile: string | null = null;
   suggestions = signal<Suggestion[]>([]);
+  suggestionsTotal = signal(0);
+  suggestionsOffset = signal(0);
+  readonly suggestionsPageSize = 50;
   selectedSuggestion: Suggestion | null = null;
   originalContent: string = '';
   editedContent: string = '';
@@ -42,7 +45,7 @@ export class AdminPanelComponent implements OnInit {
   onFileSelect(filename: string) {
     this.selectedFile = filename;
     this.loadFileContent(filename);
-    this.loadSuggestions(filename);
+    this.loadSuggestions(filename, 0);
     this.loadFeedbackHistory(filename);
   }
 
@@ -57,10 +60,17 @@ export class AdminPanelComponent implements OnInit {
     }
   }
 
-  loadSuggestions(filename: string) {
-    this.apiService.getSuggestions().subscribe({
+  loadSuggestions(filename: string, offset: number = this.suggestionsOffset()) {
+    this.apiService.getSuggestions(filename, offset, this.suggestionsPageSize).subscribe({
       next: (response) => {
-        this.suggestions.set(response.suggestions.filter(s => s.filename === filename));
+        // Applying or rejecting the last suggestions of a page can leave it empty
+        if (!response.suggestions.length && offset > 0) {
+          this.loadSuggestions(filename, Math.max(0, offset - this.suggestionsPageSize));
+          return;
+        }
+        this.suggestions.set(response.suggestions);
+        this.suggestionsTotal.set(response.total);
+        this.suggestionsOffset.set(response.offset);
         console.log('Loaded suggestions:', this.suggestions());
       },
       error: (error) => {
@@ -69,6 +79,14 @@ export class AdminPanelComponent implements OnInit {
     });
   }
 
+  previousSuggestions() {
+    this.loadSuggestions(this.selectedFile!, Math.max(0, this.suggestionsOffset() - this.suggestionsPageSize));
+  }
+
+  nextSuggestions() {
+    this.loadSuggestions(this.selectedFile!, this.suggestionsOffset() + this.suggestionsPageSize);
+  }
+
   loadFeedbackHistory(filename: string) {
     this.apiService.getFeedbackHistory(filename).subscribe({
       next: (history) => {
@@ -83,6 +101,18 @@ export class AdminPanelComponent implements OnInit {
 
   onSuggestionSelect(suggestion: Suggestion) {
     this.selectedSuggestion = suggestion;
+    if (suggestion.suggested_content !== undefined) return;
+
+    // The listing only carries a preview; fetch the full bodies on demand
+    this.apiService.getSuggestion(suggestion.id).subscribe({
+      next: (full) => {
+        this.suggestions.update(items => items.map(item => item.id === full.id ? full : item));
+        this.selectedSuggestion = full;
+      },
+      error: (error) => {
+        console.error('Error loading suggestion:', error);
+      }
+    });
   }
 
   applySuggestion(suggestion: Suggestion) {
@@ -33,13 +33,22 @@ export interface MarkdownContent {
 export interface Suggestion {
   id: string;
   filename: string;
-  original_content: string;
-  suggested_content: string;
+  preview: string;
+  // Only present once the full suggestion has been fetched
+  original_content?: string;
+  suggested_content?: string;
   feedback_context: string;
   created_at: string;
   status: 'pending' | 'applied' | 'rejected';
 }
 
+export interface SuggestionPage {
+  suggestions: Suggestion[];
+  total: number;
+  limit: number;
+  offset: number;
+}
+
 export interface FeedbackHistory {
   id: string;
   question: string;
@@ -97,8 +106,16 @@ export class ApiService {
     );
   }
 
-  getSuggestions(): Observable<{ suggestions: Suggestion[] }> {
-    return this.http.get<{ suggestions: Suggestion[] }>(`${this.apiUrl}/api/suggestions`);
+  getSuggestions(filename?: string, offset: number = 0, limit: number = 50): Observable<SuggestionPage> {
+    const params: Record<string, string | number> = { offset, limit };
+    if (filename) {
+      params['filename'] = filename;
+    }
+    return this.http.get<SuggestionPage>(`${this.apiUrl}/api/suggestions`, { params });
+  }
+
+  getSuggestion(suggestionId: string): Observable<Suggestion> {
+    return this.http.get<Suggestion>(`${this.apiUrl}/api/suggestions/${suggestionId}`);
   }
 
   async saveMarkdown(filename: string, content: string): Promise<void> {